@@ -0,0 +1,203 @@
+"""
+Precomputed bilingual answers for the questions we know will be asked.
+
+The likely questions are a small, known set: every POLICY_CODEX topic, and every creditor
+in the eligibility rules with no state and with each state that changes its verdict.
+build_bank() renders and translates them once per document set and stores them in
+ANSWER_BANK_PATH, stamped with the fingerprint of the documents, rules and codex they came
+from. At query time lookup() maps a question onto a canonical one (one creditor and at most
+one state, or a direct codex match) and returns the stored answer: no language detection,
+no translation, no model call.
+
+Only vetted answers are stored: a translation must keep every emoji, number and bold
+marker of the English text, otherwise the question takes the live path.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from codex_index import CODEX_INDEX, match_codex, is_direct_codex_match, format_codex_answer
+from eligibility_rules import extract_entities, evaluate_creditor, format_verdict
+from metrics import Counter, register
+
+ANSWER_BANK_PATH = os.getenv(
+    "ANSWER_BANK_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_bank.json")
+)
+# Bump when the answer formats change so banks built by older code are rebuilt
+BANK_FORMAT = 1
+
+DIGITS = re.compile(r"\d+")
+
+BANK_HITS = register(Counter("docgpt_answer_bank_hits_total", "Questions answered from the answer bank", labels=("path",)))
+
+
+def rules_digest(rules):
+    """Hash of the compiled verdict table, so a hot rules reload can tell the bank is stale."""
+    table = sorted((json.dumps(key), json.dumps(value, sort_keys=True, ensure_ascii=False)) for key, value in rules["table"].items())
+    return hashlib.sha1(json.dumps([rules["programs"], table], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def bank_fingerprint(documents_fingerprint, rules, codex):
+    digest = hashlib.sha1(f"{BANK_FORMAT}:{documents_fingerprint}:{rules_digest(rules)}:".encode("utf-8"))
+    digest.update(json.dumps(codex, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def creditor_key(creditor, state=None):
+    return f"creditor:{creditor}:{state or '*'}"
+
+
+def codex_key(entry):
+    return f"codex:{entry['topic']}"
+
+
+def _markers(text):
+    return (
+        sorted(c for c in text if unicodedata.category(c) == "So"),
+        DIGITS.findall(text),
+        text.count("*"),
+    )
+
+
+def vetted(english, spanish):
+    """A translation is kept only if it has every emoji, number and bold marker of the English."""
+    return bool(spanish and spanish.strip()) and _markers(english) == _markers(spanish)
+
+
+def verdict_states(creditor, rules):
+    """States whose verdict differs from the creditor's default: its own state rules and state service limits."""
+    states = {state for (key, _, state) in rules["table"] if key in (creditor, "*") and state}
+    return sorted(states)
+
+
+def build_bank(rules, codex, translate, fingerprint):
+    """
+    Render every canonical answer; codex answers are translated with `translate(text) -> text`.
+    Returns the bank dict (see save_bank).
+    """
+    answers = {}
+    rejected = []
+    for creditor, info in rules["creditors"].items():
+        path = "hard_rule" if info["kind"] in ("debt_type", "creditor") else "disqualified_list"
+        for state in [None] + verdict_states(creditor, rules):
+            eng, spa = format_verdict(evaluate_creditor(creditor, [state] if state else [], rules))
+            key = creditor_key(creditor, state)
+            if vetted(eng, spa):
+                answers[key] = {"en": eng, "es": spa, "path": path}
+            else:
+                rejected.append(key)
+    for entry in codex:
+        eng = format_codex_answer(entry)
+        key = codex_key(entry)
+        try:
+            spa = translate(eng)
+        except Exception as e:
+            print(f"⚠️ Could not translate {key} for the answer bank: {e}")
+            spa = None
+        if vetted(eng, spa):
+            answers[key] = {"en": eng, "es": spa, "path": "codex"}
+        else:
+            rejected.append(key)
+    return {
+        "format": BANK_FORMAT,
+        "fingerprint": fingerprint,
+        "rules_digest": rules_digest(rules),
+        "created": time.time(),
+        "answers": answers,
+        "rejected": rejected,
+    }
+
+
+def save_bank(bank, path=None):
+    path = path or ANSWER_BANK_PATH
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(bank, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_bank(path=None):
+    path = path or ANSWER_BANK_PATH
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        bank = json.load(f)
+    if bank.get("format") != BANK_FORMAT:
+        return None
+    bank["rejected"] = set(bank.get("rejected", []))
+    return bank
+
+
+def lookup(bank, question, rules, codex_index=CODEX_INDEX):
+    """
+    The stored answer for `question` if it maps onto a canonical question, as
+    {"key", "en", "es", "path", "creditors", "states"}; else None.
+    Mirrors handle_question: the first creditor's verdict, else a direct codex match.
+    """
+    creditors, states = extract_entities(question, rules)
+    if creditors:
+        if len(states) > 1:
+            return None
+        key = creditor_key(creditors[0], states[0] if states else None)
+        if key not in bank["answers"] and key not in bank["rejected"]:
+            # Not stored because this state does not change the verdict
+            key = creditor_key(creditors[0])
+    else:
+        matches = match_codex(question, codex_index)
+        if not is_direct_codex_match(matches):
+            return None
+        key = codex_key(matches[0][0])
+    answer = bank["answers"].get(key)
+    if answer is None:
+        return None
+    BANK_HITS.inc(answer["path"])
+    return dict(answer, key=key, creditors=creditors, states=states)
+
+
+_bank = None
+_bank_checked = None  # the rules dict the bank was last checked against
+_bank_lock = threading.Lock()
+
+
+def get_bank(rules, path=None):
+    """
+    The loaded bank if it matches the current rules, else None. A rules reload is
+    checked once, when it happens; a stale bank stays off until it is rebuilt.
+    """
+    global _bank, _bank_checked
+    path = path or ANSWER_BANK_PATH
+    with _bank_lock:
+        if _bank is None or _bank.get("path") != path:
+            _bank = load_bank(path) or {"answers": {}, "rejected": set(), "disabled": True}
+            _bank["path"] = path
+            _bank_checked = None
+        if _bank_checked is not rules:
+            _bank_checked = rules
+            if not _bank.get("disabled") and _bank.get("rules_digest") != rules_digest(rules):
+                print("⚠️ Eligibility rules changed since the answer bank was built; bank disabled until rebuilt")
+                _bank["disabled"] = True
+        return None if _bank.get("disabled") else _bank
+
+
+def reset_bank():
+    """Forget the loaded bank so the next get_bank() reads the file again."""
+    global _bank, _bank_checked
+    with _bank_lock:
+        _bank = _bank_checked = None
+
+
+def report():
+    with _bank_lock:
+        bank = _bank
+    if bank is None:
+        return {"loaded": False}
+    return {
+        "loaded": not bank.get("disabled"),
+        "answers": len(bank["answers"]),
+        "rejected": len(bank["rejected"]),
+        "created": bank.get("created"),
+    }
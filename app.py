@@ -1,34 +1,48 @@
 import os
 import threading
 import time
-from flask import Flask, jsonify, request
-from slack_doc_bot import app as slack_app, client, chunks, chunk_sources, index, load_documents, embed_chunks, create_vector_index
+from flask import Flask, Response, jsonify, request
+from slack_bolt.adapter.flask import SlackRequestHandler
+import slack_doc_bot
+from slack_doc_bot import app as slack_app, chunks, index, codex_stats, run_debt_file_check
+from eligibility_rules import reload_rules
+from metrics import render_prometheus
+from translation_memory import get_memory
+from scheduler import get_scheduler
+from conversation_cache import get_conversations
+import answer_bank
+from query_log import get_query_log, get_answer_cache, get_embedding_cache, get_warmup
+from openai_client import get_breaker
 
 # Initialize Flask app
 app = Flask(__name__)
+slack_handler = SlackRequestHandler(slack_app)
 
 # Global variables for bot state
 bot_initialized = False
 bot_thread = None
 
-def initialize_bot():
+def initialize_bot(use_store=False, warmup=True):
     """Initialize the Slack bot with documents and vector index"""
-    global bot_initialized, chunks, chunk_sources, index
+    global bot_initialized, chunks, index
     
     try:
         print("🚀 Initializing Slack DocGPT bot...")
         
-        # Load documents and create vector index
-        chunks, chunk_sources = load_documents()
-        print(f"📚 Loaded {len(chunks)} chunks from documents.")
-        
-        vectors = embed_chunks(chunks)
-        index = create_vector_index(vectors)
-        print("✅ Vector index created successfully.")
+        if use_store:
+            # Pre-forked worker: open the index store the gunicorn master built (gunicorn.conf.py)
+            chunks, _, index = slack_doc_bot.open_index_store()
+        else:
+            # Rules, documents, vector index, translation memory and answer bank, as the bot's own startup does
+            chunks, _, index = slack_doc_bot.build_index()
         
         bot_initialized = True
         print("🎉 Bot initialization complete!")
         
+        # Replay the most frequent recent questions in the background to warm the caches
+        if warmup:
+            slack_doc_bot.start_warmup()
+        
     except Exception as e:
         print(f"❌ Error initializing bot: {e}")
         bot_initialized = False
@@ -65,6 +79,10 @@ def home():
         "endpoints": {
             "health": "/health",
             "status": "/status",
+            "metrics": "/metrics",
+            "memory": "/memory",
+            "rules_reload": "/rules/reload",
+            "eligibility_batch": "/eligibility/batch",
             "webhook": "/slack/events"
         }
     })
@@ -84,45 +102,87 @@ def status():
     return jsonify({
         "status": "success",
         "bot_initialized": bot_initialized,
+        # Under gunicorn every figure below is this worker's own
+        "worker_pid": os.getpid(),
         "chunks_loaded": len(chunks) if chunks else 0,
         "vector_index_ready": index is not None,
+        "codex": dict(codex_stats),
+        "translation_memory": get_memory().report(),
+        "scheduler": get_scheduler().report(),
+        "conversations": get_conversations().report(),
+        "answer_bank": answer_bank.report(),
+        "warmup": get_warmup().report(),
+        "query_log": {"queries": get_query_log().count()},
+        "answer_cache": get_answer_cache().report(),
+        "embedding_cache": get_embedding_cache().report(),
+        "openai_breaker": get_breaker().report(),
         "environment": {
             "slack_bot_token": "✅ Set" if os.getenv("SLACK_BOT_TOKEN") else "❌ Missing",
             "slack_app_token": "✅ Set" if os.getenv("SLACK_APP_TOKEN") else "❌ Missing",
+            "slack_signing_secret": "✅ Set" if os.getenv("SLACK_SIGNING_SECRET") else "❌ Missing",
             "openai_api_key": "✅ Set" if os.getenv("OPENAI_API_KEY") else "❌ Missing"
         }
     })
 
-@app.route('/slack/events', methods=['POST'])
-def slack_events():
-    """Handle Slack events (alternative to Socket Mode)"""
+@app.route('/memory')
+def memory():
+    """Bytes per chunk in the chunk store, against the same chunks held as lists of str"""
+    return jsonify({
+        "status": "success",
+        "bot_initialized": bot_initialized,
+        "chunks": slack_doc_bot.chunk_memory_report(),
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage latency histograms, decision path and token counters in Prometheus format"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/rules/reload', methods=['POST'])
+def rules_reload():
+    """Recompile the eligibility rules table from the rules file and policy documents"""
     try:
-        # Verify the request is from Slack
-        if request.headers.get('Content-Type') == 'application/json':
-            data = request.get_json()
-            
-            # Handle URL verification challenge
-            if data.get('type') == 'url_verification':
-                return jsonify({'challenge': data.get('challenge')})
-            
-            # Handle other Slack events
-            if data.get('type') == 'event_callback':
-                event = data.get('event', {})
-                
-                # Handle app mention events
-                if event.get('type') == 'app_mention':
-                    # Process the mention using your existing bot logic
-                    # This would need to be adapted from your current respond function
-                    return jsonify({'status': 'event_received'})
-            
-            return jsonify({'status': 'event_received'})
-        
-        return jsonify({'error': 'Invalid content type'}), 400
-        
+        rules = reload_rules(force=True)
+        return jsonify({
+            "status": "success",
+            "creditors": len(rules["creditors"]),
+            "verdicts": len(rules["table"]),
+            "states": len(rules["states"])
+        })
+    except Exception as e:
+        print(f"❌ Error reloading rules: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/eligibility/batch', methods=['POST'])
+def eligibility_batch():
+    """Check a whole client debt file: {"state": "CA", "debts": [{"creditor": "Oportun", "balance": 2500}, ...]}"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        result = run_debt_file_check(data.get("debts"), data.get("state"))
+        return jsonify({"status": "success", **result})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Error handling Slack event: {e}")
+        print(f"❌ Error checking debt file: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/slack/events', methods=['POST'])
+def slack_events():
+    """Handle Slack events (alternative to Socket Mode)"""
+    # Without a signing secret anyone could sign requests (an empty HMAC key): refuse them all
+    if not slack_doc_bot.SLACK_SIGNING_SECRET:
+        return jsonify({'error': 'SLACK_SIGNING_SECRET is not set; the webhook is disabled'}), 503
+    
+    # Slack retries events it did not see acknowledged in 3 seconds; the first delivery is already queued
+    if request.headers.get('X-Slack-Retry-Num'):
+        return jsonify({'status': 'retry_ignored'})
+    
+    # Bolt checks X-Slack-Signature / X-Slack-Request-Timestamp (401 when they do not match),
+    # answers the URL verification challenge, acknowledges and runs the app_mention handler
+    return slack_handler.handle(request)
+
 @app.route('/test')
 def test():
     """Test endpoint to verify the bot is working"""
@@ -0,0 +1,300 @@
+"""
+asyncio version of run_question: the independent steps of one question run concurrently.
+
+    answer, stats = async_pipeline.run_question(question, slack_doc_bot)
+
+Language detection, the query embedding and the rules/codex lookup start together. A
+hard-rule verdict or a direct codex answer cancels the detection and embedding still in
+flight; an English question (the usual case) already has its embedding when detection
+returns. A Spanish question is translated, checked against the rules and codex again and
+embedded in English. Model calls go through openai_client.achat/aembed (aiohttp), on one
+event loop thread shared by every worker thread of the process.
+
+stats["timeline"] is the per-request breakdown: when each step started and how long it
+took, the chain of steps that made up the critical path, and the time saved compared with
+running the same steps one after another.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from metrics import ERRORS, QUESTION_SECONDS
+from tracing import annotate, stage
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+class Timeline:
+    """Start and duration of each step of one question, relative to the question start."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.steps = []
+
+    @contextmanager
+    def step(self, name):
+        """A timed pipeline stage; a step cancelled before it finished is recorded as such."""
+        began = time.perf_counter()
+        status = "done"
+        try:
+            with stage(name):
+                yield
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self.steps.append({
+                "name": name,
+                "start_ms": round((began - self.start) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - began) * 1000, 3),
+                "status": status,
+            })
+
+    def report(self):
+        wall_ms = (time.perf_counter() - self.start) * 1000
+        done = [s for s in self.steps if s["status"] == "done"]
+        # Walk back from the step that finished last to the one that finished last before it started
+        path = []
+        current = max(done, key=lambda s: s["start_ms"] + s["duration_ms"]) if done else None
+        while current is not None:
+            path.append(current)
+            before = [s for s in done if s is not current and s not in path
+                      and s["start_ms"] + s["duration_ms"] <= current["start_ms"]]
+            current = max(before, key=lambda s: s["start_ms"] + s["duration_ms"]) if before else None
+        serial_ms = sum(s["duration_ms"] for s in done)
+        return {
+            "wall_ms": round(wall_ms, 3),
+            "serial_ms": round(serial_ms, 3),
+            "saved_ms": round(max(0.0, serial_ms - wall_ms), 3),
+            "critical_path": [s["name"] for s in reversed(path)],
+            "critical_path_ms": round(sum(s["duration_ms"] for s in path), 3),
+            "cancelled": [s["name"] for s in self.steps if s["status"] == "cancelled"],
+            "steps": sorted(self.steps, key=lambda s: s["start_ms"]),
+        }
+
+
+async def achat_for_stage(bot, stage_name, messages):
+    """bot.chat_for_stage() on the non-blocking client."""
+    route = bot.get_route(stage_name)
+    response = await bot.openai_client.achat(
+        model=route["model"],
+        messages=messages,
+        temperature=route["temperature"],
+        max_tokens=route["max_tokens"],
+        timeout=route["timeout"]
+    )
+    bot.record_usage(route["model"], response)
+    return response.choices[0].message["content"].strip()
+
+
+async def adetect_language(bot, text):
+    prompt = f"What language is this question in? Just reply with one word.\n{text}"
+    return (await achat_for_stage(bot, "detect_language", [{"role": "user", "content": prompt}])).lower()
+
+
+async def atranslate(bot, text, target_lang, stage_name="translate_answer"):
+    """bot.translate_answer() on the non-blocking client (answers go through the translation memory)."""
+    async def aask(prompt):
+        return await achat_for_stage(bot, stage_name, [{"role": "user", "content": prompt}])
+
+    if stage_name == "translate_answer":
+        translated, result = await bot.get_memory().atranslate(text, target_lang, aask)
+        annotate(translation_memory=result)
+        return translated
+    return await aask(f"Translate the following text to {target_lang}:\n{text}")
+
+
+async def aembed_question(bot, question):
+    key = bot.normalize_question(question)
+    question_vec = bot.get_embedding_cache().get(key)
+    if question_vec is None:
+        response = await bot.openai_client.aembed([question])
+        bot.record_usage("text-embedding-ada-002", response)
+        question_vec = response["data"][0]["embedding"]
+        bot.get_embedding_cache().put(key, question_vec)
+    return question_vec
+
+
+def search_chunk_ids(bot, question_vec, k=5):
+    with stage("faiss_search"):
+        D, I = bot.index.search(np.array([question_vec], dtype=np.float32), k)
+    return [int(i) for i in I[0] if 0 <= i < len(bot.chunks)]
+
+
+async def _timed(timeline, name, coro):
+    with timeline.step(name):
+        return await coro
+
+
+def _match(bot, question, conversation):
+    """
+    (followup, rules verdict or None, codex matches, matched) for the question; CPU only.
+    The entity carry-over is applied to `matched`, a copy of the conversation: the caller
+    keeps it (_keep) only for the match it acts on, so a Spanish question's first pass
+    does not overwrite the thread's entities or drop its chunks.
+    """
+    matched = dict(conversation) if conversation is not None else None
+    followup = bot.is_followup(question, matched)
+    verdict = bot.rule_answer(question, matched, followup)
+    return followup, verdict, (None if verdict is not None else bot.match_codex(question)), matched
+
+
+def _keep(conversation, matched):
+    if conversation is not None:
+        conversation.update(matched)
+
+
+async def _cancel(*tasks):
+    for task in tasks:
+        if task is not None and not task.done():
+            task.cancel()
+    await asyncio.gather(*(t for t in tasks if t is not None), return_exceptions=True)
+
+
+async def answer_question(bot, question, timeline, conversation=None):
+    """The answer to `question` (bilingual, as handle_question formats it)."""
+    with timeline.step("answer_bank"):
+        answer = bot.bank_answer(question, conversation) or bot.cached_answer(question, conversation)
+    if answer is not None:
+        return answer
+    detect = asyncio.create_task(_timed(timeline, "detect_language", adetect_language(bot, question)))
+    embed = None
+    # No speculative embedding when a follow-up can reuse the thread's chunks
+    if not (conversation and conversation["chunk_ids"] is not None and bot.is_followup(question, conversation)):
+        embed = asyncio.create_task(_timed(timeline, "embed_query", aembed_question(bot, question)))
+    try:
+        with timeline.step("match"):
+            followup, verdict, codex_matches, matched = await asyncio.to_thread(_match, bot, question, conversation)
+        # The verdict and codex answers are bilingual already: the question's language does not matter
+        if verdict is not None:
+            await _cancel(detect, embed)
+            _keep(conversation, matched)
+            return bot.finish_turn(conversation, question, *verdict)
+        if bot.is_direct_codex_match(codex_matches):
+            await _cancel(detect, embed)
+            _keep(conversation, matched)
+            return await _codex_answer(bot, conversation, question, bot.lookup_codex(question, codex_matches)[0], timeline)
+
+        lang = await detect
+        annotate(language=lang)
+        bot.question_stats.get()["language"] = lang
+        if lang == "spanish":
+            await _cancel(embed)
+            with timeline.step("translate_question"):
+                question = await atranslate(bot, question, "english", stage_name="translate_question")
+            with timeline.step("match"):
+                followup, verdict, codex_matches, matched = await asyncio.to_thread(_match, bot, question, conversation)
+            if verdict is not None:
+                _keep(conversation, matched)
+                return bot.finish_turn(conversation, question, *verdict)
+            embed = None
+        _keep(conversation, matched)
+        if followup:
+            annotate(followup=True)
+            bot.question_stats.get()["followup"] = True
+        codex_entry, codex_context = bot.lookup_codex(question, codex_matches)
+        if codex_entry is not None:
+            await _cancel(embed)
+            return await _codex_answer(bot, conversation, question, codex_entry, timeline)
+
+        # A follow-up reuses the thread's chunks; the embedding in flight is not needed
+        chunk_ids = bot.reusable_chunk_ids(conversation, bot.index_generation, followup) if conversation is not None else None
+        if chunk_ids is not None:
+            await _cancel(embed)
+            annotate(chunks_reused=len(chunk_ids))
+        else:
+            if embed is None:
+                embed = asyncio.create_task(_timed(timeline, "embed_query", aembed_question(bot, question)))
+            question_vec = await embed
+            with timeline.step("retrieve"):
+                chunk_ids = await asyncio.to_thread(search_chunk_ids, bot, question_vec, 5)
+            if conversation is not None:
+                bot.remember_chunks(conversation, chunk_ids, bot.index_generation)
+        bot.question_stats.get()["chunk_ids"] = chunk_ids
+        top_chunks = [(bot.chunks[i], bot.chunk_sources[i]) for i in chunk_ids]
+        history = bot.format_history(conversation) if followup else ""
+        with timeline.step("build_prompt"):
+            user_prompt = await asyncio.to_thread(bot.build_answer_prompt, question, top_chunks, codex_context, history)
+        if user_prompt is None:
+            answer_en = bot.NO_CONTEXT_ANSWER
+        else:
+            with timeline.step("gpt_answer"):
+                answer_en = await achat_for_stage(bot, "answer", [
+                    {"role": "system", "content": bot.ANSWER_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ])
+        with timeline.step("translate_answer"):
+            answer_es = await atranslate(bot, answer_en, "spanish")
+        return bot.finish_turn(conversation, question, answer_en, answer_es)
+    finally:
+        await _cancel(detect, embed)
+
+
+async def _codex_answer(bot, conversation, question, entry, timeline):
+    eng = bot.format_codex_answer(entry)
+    with timeline.step("translate_answer"):
+        spa = await atranslate(bot, eng, "spanish")
+    return bot.finish_turn(conversation, question, eng, spa)
+
+
+async def arun_question(bot, question, conversation=None):
+    """
+    Coroutine version of run_question: (answer, stats) with stats["timeline"] added. The
+    whole question is cut off at the caller's openai_client deadline, and answered with
+    bot.degraded_answer() when that passes or the model is unavailable.
+    """
+    stats = bot.new_question_stats()
+    token = bot.question_stats.set(stats)
+    timeline = Timeline()
+    try:
+        try:
+            answer = await asyncio.wait_for(answer_question(bot, question, timeline, conversation),
+                                            bot.openai_client.remaining())
+        except Exception as e:
+            if not (isinstance(e, asyncio.TimeoutError) or bot.openai_client.is_transient(e)):
+                raise
+            with timeline.step("degraded"):
+                answer = await asyncio.to_thread(bot.degraded_answer, question, conversation, e)
+        else:
+            bot.cache_answer(question, conversation, answer, stats)
+    except Exception:
+        ERRORS.inc("question")
+        raise
+    finally:
+        bot.question_stats.reset(token)
+        QUESTION_SECONDS.observe(time.perf_counter() - timeline.start)
+        stats["timeline"] = timeline.report()
+        annotate(model_calls=stats["model_calls"], total_tokens=stats["total_tokens"], timeline=stats["timeline"])
+    return answer, stats
+
+
+def get_loop():
+    """The event loop every async question runs on, in its own daemon thread."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-pipeline", daemon=True).start()
+        return _loop
+
+
+async def _in_context(values, coro):
+    # Carry the caller's trace and other context variables over to the loop thread
+    for var, value in values:
+        var.set(value)
+    return await coro
+
+
+def run_question(question, bot, conversation=None):
+    """Answer `question` on the shared event loop from synchronous code; blocks until done."""
+    values = list(contextvars.copy_context().items())
+    future = asyncio.run_coroutine_threadsafe(_in_context(values, arun_question(bot, question, conversation)), get_loop())
+    return future.result()
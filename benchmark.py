@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Offline performance benchmarks for the real slack_doc_bot code.
+
+    python benchmark.py                      # run, write benchmark_results.json, compare to the baseline
+    python benchmark.py --update-baseline    # accept the current numbers as the new baseline
+
+OpenAI and Slack are replaced by the deterministic fakes in benchmark_fakes.py, so the
+numbers measure our own code. A case regresses when its median is more than `tolerance`
+slower than the baseline median (and slower by at least `min_delta_ms`); any regression
+makes the run exit with status 1.
+
+Timings depend on the machine. Each run also times a fixed CPU workload (calibration_ms),
+and the baseline medians are scaled by this run's calibration over the baseline's before
+comparing, so a baseline recorded on one host still means something on another. Scaling
+is approximate: regenerate the baseline (--update-baseline) on the host that gates
+changes.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_fakes import install_fakes, fake_embedding
+
+RESULTS_PATH = "benchmark_results.json"
+BASELINE_PATH = "benchmark_baseline.json"
+
+QUESTIONS = {
+    "hard_rule": "Is Oportun accepted for a client in California?",
+    "codex": "When is the first payment date?",
+    "vector_gpt": "Are private student loans accepted in Elevate?",
+}
+RETRIEVAL_QUESTIONS = [
+    "Are private student loans accepted?",
+    "What is the minimum total debt for Elevate?",
+    "Which states are not serviced?",
+    "Can a client enroll payday loans?",
+    "What documentation is required for repossession deficiencies?",
+]
+
+
+def time_case(fn, repeat):
+    """Run fn `repeat` times and return timing stats in milliseconds."""
+    timings = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 4),
+        "min_ms": round(timings[0], 4),
+    }
+
+
+def calibration_workload():
+    """A fixed mix of regex, dict, sort and numpy work: the unit the timings are compared in."""
+    text = " ".join(f"word{i % 97} {i}" for i in range(20000))
+    counts = {}
+    for word in re.findall(r"\w+", text):
+        counts[word] = counts.get(word, 0) + 1
+    sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    matrix = np.arange(160 * 160, dtype=np.float32).reshape(160, 160)
+    return float((matrix @ matrix).sum())
+
+
+def calibrate(repeat=15):
+    """Median milliseconds of calibration_workload() on this host."""
+    return time_case(calibration_workload, repeat)["median_ms"]
+
+
+def run_async(bot, question):
+    bot.ASYNC_PIPELINE = True
+    try:
+        return bot.run_question(question)
+    finally:
+        bot.ASYNC_PIPELINE = False
+
+
+def run_benchmarks(quick=False):
+    scale = 0.2 if quick else 1.0
+
+    def n(count):
+        return max(1, int(count * scale))
+
+    # Measure our code, not the OpenAI rate limiter
+    for name in ("OPENAI_RPM", "OPENAI_TPM", "OPENAI_EMBEDDING_RPM", "OPENAI_EMBEDDING_TPM"):
+        os.environ.setdefault(name, "1000000000")
+    os.environ.setdefault("TRANSLATION_MEMORY_PATH", ":memory:")
+    # Measure the pipeline itself: repeated questions must not be served from the answer/embedding caches
+    os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+    os.environ.setdefault("EMBEDDING_CACHE_SIZE", "0")
+    os.environ.setdefault("ANSWER_BANK_PATH", os.path.join(tempfile.gettempdir(), "benchmark_answer_bank.json"))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bot, fake = install_fakes()
+        bot.build_index()
+
+    texts = []
+    for filename in sorted(os.listdir("documents")):
+        if filename.endswith(".txt"):
+            with open(os.path.join("documents", filename), "r", encoding="utf-8") as f:
+                texts.append((f.read(), filename))
+    vectors = [fake_embedding(chunk) for chunk in bot.chunks]
+
+    cases = {
+        "load_documents": (lambda: bot.load_documents(), n(3)),
+        "extract_chunks_from_text": (lambda: [bot.extract_chunks_from_text(t, s) for t, s in texts], n(50)),
+        "create_vector_index": (lambda: bot.create_vector_index(vectors), n(50)),
+        "get_top_chunks": (lambda: [bot.get_top_chunks(q, k=5) for q in RETRIEVAL_QUESTIONS], n(30)),
+    }
+    for path, question in QUESTIONS.items():
+        cases[f"handle_question:{path}"] = (lambda q=question: bot.handle_question(q), n(50))
+    cases["run_question:end_to_end"] = (lambda: bot.run_question(QUESTIONS["vector_gpt"]), n(30))
+    cases["run_question:answer_bank"] = (lambda: bot.run_question(QUESTIONS["hard_rule"]), n(50))
+    cases["run_question:async_end_to_end"] = (lambda: run_async(bot, QUESTIONS["vector_gpt"]), n(30))
+
+    calibration_ms = calibrate()
+    print(f"⏱️ calibration: median {calibration_ms:.3f} ms")
+    results = {}
+    for name, (fn, repeat) in cases.items():
+        results[name] = time_case(fn, repeat)
+        print(f"⏱️ {name}: median {results[name]['median_ms']:.3f} ms, p95 {results[name]['p95_ms']:.3f} ms ({repeat} runs)")
+    return {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "chunks": len(bot.chunks),
+        "calibration_ms": calibration_ms,
+        "cases": results,
+    }
+
+
+def compare(results, baseline):
+    """
+    Return a list of regression messages (empty when everything is within threshold).
+    Baseline medians are scaled to this host by the ratio of the calibration timings.
+    """
+    tolerance = baseline.get("tolerance", 0.5)
+    min_delta = baseline.get("min_delta_ms", 0.5)
+    scale = host_scale(results, baseline)
+    regressions = []
+    for name, expected in baseline["cases"].items():
+        actual = results["cases"].get(name)
+        if actual is None:
+            regressions.append(f"{name}: missing from results")
+            continue
+        expected_ms = expected["median_ms"] * scale
+        limit = expected_ms * (1 + expected.get("tolerance", tolerance))
+        if actual["median_ms"] > limit and actual["median_ms"] - expected_ms > min_delta:
+            regressions.append(
+                f"{name}: median {actual['median_ms']:.3f} ms > {limit:.3f} ms "
+                f"(baseline {expected['median_ms']:.3f} ms x{scale:.2f} for this host)"
+            )
+    return regressions
+
+
+def host_scale(results, baseline):
+    """How much slower this host is than the baseline's (1.0 when either has no calibration)."""
+    if not results.get("calibration_ms") or not baseline.get("calibration_ms"):
+        return 1.0
+    return results["calibration_ms"] / baseline["calibration_ms"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark slack_doc_bot against local OpenAI/Slack fakes.")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown when writing a baseline")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results written to {args.output}")
+
+    if args.update_baseline:
+        baseline = {
+            "tolerance": args.tolerance,
+            "min_delta_ms": 0.5,
+            "calibration_ms": results["calibration_ms"],
+            "cases": {name: {"median_ms": case["median_ms"]} for name, case in results["cases"].items()},
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"📏 This host runs the calibration workload at x{host_scale(results, baseline):.2f} the baseline's time")
+    regressions = compare(results, baseline)
+    for message in regressions:
+        print(f"❌ Regression: {message}")
+    if not regressions:
+        print("✅ No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
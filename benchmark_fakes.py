@@ -0,0 +1,393 @@
+"""
+Deterministic local stand-ins for the OpenAI API and the Slack clients.
+
+install_fakes() swaps them in and imports slack_doc_bot against them, so the real
+bot code can run offline (benchmarks, tests, load tests) without tokens or network;
+uninstall_fakes() puts the real modules and classes back.
+FakeOpenAIServer and FakeSlackServer serve the same fakes over HTTP on 127.0.0.1, for a
+bot process pointed at them with OPENAI_API_BASE and SLACK_API_URL (load_test.py).
+"""
+import abc
+import contextvars
+import hashlib
+import importlib
+import json
+import re
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+EMBEDDING_DIM = 1536
+
+
+class FakeOpenAIError(Exception):
+    pass
+
+
+def _make_error_module():
+    error = types.ModuleType("openai.error")
+    # Like openai.error: every error is an OpenAIError
+    error.OpenAIError = type("OpenAIError", (FakeOpenAIError,), {})
+    for name in ("APIError", "Timeout", "RateLimitError", "ServiceUnavailableError",
+                 "APIConnectionError", "TryAgain", "InvalidRequestError", "AuthenticationError"):
+        setattr(error, name, type(name, (error.OpenAIError,), {}))
+    return error
+
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Hashed bag-of-words vector: similar texts get similar vectors, identical texts identical ones."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def _count_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeMessage(dict):
+    pass
+
+
+class FakeChoice:
+    def __init__(self, content):
+        self.message = FakeMessage(role="assistant", content=content)
+
+
+class FakeChatResponse(dict):
+    def __init__(self, content, prompt_tokens, model, finish_reason="stop"):
+        completion_tokens = _count_tokens(content)
+        super().__init__(
+            model=model,
+            choices=[{"message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                   "total_tokens": prompt_tokens + completion_tokens},
+        )
+        self.choices = [FakeChoice(content)]
+
+
+class FakeOpenAI:
+    """
+    Records every call and answers deterministically:
+    - language detection replies "spanish" when the text looks Spanish, else "english"
+    - translation prompts echo the text back with a language tag
+    - everything else gets a fixed policy-style answer
+    `latency` is a number of seconds or a callable(kind) -> seconds, slept before each reply.
+    `model_latency` ({model: (seconds per call, seconds per completion token)}) overrides it
+    for chat calls to the listed models. Replies longer than max_tokens are cut off with
+    finish_reason "length", like the real API.
+    """
+
+    def __init__(self, latency=0.0, model_latency=None):
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.calls = []
+        self.lock = threading.Lock()
+        self.error = _make_error_module()
+        self.api_key = None
+        self.api_base = "https://api.openai.com/v1"
+        self.requestssession = None
+        outer = self
+
+        class Embedding:
+            @staticmethod
+            def create(model=None, input=None, **kwargs):
+                return outer._embed(model, input, kwargs)
+
+            @staticmethod
+            async def acreate(model=None, input=None, **kwargs):
+                return await outer._async(outer._embed, model, input, kwargs)
+
+        class ChatCompletion:
+            @staticmethod
+            def create(model=None, messages=None, **kwargs):
+                return outer._chat(model, messages, kwargs)
+
+            @staticmethod
+            async def acreate(model=None, messages=None, **kwargs):
+                return await outer._async(outer._chat, model, messages, kwargs)
+
+        self.Embedding = Embedding
+        self.ChatCompletion = ChatCompletion
+
+    def _sleep(self, kind, kwargs, delay=None):
+        """Sleep the call's latency; past its request_timeout, raise Timeout like the real client."""
+        if delay is None:
+            delay = self.latency(kind) if callable(self.latency) else self.latency
+        timeout = kwargs.get("request_timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise self.error.Timeout(f"Request timed out after {timeout:.2f}s")
+        if delay:
+            time.sleep(delay)
+
+    async def _async(self, fn, *args):
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def _record(self, kind, model, payload):
+        with self.lock:
+            self.calls.append({"kind": kind, "model": model, "payload": payload})
+
+    def _embed(self, model, inputs, kwargs):
+        self._record("embedding", model, inputs)
+        self._sleep("embedding", kwargs)
+        data = [{"index": i, "embedding": fake_embedding(text)} for i, text in enumerate(inputs)]
+        tokens = sum(_count_tokens(text) for text in inputs)
+        return {"data": data, "model": model, "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _chat(self, model, messages, kwargs):
+        self._record("chat", model, messages)
+        prompt = messages[-1]["content"]
+        prompt_tokens = sum(_count_tokens(m["content"]) for m in messages)
+        if prompt.startswith("What language is this question in?"):
+            spanish = re.search(r"\b(el|la|es|de|acepta|cliente|puede|deuda)\b", prompt.split("\n", 1)[-1].lower())
+            content = "spanish" if spanish else "english"
+        elif prompt.startswith("Translate the following text to "):
+            header, _, text = prompt.partition(":\n")
+            lang = re.match(r"Translate the following text to (\w+)", header).group(1)
+            lines = text.split("\n")
+            if all(re.match(r"\d+\. ", line) for line in lines):
+                # Numbered batch: keep each line's number
+                content = "\n".join(re.sub(r"^(\d+)\. ", rf"\1. [{lang}] ", line) for line in lines)
+            else:
+                content = f"[{lang}] {text}"
+        else:
+            content = (
+                "✅ *Elevate:* Based on the documents this is accepted.\n"
+                "✅ *Clarity:* Based on the documents this is accepted.\n"
+                "📝 *Please ensure client meets all other program criteria.*"
+            )
+        finish_reason = "stop"
+        max_tokens = kwargs.get("max_tokens")
+        if max_tokens and _count_tokens(content) > max_tokens:
+            content, finish_reason = content[:max_tokens * 4], "length"
+        if model in self.model_latency:
+            per_call, per_token = self.model_latency[model]
+            self._sleep("chat", kwargs, per_call + per_token * _count_tokens(content))
+        else:
+            self._sleep("chat", kwargs)
+        return FakeChatResponse(content, prompt_tokens, model, finish_reason)
+
+    def count(self, kind=None):
+        with self.lock:
+            return sum(1 for call in self.calls if kind is None or call["kind"] == kind)
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+
+
+class FakeWebClient:
+    """Records chat.postMessage calls instead of sending them."""
+
+    def __init__(self, token=None, base_url=None, **kwargs):
+        self.token = token
+        self.base_url = base_url
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def chat_postMessage(self, channel=None, text=None, thread_ts=None, **kwargs):
+        with self.lock:
+            self.messages.append({"channel": channel, "text": text, "thread_ts": thread_ts, "time": time.time()})
+        return {"ok": True, "channel": channel, "ts": f"{time.time():.6f}"}
+
+
+class FakeApp:
+    """Enough of slack_bolt.App for the bot's decorators to register handlers."""
+
+    def __init__(self, *args, **kwargs):
+        self.client = kwargs.get("client") or FakeWebClient(kwargs.get("token"))
+        self.handlers = {}
+
+    def _register(self, kind, name):
+        def decorator(fn):
+            self.handlers[(kind, name)] = fn
+            return fn
+        return decorator
+
+    def event(self, name, *args, **kwargs):
+        return self._register("event", name)
+
+    def command(self, name, *args, **kwargs):
+        return self._register("command", name)
+
+    def message(self, *args, **kwargs):
+        return self._register("message", args[0] if args else None)
+
+
+# Modules install_fakes() replaces or imports against the fakes
+FAKED_MODULES = ("openai", "openai.error", "openai_client", "slack_doc_bot")
+_originals = None  # what the first install_fakes() replaced, for uninstall_fakes()
+
+
+def install_fakes(latency=0.0, model_latency=None):
+    """
+    Replace openai, slack_bolt.App and slack_sdk WebClient with the fakes, then (re)import
+    slack_doc_bot. Returns (slack_doc_bot module, FakeOpenAI instance). The fakes stay in
+    place for the whole process until uninstall_fakes().
+    """
+    global _originals
+    import slack_bolt
+    import slack_sdk.web
+    if _originals is None:
+        _originals = {
+            "modules": {name: sys.modules.get(name) for name in FAKED_MODULES},
+            "App": slack_bolt.App,
+            "WebClient": slack_sdk.web.WebClient,
+        }
+
+    fake_openai = FakeOpenAI(latency, model_latency)
+    module = types.ModuleType("openai")
+    module.__dict__.update({
+        "Embedding": fake_openai.Embedding,
+        "ChatCompletion": fake_openai.ChatCompletion,
+        "error": fake_openai.error,
+        "api_key": None,
+        "api_base": fake_openai.api_base,
+        "requestssession": None,
+        "aiosession": contextvars.ContextVar("aiohttp-session", default=None),
+        "fake": fake_openai,
+    })
+    sys.modules["openai"] = module
+    sys.modules["openai.error"] = fake_openai.error
+
+    slack_bolt.App = FakeApp
+    slack_sdk.web.WebClient = FakeWebClient
+
+    # Modules that bind the openai module at import time
+    for name in ("openai_client", "slack_doc_bot"):
+        sys.modules.pop(name, None)
+    bot = importlib.import_module("slack_doc_bot")
+    return bot, fake_openai
+
+
+def uninstall_fakes():
+    """Undo install_fakes(): the real openai, Slack classes and the modules imported before it."""
+    global _originals
+    if _originals is None:
+        return
+    import slack_bolt
+    import slack_sdk.web
+    slack_bolt.App = _originals["App"]
+    slack_sdk.web.WebClient = _originals["WebClient"]
+    for name, module in _originals["modules"].items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    _originals = None
+
+
+class _FakeHTTPServer(abc.ABC):
+    """A JSON API on 127.0.0.1 served from a background thread; subclasses implement handle()."""
+
+    def __init__(self, port=0):
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    body = json.loads(raw or "{}")
+                else:
+                    body = dict(parse_qsl(raw))
+                status, reply = outer.handle(self.path, body)
+                data = json.dumps(reply).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    @abc.abstractmethod
+    def handle(self, path, body):
+        """
+        Answer one request, on the server's thread for that request: `path` is the request
+        path, `body` the parsed JSON (or form) body. Returns (HTTP status, JSON-able reply).
+        """
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeOpenAIServer(_FakeHTTPServer):
+    """
+    /v1/embeddings and /v1/chat/completions answered by FakeOpenAI. `latency(kind)` (or a
+    number) is slept per call; `error_rate` of the calls fail with a 500.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, port=0, seed=0):
+        self.fake = FakeOpenAI(latency)
+        self.error_rate = error_rate
+        self.random = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        super().__init__(port)
+        self.url = f"http://127.0.0.1:{self.port}/v1"
+
+    def handle(self, path, body):
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            return 500, {"error": {"message": "The server had an error while processing your request.",
+                                   "type": "server_error"}}
+        if path.endswith("/embeddings"):
+            inputs = body.get("input")
+            return 200, self.fake._embed(body.get("model"), [inputs] if isinstance(inputs, str) else inputs, body)
+        if path.endswith("/chat/completions"):
+            return 200, dict(self.fake._chat(body.get("model"), body.get("messages"), body))
+        return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}
+
+
+class FakeSlackServer(_FakeHTTPServer):
+    """
+    The Slack Web API methods the bot uses (auth.test, chat.postMessage), after `latency`
+    seconds. Every chat.postMessage is recorded, and passed to each listener(message).
+    """
+
+    def __init__(self, latency=0.0, port=0):
+        self.latency = latency
+        self.messages = []
+        self.listeners = []
+        self.lock = threading.Lock()
+        super().__init__(port)
+        self.url = f"http://127.0.0.1:{self.port}/api/"
+
+    def handle(self, path, body):
+        delay = self.latency("slack") if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        method = path.rsplit("/", 1)[-1]
+        if method == "auth.test":
+            return 200, {"ok": True, "url": "https://docgpt-load-test.slack.com/", "team": "Load Test", "user": "docgpt",
+                         "team_id": "T0LOAD", "user_id": "U0DOCGPT", "bot_id": "B0DOCGPT", "is_enterprise_install": False}
+        if method == "chat.postMessage":
+            message = {"channel": body.get("channel"), "text": body.get("text"), "thread_ts": body.get("thread_ts"),
+                       "time": time.time()}
+            with self.lock:
+                self.messages.append(message)
+                listeners = list(self.listeners)
+            for listener in listeners:
+                listener(message)
+            return 200, {"ok": True, "channel": message["channel"], "ts": f"{message['time']:.6f}"}
+        return 200, {"ok": True}
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Replay a file of agent questions through the bot pipeline.
+
+    python bulk_runner.py questions.csv --output results.jsonl --concurrency 4
+    python bulk_runner.py questions.jsonl --output results.jsonl --baseline last_run.jsonl
+
+Input is CSV (with a "question" column) or JSONL (with a "question" field); an "id"
+column/field is used when present, otherwise the row number. Each result is appended to
+the output file as soon as it finishes, so the output doubles as the checkpoint: rerunning
+the same command skips questions that already have an answer.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# USD per 1K tokens (prompt, completion), used for the cost estimate only
+COST_PER_1K = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "text-embedding-ada-002": (0.0001, 0.0),
+}
+
+
+def read_questions(path, id_field="id", question_field="question"):
+    """Yield (id, question) pairs from a CSV or JSONL file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for number, row in enumerate(rows, 1):
+            question = (row.get(question_field) or "").strip()
+            if question:
+                yield str(row.get(id_field) or number), question
+
+
+def read_results(path):
+    """Results already written to a JSONL output file, keyed by id."""
+    results = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A line cut off by an interruption; that question is simply run again
+                    continue
+                results[result["id"]] = result
+    return results
+
+
+def end_last_line(path):
+    """Terminate a last line cut off by an interruption, so the next result starts on a line of its own."""
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+def estimate_cost(models):
+    cost = 0.0
+    for model, usage in models.items():
+        prompt_price, completion_price = COST_PER_1K.get(model, (0.0, 0.0))
+        cost += usage["prompt_tokens"] / 1000 * prompt_price + usage["completion_tokens"] / 1000 * completion_price
+    return cost
+
+
+def run_one(run_question, question_id, question):
+    start = time.perf_counter()
+    try:
+        answer, stats = run_question(question)
+        error = None
+    except Exception as e:
+        answer, stats, error = None, None, f"{type(e).__name__}: {e}"
+    result = {
+        "id": question_id,
+        "question": question,
+        "answer": answer,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "error": error,
+    }
+    if stats:
+        result.update({
+            "path": stats["path"],
+            "model_calls": stats["model_calls"],
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_tokens"],
+            "total_tokens": stats["total_tokens"],
+            "cost_usd": round(estimate_cost(stats["models"]), 6),
+            "context_tokens_saved": stats.get("context", {}).get("tokens_saved", 0),
+        })
+    return result
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(results, baseline=None):
+    """Latency, decision path, token and cost totals for a run."""
+    ok = [r for r in results if not r["error"]]
+    latencies = [r["latency_ms"] for r in ok]
+    paths = {}
+    for r in ok:
+        paths[r.get("path")] = paths.get(r.get("path"), 0) + 1
+    summary = {
+        "questions": len(results),
+        "errors": len(results) - len(ok),
+        "paths": paths,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies, default=0.0),
+        },
+        "total_tokens": sum(r.get("total_tokens", 0) for r in ok),
+        "cost_usd": round(sum(r.get("cost_usd", 0.0) for r in ok), 4),
+        "context_tokens_saved": sum(r.get("context_tokens_saved", 0) for r in ok),
+    }
+    if baseline:
+        compared = [r for r in ok if r["id"] in baseline and baseline[r["id"]].get("answer") is not None]
+        summary["changed_answers"] = sum(1 for r in compared if r["answer"] != baseline[r["id"]]["answer"])
+        summary["compared"] = len(compared)
+    return summary
+
+
+def run(questions, output, run_question, concurrency=4, retry_errors=False, baseline=None):
+    """
+    Run the questions with bounded concurrency, appending each result to `output`.
+    Questions already answered in `output` are skipped (errors too, unless retry_errors).
+    """
+    done = read_results(output)
+    pending = [
+        (question_id, question) for question_id, question in questions
+        if question_id not in done or (retry_errors and done[question_id]["error"])
+    ]
+    print(f"📋 {len(pending)} questions to run, {len(done)} already in {output}")
+
+    end_last_line(output)
+    lock = threading.Lock()
+    finished = 0
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_one, run_question, question_id, question) for question_id, question in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            if baseline and result["id"] in baseline:
+                result["changed"] = result["answer"] != baseline[result["id"]].get("answer")
+            with lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                done[result["id"]] = result
+                finished += 1
+            status = "❌" if result["error"] else "✅"
+            print(f"{status} [{finished}/{len(pending)}] {result['id']} {result.get('path')} {result['latency_ms']:.0f} ms")
+    return summarize(list(done.values()), baseline)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay agent questions through the bot and report answers, latency and cost.")
+    parser.add_argument("input", help="CSV or JSONL file of questions")
+    parser.add_argument("--output", default="bulk_results.jsonl", help="JSONL results file, also used as the checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions in flight at once")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--baseline", help="previous results file to compare answers against")
+    parser.add_argument("--retry-errors", action="store_true", help="rerun questions that failed in the checkpoint")
+    parser.add_argument("--documents", default="documents", help="documents folder to index")
+    parser.add_argument("--report", help="write the summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    import slack_doc_bot
+    slack_doc_bot.build_index(args.documents)
+
+    questions = list(read_questions(args.input, args.id_field, args.question_field))
+    baseline = read_results(args.baseline) if args.baseline else None
+    summary = run(questions, args.output, slack_doc_bot.run_question, args.concurrency, args.retry_errors, baseline)
+
+    print(json.dumps(summary, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if summary["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Compact chunk storage.
+
+Chunk texts live in one contiguous UTF-8 buffer addressed by an offsets array, and each
+chunk's source is a small integer into a table of the distinct filenames. A Python list of
+str costs an object header per chunk and 4 bytes per character as soon as a chunk holds
+an emoji, which most of ours do (✅ ❌ ⚠️); the buffer costs 1-3 bytes per character and
+nothing per chunk beyond its offset and source id.
+
+    store = ChunkStore.from_lists(chunks, chunk_sources)
+    store.save(directory); store = ChunkStore.open(directory)   # buffer memory-mapped
+
+`store[i]` and `store.sources[i]` index like the lists they replace; `store.view(i)` is a
+zero-copy memoryview of the chunk's bytes.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+
+class ChunkSources:
+    """Read-only sequence of chunk source names, resolved through the interned table."""
+
+    def __init__(self, ids, table):
+        self.ids = ids
+        self.table = table
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table[j] for j in self.ids[i]]
+        return self.table[self.ids[i]]
+
+    def __iter__(self):
+        return (self.table[j] for j in self.ids)
+
+
+class ChunkStore:
+    """Read-only sequence of chunk texts in one UTF-8 buffer, with interned sources."""
+
+    def __init__(self, data, offsets, source_ids, source_table, mapped=False):
+        self.data = data
+        self.buffer = memoryview(data).cast("B") if len(data) else memoryview(b"")
+        self.offsets = offsets
+        self.source_ids = source_ids
+        self.source_table = list(source_table)
+        self.sources = ChunkSources(source_ids, self.source_table)
+        self.mapped = mapped
+
+    @classmethod
+    def from_lists(cls, chunks, chunk_sources):
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        table = {}
+        ids = [table.setdefault(source, len(table)) for source in chunk_sources]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        return cls(b"".join(encoded), offsets, np.array(ids, dtype=np.uint16 if len(table) < 65536 else np.uint32),
+                   table)
+
+    @classmethod
+    def open(cls, directory):
+        """The store written by save(), with the text buffer and arrays memory-mapped."""
+        with open(os.path.join(directory, "sources.json"), "r", encoding="utf-8") as f:
+            source_table = json.load(f)
+        text_path = os.path.join(directory, "chunks.bin")
+        data = np.memmap(text_path, dtype=np.uint8, mode="r") if os.path.getsize(text_path) else b""
+        offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        source_ids = np.load(os.path.join(directory, "source_ids.npy"), mmap_mode="r")
+        return cls(data, offsets, source_ids, source_table, mapped=True)
+
+    def save(self, directory):
+        """Write chunks.bin, offsets.npy, source_ids.npy and the source table (sources.json)."""
+        with open(os.path.join(directory, "chunks.bin"), "wb") as f:
+            f.write(self.buffer)
+        with open(os.path.join(directory, "sources.json"), "w", encoding="utf-8") as f:
+            json.dump(self.source_table, f, ensure_ascii=False)
+        np.save(os.path.join(directory, "offsets.npy"), np.asarray(self.offsets))
+        np.save(os.path.join(directory, "source_ids.npy"), np.asarray(self.source_ids))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _bounds(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def view(self, i):
+        """The UTF-8 bytes of chunk `i`, without copying."""
+        start, end = self._bounds(i)
+        return self.buffer[start:end]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return str(self.view(i), "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def memory_report(self):
+        """Bytes held by the store, and what the same chunks cost as two lists of str."""
+        store_bytes = len(self.buffer) + self.offsets.nbytes + self.source_ids.nbytes + \
+            sum(sys.getsizeof(source) for source in self.source_table)
+        list_bytes = list_memory(self, self.sources)
+        count = len(self)
+        return {
+            "chunks": count,
+            "sources": len(self.source_table),
+            "mapped": self.mapped,
+            "store_bytes": store_bytes,
+            "list_bytes": list_bytes,
+            "bytes_per_chunk": round(store_bytes / count, 1) if count else 0.0,
+            "list_bytes_per_chunk": round(list_bytes / count, 1) if count else 0.0,
+        }
+
+
+def list_memory(chunks, chunk_sources):
+    """Bytes of `chunks` and `chunk_sources` held as lists of str (each distinct source string counted once)."""
+    chunks, chunk_sources = list(chunks), list(chunk_sources)
+    return sys.getsizeof(chunks) + sys.getsizeof(chunk_sources) + \
+        sum(sys.getsizeof(chunk) for chunk in chunks) + sum(sys.getsizeof(source) for source in set(chunk_sources))
@@ -0,0 +1,73 @@
+import re
+from policy_codex_full_ready import POLICY_CODEX
+
+
+def _keyword_pattern(keyword):
+    """Word-boundary pattern that also works for keywords like "$500" or "25%"."""
+    return r"(?<!\w)" + re.escape(keyword) + r"(?!\w)"
+
+
+def compile_codex_index(codex):
+    """
+    Compile the codex into an inverted keyword index.
+    Returns a dict with the entries, a keyword -> entry positions map and one
+    precompiled alternation pattern covering every keyword.
+    """
+    keyword_entries = {}
+    for position, entry in enumerate(codex):
+        for keyword in entry["keywords"]:
+            positions = keyword_entries.setdefault(keyword.lower(), [])
+            if position not in positions:
+                positions.append(position)
+
+    # Longest keywords first so "minimum balance per creditor" wins over shorter overlaps
+    keywords = sorted(keyword_entries, key=len, reverse=True)
+    pattern = re.compile("|".join(_keyword_pattern(k) for k in keywords))
+    return {"entries": codex, "keywords": keyword_entries, "pattern": pattern}
+
+
+CODEX_INDEX = compile_codex_index(POLICY_CODEX)
+
+
+def match_codex(question, codex_index=CODEX_INDEX):
+    """
+    Return (entry, score) pairs for codex entries whose keywords appear in the question,
+    best first. The score is the number of distinct keywords matched for that entry.
+    """
+    scores = {}
+    seen = set()
+    for match in codex_index["pattern"].finditer(question.lower()):
+        keyword = match.group(0)
+        if keyword in seen:
+            continue
+        seen.add(keyword)
+        for position in codex_index["keywords"][keyword]:
+            scores[position] = scores.get(position, 0) + 1
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(codex_index["entries"][position], score) for position, score in ranked]
+
+
+def is_direct_codex_match(matches):
+    """A codex match answers directly only when one entry clearly outranks the rest."""
+    if not matches:
+        return False
+    if len(matches) == 1:
+        return True
+    return matches[0][1] > matches[1][1]
+
+
+def format_codex_answer(entry):
+    """English answer text for a codex entry, in the bot's answer style."""
+    return (
+        f"📘 *{entry['topic']}:* {entry['text']}\n"
+        f"📝 *Source: {entry['source']}*"
+    )
+
+
+def format_codex_context(matches):
+    """High-priority context lines for the GPT prompt, one per matched codex entry."""
+    return [
+        (entry["text"], f"POLICY_CODEX: {entry['topic']} ({entry['source']})")
+        for entry, _ in matches
+    ]
@@ -0,0 +1,55 @@
+import pytest
+
+import answer_bank
+import query_log
+import tracing
+import translation_memory
+from benchmark_fakes import fake_embedding, install_fakes, uninstall_fakes
+
+CHUNKS = [
+    ("PRIVATE STUDENT LOANS Elevate: ✅ Accepted (non-federal only, max 25%) Clarity: ✅ Accepted", "ComparisonTable.txt"),
+    ("Clarity accepts unsecured personal loans and credit cards from most lenders.", "Clarity.txt"),
+]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def temporary_state_files(tmp_path_factory):
+    """No test ever opens the real translation memory, answer bank, query log or trace logs: the defaults are temporary files."""
+    state = tmp_path_factory.mktemp("state")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(translation_memory, "TRANSLATION_MEMORY_PATH", str(state / "translation_memory.sqlite3"))
+        mp.setattr(translation_memory, "_memory", None)
+        mp.setattr(answer_bank, "ANSWER_BANK_PATH", str(state / "answer_bank.json"))
+        mp.setattr(query_log, "QUERY_LOG_PATH", str(state / "query_log.sqlite3"))
+        mp.setattr(query_log, "_query_log", None)
+        mp.setattr(tracing, "TRACE_LOG_PATH", str(state / "traces.jsonl"))
+        mp.setattr(tracing, "SLOW_QUERY_LOG_PATH", str(state / "slow_queries.jsonl"))
+        mp.setattr(tracing, "_writer", None)
+        yield
+
+
+@pytest.fixture(scope="module")
+def fakes():
+    """install_fakes for one test module: call it like install_fakes(); undone after the module's tests."""
+    yield install_fakes
+    uninstall_fakes()
+
+
+@pytest.fixture(scope="module")
+def bot(fakes, tmp_path_factory):
+    """
+    slack_doc_bot against the fakes, with a two-chunk index (CHUNKS), an empty answer bank
+    and an in-memory translation memory. `bot.fake` is the FakeOpenAI. Every global set
+    here is put back after the module's tests.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(answer_bank, "ANSWER_BANK_PATH", str(tmp_path_factory.mktemp("bank") / "answer_bank.json"))
+        mp.setattr(answer_bank, "_bank", None)
+        mp.setattr(answer_bank, "_bank_checked", None)
+        mp.setattr(translation_memory, "_memory", translation_memory.TranslationMemory(":memory:"))
+        bot, fake = fakes()
+        bot.chunks = [text for text, _ in CHUNKS]
+        bot.chunk_sources = [source for _, source in CHUNKS]
+        bot.index = bot.create_vector_index([fake_embedding(text) for text in bot.chunks])
+        bot.fake = fake
+        yield bot
@@ -0,0 +1,140 @@
+"""
+Token-budgeted context assembly for the GPT-4 prompt.
+
+Retrieved chunks are split into sentences; sentences are picked greedily by maximal
+marginal relevance (relevance to the question and retrieval rank, minus similarity to
+what is already picked), so the overlapping PDF/TXT copies of the same policy text are
+only sent once. Picking stops at CONTEXT_TOKEN_BUDGET tokens.
+"""
+import os
+import re
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to ~4 characters per token
+    _encoding = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+DUPLICATE_SIMILARITY = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.8"))
+# PDF table text often has no sentence punctuation; long runs are cut into windows this size
+MAX_SENTENCE_WORDS = 40
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "to", "of", "in", "on", "for", "and", "or", "if",
+    "it", "its", "this", "that", "with", "as", "at", "by", "can", "do", "does", "what", "which",
+    "client", "clients", "accepted", "allowed", "program", "programs",
+}
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4) if text else 0
+
+
+def split_sentences(text):
+    sentences = []
+    for sentence in SENTENCE_END.split(text):
+        words = sentence.split() if sentence else []
+        for start in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[start:start + MAX_SENTENCE_WORDS]))
+    return sentences
+
+
+def _terms(text):
+    return {word for word in WORD.findall(text.lower()) if word not in STOPWORDS}
+
+
+def similarity(a, b):
+    """Jaccard overlap of two term sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def format_context(passages):
+    return "\n\n".join(f"[{src}]: {text}" for text, src in passages)
+
+
+def pack_context(question, passages, pinned=(), budget=None, system_prompt=""):
+    """
+    Build the DOCUMENTS block from `pinned` passages (codex entries, always kept whole and
+    first) and retrieved `passages` [(text, source)] in retrieval order.
+    Returns (context, report) where report compares the token count with the unpacked join.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    pinned = list(pinned)
+    passages = list(passages)
+    question_terms = _terms(question)
+
+    candidates = []
+    for rank, (text, src) in enumerate(passages):
+        prior = 1.0 - rank / max(1, len(passages))
+        for position, sentence in enumerate(split_sentences(text)):
+            terms = _terms(sentence)
+            overlap = len(terms & question_terms) / len(question_terms) if question_terms else 0.0
+            candidates.append({
+                "rank": rank,
+                "position": position,
+                "source": src,
+                "text": sentence,
+                "terms": terms,
+                "tokens": count_tokens(sentence),
+                "relevance": 0.6 * overlap + 0.4 * prior,
+            })
+
+    used = count_tokens(format_context(pinned)) if pinned else 0
+    selected = []
+    opened = set()
+    duplicates = over_budget = 0
+    remaining = list(range(len(candidates)))
+    closest = [0.0] * len(candidates)  # similarity to the closest selected sentence
+    while remaining:
+        best = max(remaining, key=lambda i: MMR_LAMBDA * candidates[i]["relevance"] - (1 - MMR_LAMBDA) * closest[i])
+        remaining.remove(best)
+        candidate = candidates[best]
+        if closest[best] >= DUPLICATE_SIMILARITY:
+            duplicates += 1
+            continue
+        # The first sentence from a passage also pays for its "[source]: " header
+        cost = candidate["tokens"] + 1
+        if candidate["rank"] not in opened:
+            cost += count_tokens(f"\n\n[{candidate['source']}]: ")
+        if used + cost > budget:
+            over_budget += 1
+        else:
+            selected.append(candidate)
+            opened.add(candidate["rank"])
+            used += cost
+            for i in remaining:
+                closest[i] = max(closest[i], similarity(candidates[i]["terms"], candidate["terms"]))
+
+    # Reassemble in retrieval order, sentences in their original order within each passage
+    packed = []
+    for rank, (_, src) in enumerate(passages):
+        sentences = sorted((s for s in selected if s["rank"] == rank), key=lambda s: s["position"])
+        if sentences:
+            packed.append((" ".join(s["text"] for s in sentences), src))
+    context = format_context(pinned + packed)
+
+    system_tokens = count_tokens(system_prompt) if system_prompt else 0
+    tokens_before = count_tokens(format_context(pinned + passages))
+    tokens_after = count_tokens(context)
+    report = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "system_prompt_tokens": system_tokens,
+        "budget": budget,
+        "passages": len(passages),
+        "sentences": len(candidates),
+        "sentences_kept": len(selected),
+        "duplicates_dropped": duplicates,
+        "over_budget_dropped": over_budget,
+        "tokenizer": "tiktoken" if _encoding is not None else "approx",
+    }
+    return context, report
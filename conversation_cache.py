@@ -0,0 +1,174 @@
+"""
+Per-thread conversation context for Slack follow-ups.
+
+Agents ask follow-ups in the same thread ("what about in Texas?", "and for Clarity?").
+Each thread, keyed by (channel, thread_ts), keeps the creditors and states resolved so
+far, the ids of the chunks retrieved for it and its last answers. A follow-up inherits
+the creditor/state it does not name, reuses the retrieved chunks instead of embedding
+and searching again, and gets the earlier turns in its prompt.
+
+The cache is bounded: least recently used threads are evicted past CONVERSATION_CACHE_SIZE,
+and threads idle for CONVERSATION_TTL_SECONDS expire.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from eligibility_rules import get_rules, match_creditors
+from metrics import Counter, register
+from state_index import extract_states
+
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "500"))
+CONVERSATION_TTL_SECONDS = float(os.getenv("CONVERSATION_TTL_SECONDS", "1800"))
+# Earlier turns kept per thread, and how many of them go into a follow-up's prompt
+CONVERSATION_MAX_TURNS = 4
+CONVERSATION_HISTORY_TURNS = 2
+# A question starting like "and ..." / "what about ...", or one this short that names nothing
+# but a creditor/state ("In Texas?", "Clarity in CA?"), continues the thread
+FOLLOWUP_MAX_WORDS = 8
+# Words a bare creditor/state follow-up may carry besides the names
+FOLLOWUP_FILLER = {
+    "in", "for", "with", "at", "on", "from", "of", "the", "a", "an", "client", "clients",
+    "y", "en", "para", "con", "el", "la", "los", "las", "de", "del", "cliente",
+}
+
+FOLLOWUP = re.compile(r"^\W*(and|also|but|same|what about|how about|what if|then)\b", re.IGNORECASE)
+MENTION = re.compile(r"<@[^>]+>")
+WORD = re.compile(r"\w+")
+
+REUSED = register(Counter("docgpt_conversation_reused_total", "Follow-ups that reused thread context", labels=("what",)))
+
+
+def new_conversation():
+    return {"creditors": [], "states": [], "chunk_ids": None, "index_generation": None, "turns": []}
+
+
+def is_followup(question, conversation):
+    """True when `question` continues an earlier turn of the thread rather than starting over."""
+    if not conversation or not conversation["turns"]:
+        return False
+    text = MENTION.sub("", question).strip()
+    if FOLLOWUP.match(text):
+        return True
+    # A short standalone question ("What is the minimum debt amount?") starts over
+    return len(text.split()) <= FOLLOWUP_MAX_WORDS and names_only_entities(text)
+
+
+def names_only_entities(text, rules=None):
+    """True when `text` names a creditor and/or state and, apart from FOLLOWUP_FILLER, nothing else."""
+    rules = rules or get_rules()
+    state_index = rules["state_index"]
+    spans = [match["span"] for match in match_creditors(text, rules)]
+    if not spans and not extract_states(text, state_index, spans):
+        return False
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " + text[end:]
+    text = state_index["name_pattern"].sub(" ", text)
+    return all(word.lower() in FOLLOWUP_FILLER or word.upper() in state_index["codes"] for word in WORD.findall(text))
+
+
+def carry_over_entities(conversation, creditors, states, followup):
+    """
+    Fill in the creditor/state a follow-up leaves out from the thread, and remember the
+    result. Naming a different creditor starts a new topic: the thread's chunks are dropped.
+    """
+    if creditors and set(creditors) != set(conversation["creditors"]):
+        conversation["chunk_ids"] = None
+    if followup:
+        if not creditors and conversation["creditors"]:
+            creditors = list(conversation["creditors"])
+            REUSED.inc("creditor")
+        if not states and conversation["states"]:
+            states = list(conversation["states"])
+            REUSED.inc("state")
+    conversation["creditors"], conversation["states"] = list(creditors), list(states)
+    return creditors, states
+
+
+def reusable_chunk_ids(conversation, index_generation, followup):
+    """The chunk ids retrieved earlier in the thread, if a follow-up may reuse them."""
+    if not followup or conversation["chunk_ids"] is None or conversation["index_generation"] != index_generation:
+        return None
+    REUSED.inc("chunks")
+    return conversation["chunk_ids"]
+
+
+def remember_chunks(conversation, chunk_ids, index_generation):
+    conversation["chunk_ids"] = list(chunk_ids)
+    conversation["index_generation"] = index_generation
+
+
+def remember_turn(conversation, question, answer):
+    conversation["turns"] = (conversation["turns"] + [{"question": question, "answer": answer}])[-CONVERSATION_MAX_TURNS:]
+
+
+def format_history(conversation, turns=CONVERSATION_HISTORY_TURNS):
+    """The thread's last turns as prompt text ("" when there are none)."""
+    return "\n\n".join(
+        f"Q: {MENTION.sub('', turn['question']).strip()}\nA: {turn['answer']}" for turn in conversation["turns"][-turns:]
+    )
+
+
+class ConversationCache:
+    """LRU + TTL map of (channel, thread_ts) -> conversation."""
+
+    def __init__(self, max_threads=CONVERSATION_CACHE_SIZE, ttl=CONVERSATION_TTL_SECONDS, clock=time.monotonic):
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (last used, conversation), least recently used first
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def get(self, channel, thread_ts):
+        """The thread's conversation, or None if it is unknown or expired."""
+        key = (channel, thread_ts)
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                del self.entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries[key] = (now, entry[1])
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, channel, thread_ts, conversation):
+        key = (channel, thread_ts)
+        now = self.clock()
+        with self.lock:
+            self.entries[key] = (now, conversation)
+            self.entries.move_to_end(key)
+            # Expired threads go first, then the least recently used ones
+            while self.entries:
+                oldest_key, (last_used, _) = next(iter(self.entries.items()))
+                if now - last_used > self.ttl:
+                    self.stats["expired"] += 1
+                elif len(self.entries) > self.max_threads:
+                    self.stats["evicted"] += 1
+                else:
+                    break
+                del self.entries[oldest_key]
+
+    def report(self):
+        with self.lock:
+            return dict(self.stats, threads=len(self.entries), max_threads=self.max_threads, ttl_seconds=self.ttl)
+
+
+_conversations = None
+_conversations_lock = threading.Lock()
+
+
+def get_conversations():
+    global _conversations
+    with _conversations_lock:
+        if _conversations is None:
+            _conversations = ConversationCache()
+        return _conversations
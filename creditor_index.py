@@ -0,0 +1,131 @@
+import re
+
+# Aliases up to this many characters (squashed) must match exactly
+EXACT_ONLY_MAX_LEN = 4
+# Longer aliases tolerate 1 edit, and 2 edits from this length on
+TWO_EDITS_MIN_LEN = 11
+# Fuzzy matches must agree on this many leading characters ("landmark" is not "lendmark")
+FUZZY_PREFIX_LEN = 2
+# Agents sometimes split a name ("Good Leap") so windows may span one token more than the alias
+EXTRA_WINDOW_TOKENS = 1
+
+TOKEN = re.compile(r"[a-z0-9$&'’/]+")
+
+
+def squash(text):
+    """Normalized form used for matching: lowercase alphanumerics only, "$" read as "s"."""
+    return re.sub(r"[^a-z0-9]", "", text.lower().replace("$", "s"))
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def max_distance(alias):
+    if len(alias) <= EXACT_ONLY_MAX_LEN:
+        return 0
+    return 2 if len(alias) >= TWO_EDITS_MIN_LEN else 1
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 as soon as it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def build_creditor_index(aliases):
+    """
+    Build a fuzzy index over creditor aliases ({alias: creditor key}).
+    Aliases are squashed ("Good Leap" -> "goodleap") and indexed by trigram.
+    """
+    exact = {}
+    trigram_aliases = {}
+    max_tokens = 1
+    for alias, key in aliases.items():
+        squashed = squash(alias)
+        if not squashed or squashed in exact:
+            continue
+        exact[squashed] = key
+        max_tokens = max(max_tokens, len(TOKEN.findall(alias)))
+        if len(squashed) > EXACT_ONLY_MAX_LEN:
+            for gram in trigrams(squashed):
+                trigram_aliases.setdefault(gram, set()).add(squashed)
+    return {
+        "exact": exact,
+        "trigrams": trigram_aliases,
+        "max_tokens": max_tokens + EXTRA_WINDOW_TOKENS,
+        "max_len": max((len(a) for a in exact), default=0),
+    }
+
+
+def _best_alias(window, creditor_index):
+    """Return (alias, distance) for the closest alias within its edit threshold, or None."""
+    exact = creditor_index["exact"]
+    if window in exact:
+        return window, 0
+    # Plural/possessive forms of short exact-only aliases ("ncbs", "bhg's")
+    if window.endswith("s") and len(window) - 1 <= EXACT_ONLY_MAX_LEN and window[:-1] in exact:
+        return window[:-1], 0
+    if len(window) <= EXACT_ONLY_MAX_LEN or len(window) > creditor_index["max_len"] + 2:
+        return None
+
+    grams = trigrams(window)
+    shared = {}
+    for gram in grams:
+        for alias in creditor_index["trigrams"].get(gram, ()):
+            shared[alias] = shared.get(alias, 0) + 1
+
+    best = None
+    for alias, count in shared.items():
+        limit = max_distance(alias)
+        # One edit touches at most three trigrams
+        if count < len(grams) - 3 * limit or alias[:FUZZY_PREFIX_LEN] != window[:FUZZY_PREFIX_LEN]:
+            continue
+        distance = edit_distance(window, alias, limit)
+        if distance <= limit and (best is None or distance < best[1]):
+            best = (alias, distance)
+    return best
+
+
+def resolve_creditors(question, creditor_index):
+    """
+    Find creditor mentions in a question, tolerating misspellings, spacing and "$" for "s".
+    Returns non-overlapping matches best first, each as a dict with the creditor key,
+    the matched alias, the edit distance and the (start, end) span in the question.
+    """
+    tokens = [(m.group(0), m.start(), m.end()) for m in TOKEN.finditer(question.lower())]
+    candidates = []
+    for start in range(len(tokens)):
+        window = ""
+        for end in range(start, min(start + creditor_index["max_tokens"], len(tokens))):
+            window += squash(tokens[end][0])
+            if not window:
+                continue
+            best = _best_alias(window, creditor_index)
+            if best:
+                alias, distance = best
+                candidates.append((distance, -(end - start), start, end, alias))
+
+    matches = []
+    taken = set()
+    for distance, _, start, end, alias in sorted(candidates):
+        span = set(range(start, end + 1))
+        if span & taken:
+            continue
+        taken |= span
+        matches.append({
+            "creditor": creditor_index["exact"][alias],
+            "alias": alias,
+            "distance": distance,
+            "span": (tokens[start][1], tokens[end][2]),
+        })
+    return matches
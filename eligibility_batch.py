@@ -0,0 +1,208 @@
+import math
+import re
+from codex_index import match_codex
+from creditor_index import resolve_creditors
+from eligibility_rules import get_rules, match_creditors, evaluate_creditor, VERDICT_EMOJI
+from state_index import extract_states
+
+AMOUNT = re.compile(r"\$?\s*(\d[\d,]*(?:\.\d+)?)\s*$")
+
+
+def parse_state(state, rules):
+    """Accept a two-letter code or a full state name; return the code or None."""
+    if not state:
+        return None
+    state = state.strip()
+    if state.upper() in rules["state_index"]["codes"]:
+        return state.upper()
+    states = extract_states(state, rules["state_index"])
+    if not states:
+        raise ValueError(f"Unknown state: {state}")
+    return states[0]
+
+
+def normalize_debts(debts):
+    """Validate the debt list and coerce balances to floats."""
+    if not isinstance(debts, list) or not debts:
+        raise ValueError("debts must be a non-empty list")
+    normalized = []
+    for debt in debts:
+        if not isinstance(debt, dict) or not str(debt.get("creditor", "")).strip():
+            raise ValueError("each debt needs a creditor name")
+        try:
+            balance = float(str(debt.get("balance", 0)).replace(",", "").replace("$", ""))
+        except ValueError:
+            raise ValueError(f"invalid balance for {debt['creditor']}: {debt.get('balance')}")
+        # float() accepts "nan" and "inf", which would break every share and limit check
+        if not math.isfinite(balance):
+            raise ValueError(f"invalid balance for {debt['creditor']}: {debt.get('balance')}")
+        if balance < 0:
+            raise ValueError(f"negative balance for {debt['creditor']}")
+        normalized.append({"creditor": str(debt["creditor"]).strip(), "balance": balance})
+    return normalized
+
+
+def parse_debt_file_text(text):
+    """
+    Parse slash-command text such as "CA; Oportun 2,500; Discover $4000; Chase 8000"
+    into (state, debts). Items are separated by ";" or new lines; an item without an
+    amount (or "state: X") names the client's state.
+    """
+    state = None
+    debts = []
+    for item in re.split(r"[;\n]", text):
+        item = item.strip()
+        if not item:
+            continue
+        if item.lower().startswith("state"):
+            state = item.split(":", 1)[-1].strip()
+            continue
+        amount = AMOUNT.search(item)
+        if amount and item[:amount.start()].strip():
+            debts.append({"creditor": item[:amount.start()].strip(" :-"), "balance": amount.group(1)})
+        elif state is None:
+            state = item
+        else:
+            raise ValueError(f"Could not read a balance in: {item}")
+    return state, debts
+
+
+def _limit_results(debts, total, rules):
+    """Check the percentage-of-file limits (e.g. Oportun <= 25%, Discover/AMEX < 70%) against the totals."""
+    results = []
+    for key, limit in rules["limits"].items():
+        members = [d for d in debts if d["limit"] == key]
+        if not members:
+            continue
+        balance = sum(d["balance"] for d in members)
+        share = balance / total if total else 0.0
+        if limit.get("inclusive"):
+            ok = share <= limit["max_share"]
+        else:
+            ok = share < limit["max_share"]
+        if limit.get("single_account_ineligible") and len(debts) == 1:
+            ok = False
+        results.append({
+            "limit": limit["name"],
+            "program": limit["program"],
+            "balance": balance,
+            "share": round(share, 4),
+            "max_share": limit["max_share"],
+            "ok": ok,
+            "rule": limit["en"],
+        })
+        if not ok:
+            for debt in members:
+                entry = debt["programs"].get(limit["program"])
+                if entry is None or entry["verdict"] != "rejected":
+                    debt["programs"][limit["program"]] = {
+                        "verdict": "rejected",
+                        "reason": f"Over the {limit['name']} limit ({share:.0%} of the file). {limit['en']}",
+                    }
+    return results
+
+
+def check_debt_file(debts, state=None, retrieve=None, rules=None):
+    """
+    Check a whole client debt file in one pass.
+    Each creditor is resolved against the rules table and the policy codex. Percentage limits
+    are checked against the file totals. Creditors no rule covers are looked up with one batched
+    `retrieve(queries)` call, which returns the supporting passages for each query.
+    """
+    rules = rules or get_rules()
+    debts = normalize_debts(debts)
+    state = parse_state(state, rules)
+    states = [state] if state else []
+    total = sum(d["balance"] for d in debts)
+
+    checked = []
+    for debt in debts:
+        matches = match_creditors(debt["creditor"], rules)
+        creditor = matches[0]["creditor"] if matches else None
+        limit_matches = resolve_creditors(debt["creditor"], rules["limit_index"])
+        row = {
+            "creditor": debt["creditor"],
+            "matched": creditor,
+            "name": rules["creditors"][creditor]["name"] if creditor else None,
+            "balance": debt["balance"],
+            "share": round(debt["balance"] / total, 4) if total else 0.0,
+            "limit": limit_matches[0]["creditor"] if limit_matches else None,
+            "programs": {},
+            "codex": [{"topic": entry["topic"], "text": entry["text"]} for entry, _ in match_codex(debt["creditor"])],
+            "evidence": [],
+        }
+        if creditor:
+            verdict = evaluate_creditor(creditor, states, rules)
+            for program, entry in verdict["programs"].items():
+                if entry:
+                    row["programs"][program] = {"verdict": entry["verdict"], "reason": entry["en"]}
+        checked.append(row)
+
+    limits = _limit_results(checked, total, rules)
+
+    # Creditors without a rule: one batched retrieval for all of them
+    unresolved = [row for row in checked if row["matched"] is None]
+    if unresolved and retrieve:
+        passages = retrieve([f"Is {row['creditor']} an acceptable creditor?" for row in unresolved])
+        for row, found in zip(unresolved, passages):
+            row["evidence"] = [{"source": src, "text": chunk} for chunk, src in found]
+    for row in checked:
+        if row["codex"]:
+            reason = row["codex"][0]["text"]
+        elif row["evidence"]:
+            reason = "No deterministic rule; check the evidence passages."
+        else:
+            reason = "No deterministic rule found."
+        for program in rules["programs"]:
+            row["programs"].setdefault(program, {"verdict": "review", "reason": reason})
+
+    state_service = {}
+    if state:
+        state_service = {
+            program: {"verdict": entry["verdict"], "reason": entry["en"]}
+            for program, entry in ((p, rules["table"].get(("*", p, state))) for p in rules["programs"]) if entry
+        }
+
+    summary = {}
+    for program in rules["programs"]:
+        rejected = [row for row in checked if row["programs"][program]["verdict"] == "rejected"]
+        summary[program] = {
+            "rejected": len(rejected),
+            "review": sum(1 for row in checked if row["programs"][program]["verdict"] == "review"),
+            "eligible_balance": total - sum(row["balance"] for row in rejected),
+            "state_serviced": state_service.get(program, {}).get("verdict") != "rejected",
+        }
+
+    for row in checked:
+        row.pop("limit")
+    return {
+        "state": state,
+        "total_balance": total,
+        "debts": checked,
+        "limits": limits,
+        "state_service": state_service,
+        "summary": summary,
+    }
+
+
+def format_debt_file_table(result):
+    """Slack-formatted verdict table for a checked debt file."""
+    emoji = dict(VERDICT_EMOJI, review="🔎")
+    lines = [f"📋 *Debt file check* — state: {result['state'] or 'not given'}, total ${result['total_balance']:,.2f}"]
+    for program, entry in result["state_service"].items():
+        lines.append(f"{emoji[entry['verdict']]} *{program.title()}:* {entry['reason']}")
+    lines.append("```")
+    lines.append(f"{'Creditor':<28}{'Balance':>12}{'Share':>8}  Elevate  Clarity")
+    for row in result["debts"]:
+        verdicts = "  ".join(f"{emoji[row['programs'][p]['verdict']]:<7}" for p in ("elevate", "clarity"))
+        lines.append(f"{row['creditor'][:27]:<28}{row['balance']:>12,.2f}{row['share']:>8.0%}  {verdicts}")
+    lines.append("```")
+    for limit in result["limits"]:
+        mark = "✅" if limit["ok"] else "❌"
+        lines.append(f"{mark} *{limit['limit']}* is {limit['share']:.0%} of the file ({limit['program'].title()}): {limit['rule']}")
+    for row in result["debts"]:
+        reasons = {p: v["reason"] for p, v in row["programs"].items() if v["verdict"] != "accepted"}
+        if reasons:
+            detail = " / ".join(f"{p.title()}: {r}" for p, r in reasons.items())
+            lines.append(f"• *{row['creditor']}* — {detail}")
+    return "\n".join(lines)
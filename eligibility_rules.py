@@ -0,0 +1,331 @@
+import json
+import os
+import re
+import threading
+import time
+from creditor_index import build_creditor_index, resolve_creditors
+from state_index import build_state_index, extract_states
+
+RULES_PATH = os.getenv("ELIGIBILITY_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "eligibility_rules.json"))
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "documents")
+RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", "5"))
+
+VERDICT_EMOJI = {"rejected": "❌", "accepted": "✅", "conditional": "⚠️"}
+
+BULLETS = ("•", "-")
+
+
+def normalize_name(text):
+    """Lowercase, unify apostrophes and collapse whitespace for name comparisons."""
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    return " ".join(text.split())
+
+
+def parse_bullet_section(text, section):
+    """
+    Return the bullet items listed under the first line containing `section`.
+    Blank lines before the first bullet are skipped; the section ends at the
+    first non-bullet line after that.
+    """
+    items = []
+    in_section = False
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not in_section:
+            in_section = section.lower() in stripped.lower()
+            continue
+        if stripped.startswith(BULLETS):
+            items.append(stripped.lstrip("".join(BULLETS)).strip())
+        elif stripped and items:
+            break
+        elif stripped:
+            # Header followed directly by prose, nothing to parse
+            break
+    return items
+
+
+def clean_creditor_name(item):
+    """Drop qualifiers such as "(if federal)" from a listed creditor name."""
+    return re.sub(r"\s*\(.*?\)\s*", " ", item).strip()
+
+
+STATE_LINE = re.compile(r"^(?:❌\s*)?([A-Z]{2})\s*[–-]\s*([A-Za-z .]+?)\s*(?:\((.*)\))?\s*$")
+
+
+def parse_state_list(text):
+    """
+    Parse StateList.txt into {code: name} plus the states that are not serviced.
+    Not-serviced states map to {program: exception text} for programs that still serve them.
+    """
+    states = {}
+    not_serviced = {}
+    in_not_serviced = False
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if "NOT SERVICED" in stripped.upper():
+            in_not_serviced = True
+            continue
+        if in_not_serviced and stripped.upper().startswith("NOTE"):
+            in_not_serviced = False
+        match = STATE_LINE.match(stripped)
+        if not match:
+            continue
+        code, name, qualifier = match.groups()
+        states[code] = name.strip()
+        if in_not_serviced:
+            exceptions = {}
+            exception = re.match(r"except\s+(\w+)\s+(.*)", qualifier or "", re.IGNORECASE)
+            if exception:
+                exceptions[exception.group(1).lower()] = exception.group(2).strip()
+            not_serviced[code] = exceptions
+    return states, not_serviced
+
+
+def _read_document(filename, documents_dir):
+    path = os.path.join(documents_dir, filename)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read(), path
+
+
+def _fill(template, **values):
+    """Format the {name}/{state} placeholders of a templated rule or verdict."""
+    if isinstance(template, dict):
+        return {key: _fill(value, **values) for key, value in template.items()}
+    if isinstance(template, str):
+        return template.format(**values)
+    return template
+
+
+def compile_rules(rules_path=None, documents_dir=None):
+    """
+    Compile the rules file and the parsed policy documents into an indexed
+    (creditor, program, state) -> verdict table. State None is the default
+    verdict; creditor "*" holds state-level service restrictions.
+    """
+    rules_path = rules_path or RULES_PATH
+    documents_dir = documents_dir or DOCUMENTS_DIR
+    with open(rules_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    programs = spec["programs"]
+    creditors = {}
+    aliases = {}
+    table = {}
+    sources = [rules_path]
+
+    def find_existing(name):
+        normalized = normalize_name(name).replace("'", "")
+        for alias, key in aliases.items():
+            alias_plain = alias.replace("'", "")
+            if re.search(r"(?<!\w)" + re.escape(alias_plain), normalized) or \
+                    re.search(r"(?<!\w)" + re.escape(normalized) + r"(?!\w)", alias_plain):
+                return key
+        return None
+
+    def add_rules(key, rules):
+        for rule in rules:
+            for state in rule.get("states") or [None]:
+                for program in programs:
+                    if program in rule:
+                        table[(key, program, state)] = dict(rule[program], note=rule.get("note"))
+
+    def add_creditor(key, name, kind, names, rules):
+        creditors[key] = {"key": key, "name": name, "kind": kind, "aliases": []}
+        for alias in names:
+            add_alias(key, alias)
+        add_rules(key, rules)
+
+    def add_alias(key, alias):
+        alias = normalize_name(alias)
+        if alias not in aliases:
+            aliases[alias] = key
+            creditors[key]["aliases"].append(alias)
+
+    for creditor in spec["creditors"]:
+        add_creditor(creditor["key"], creditor["name"], creditor.get("kind", "creditor"),
+                     creditor.get("aliases", [creditor["key"]]), creditor["rules"])
+
+    disqualified = spec.get("disqualified")
+    if disqualified:
+        for name in disqualified["names"]:
+            existing = find_existing(name)
+            if existing:
+                add_alias(existing, name)
+            else:
+                add_creditor(normalize_name(name), name, "disqualified", [name], [disqualified["rule"]])
+
+    # Creditors listed in the policy documents; known names become aliases
+    for kind, document in spec.get("documents", {}).items():
+        if "section" not in document:
+            continue
+        text, path = _read_document(document["file"], documents_dir)
+        if path not in sources:
+            sources.append(path)
+        for item in parse_bullet_section(text, document["section"]):
+            name = clean_creditor_name(item)
+            existing = find_existing(name)
+            if existing:
+                add_alias(existing, name)
+            else:
+                add_creditor(normalize_name(name), name, kind, [name], [_fill(document["rule"], name=name)])
+
+    states = {}
+    state_list = spec.get("documents", {}).get("state_list")
+    if state_list:
+        text, path = _read_document(state_list["file"], documents_dir)
+        sources.append(path)
+        states, not_serviced = parse_state_list(text)
+        for code, exceptions in not_serviced.items():
+            for program in programs:
+                if program in exceptions:
+                    entry = _fill(state_list["exception"], state=states[code], exception=exceptions[program])
+                else:
+                    entry = _fill(state_list["not_serviced"], state=states[code])
+                table[("*", program, code)] = dict(entry, note=None)
+
+    limits = spec.get("portfolio_limits", [])
+    limit_aliases = {normalize_name(alias): limit["key"] for limit in limits for alias in limit["aliases"]}
+
+    return {
+        "version": spec.get("version"),
+        "programs": programs,
+        "creditors": creditors,
+        "order": {key: position for position, key in enumerate(creditors)},
+        "aliases": aliases,
+        "creditor_index": build_creditor_index(aliases),
+        "table": table,
+        "states": states,
+        "state_index": build_state_index(states),
+        "limits": {limit["key"]: limit for limit in limits},
+        "limit_index": build_creditor_index(limit_aliases),
+        "sources": sources,
+        "mtimes": _source_mtimes(sources),
+    }
+
+
+def _source_mtimes(sources):
+    mtimes = []
+    for path in sources:
+        try:
+            mtimes.append(os.path.getmtime(path))
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
+_rules = None
+_rules_lock = threading.Lock()
+_last_check = 0.0
+
+
+def reload_rules(force=False):
+    """Recompile when the rules file or a source document changed. Keeps the old table on errors."""
+    global _rules, _last_check
+    with _rules_lock:
+        _last_check = time.monotonic()
+        if not force and _rules is not None and _source_mtimes(_rules["sources"]) == _rules["mtimes"]:
+            return _rules
+        try:
+            compiled = compile_rules()
+        except Exception as e:
+            if _rules is None:
+                raise
+            print(f"❌ Error reloading eligibility rules, keeping previous table: {e}")
+            return _rules
+        _rules = compiled
+        print(f"📐 Eligibility rules compiled: {len(compiled['creditors'])} creditors, {len(compiled['table'])} verdicts")
+        return _rules
+
+
+def get_rules():
+    """Current compiled rules, checking source files for changes at most every RELOAD_INTERVAL seconds."""
+    if _rules is None or time.monotonic() - _last_check >= RELOAD_INTERVAL:
+        return reload_rules()
+    return _rules
+
+
+def match_creditors(question, rules=None):
+    """Fuzzy creditor mentions in the question, with their spans (see creditor_index.resolve_creditors)."""
+    rules = rules or get_rules()
+    return resolve_creditors(question, rules["creditor_index"])
+
+
+def find_creditors(question, rules=None):
+    """Creditor keys mentioned in the question, in rules-file order."""
+    rules = rules or get_rules()
+    found = []
+    for match in match_creditors(question, rules):
+        if match["creditor"] not in found:
+            found.append(match["creditor"])
+    return sorted(found, key=rules["order"].get)
+
+
+def find_states(question, rules=None):
+    """State codes named in the question, by full name or as a code token."""
+    rules = rules or get_rules()
+    return extract_states(question, rules["state_index"])
+
+
+def extract_entities(question, rules=None):
+    """
+    Resolve a question's creditors and states in one pass.
+    Creditor names are matched first so "Virginia CU" is not also read as the state of Virginia.
+    """
+    rules = rules or get_rules()
+    matches = match_creditors(question, rules)
+    creditors = []
+    for match in matches:
+        if match["creditor"] not in creditors:
+            creditors.append(match["creditor"])
+    creditors.sort(key=rules["order"].get)
+    states = extract_states(question, rules["state_index"], [m["span"] for m in matches])
+    return creditors, states
+
+
+def evaluate_creditor(creditor, states=(), rules=None):
+    """
+    Look up the verdict of one creditor for every program. A state-specific
+    verdict overrides the default one; state service restrictions are reported separately.
+    """
+    rules = rules or get_rules()
+    table = rules["table"]
+    result = {
+        "creditor": creditor,
+        "name": rules["creditors"][creditor]["name"],
+        "state": None,
+        "programs": {},
+        "state_service": {},
+    }
+    for program in rules["programs"]:
+        entry = None
+        for state in states:
+            entry = table.get((creditor, program, state))
+            if entry:
+                result["state"] = state
+                break
+        result["programs"][program] = entry or table.get((creditor, program, None))
+    for state in states:
+        service = {p: table[("*", p, state)] for p in rules["programs"] if ("*", p, state) in table}
+        if service:
+            result["state_service"] = service
+            break
+    return result
+
+
+def format_verdict(result):
+    """Render an evaluated creditor as the (English, Spanish) answer texts."""
+    answers = []
+    for lang in ("en", "es"):
+        lines = []
+        note = None
+        for program, entry in result["programs"].items():
+            if entry is None:
+                continue
+            lines.append(f"{VERDICT_EMOJI[entry['verdict']]} *{program.title()}:* {entry[lang]}")
+            note = note or entry.get("note")
+        for program, entry in result["state_service"].items():
+            lines.append(f"{VERDICT_EMOJI[entry['verdict']]} *{program.title()}:* {entry[lang]}")
+        if note:
+            lines.append(f"📝 *{note[lang]}*")
+        answers.append("\n".join(lines))
+    return answers[0], answers[1]
@@ -0,0 +1,50 @@
+"""
+Production serving: gunicorn -c gunicorn.conf.py app:app
+
+The master builds the index store once (documents → chunks → embeddings → INDEX_STORE_DIR)
+before forking; every worker then opens it memory-mapped and read-only, so the vectors
+are held once in the page cache however many workers run. Slack events arrive on the
+/slack/events webhook in this mode (no Socket Mode thread per worker).
+
+That build runs in a child process: importing slack_doc_bot in the master would open the
+OpenAI HTTP session, the translation memory's SQLite connection and the bot's background
+threads there, and every forked worker would inherit them.
+
+Everything else is per worker: /metrics and /status describe the worker that served the
+request, the scheduler's per-user/per-channel limits and the thread follow-up cache apply
+within one worker, and only the first worker runs the warm-up replay (DEPLOYMENT_GUIDE.md,
+"Multi-worker serving").
+"""
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# Cold OpenAI calls can be slow; Slack itself only waits 3 s for the webhook ack
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = False
+accesslog = "-"
+
+
+# Run by on_starting in a child process, so the master holds no connections or threads to fork
+PREPARE = """
+import slack_doc_bot
+slack_doc_bot.build_index_store()
+slack_doc_bot.reload_rules(force=True)
+slack_doc_bot.prewarm_translations()
+slack_doc_bot.build_answer_bank()
+"""
+
+
+def on_starting(server):
+    """Build (or confirm) the shared index store, translation memory and answer bank before forking."""
+    subprocess.run([sys.executable, "-c", PREPARE], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+
+def post_worker_init(worker):
+    import app
+    # The warm-up replay calls OpenAI; only the first worker runs it, so restarts cost one replay, not one per worker
+    app.initialize_bot(use_store=True, warmup=worker.age == 1)
@@ -0,0 +1,110 @@
+"""
+On-disk vector index and chunk store, shared read-only by every worker process.
+
+    build once:   save_store(directory, vectors, chunks, chunk_sources, fingerprint)
+    each worker:  index, chunks, chunk_sources = open_store(directory)
+
+Vectors and their squared norms are .npy files opened with mmap_mode="r", and chunk
+texts are a ChunkStore (one UTF-8 file addressed by an offsets array, sources interned),
+so N workers share the page cache instead of each holding (and embedding) its own copy. MmapFlatIndex.search returns
+the same (distances, ids) as faiss.IndexFlatL2.search.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from chunk_store import ChunkStore
+
+# Next to this module, so the gunicorn master and its workers find the same store whatever their working directory
+INDEX_STORE_DIR = os.getenv("INDEX_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_store"))
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Bump when chunking, PDF extraction or the store layout changes so stores built by older code are rebuilt
+STORE_FORMAT = 3
+
+
+def documents_fingerprint(folder_path="documents", extra=""):
+    """Hash of the document names, sizes and mtimes (plus `extra`), used to detect a stale store."""
+    digest = hashlib.sha1(f"{STORE_FORMAT}:{EMBEDDING_MODEL}:{extra}".encode("utf-8"))
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.endswith(".pdf") or filename.endswith(".txt"):
+            stat = os.stat(os.path.join(folder_path, filename))
+            digest.update(f"{filename}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MmapFlatIndex:
+    """Exact L2 search over memory-mapped float32 vectors (faiss.IndexFlatL2 compatible)."""
+
+    def __init__(self, vectors_path, norms_path):
+        self.vectors = np.load(vectors_path, mmap_mode="r")
+        self.norms = np.load(norms_path, mmap_mode="r")
+        self.ntotal, self.d = self.vectors.shape
+
+    def search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32)
+        k_eff = min(k, self.ntotal)
+        # ||v - q||^2 = ||v||^2 - 2 v.q + ||q||^2
+        distances = self.norms[None, :] - 2.0 * (queries @ self.vectors.T) + (queries * queries).sum(axis=1)[:, None]
+        ids = np.argpartition(distances, k_eff - 1, axis=1)[:, :k_eff] if k_eff < self.ntotal else \
+            np.tile(np.arange(self.ntotal), (len(queries), 1))
+        rows = np.arange(len(queries))[:, None]
+        order = np.argsort(distances[rows, ids], axis=1)
+        ids = ids[rows, order]
+        D = np.full((len(queries), k), np.float32(3.4028235e38), dtype=np.float32)
+        I = np.full((len(queries), k), -1, dtype=np.int64)
+        D[:, :k_eff] = np.maximum(distances[rows, ids], 0)
+        I[:, :k_eff] = ids
+        return D, I
+
+
+def save_store(directory, vectors, chunks, chunk_sources, fingerprint):
+    """Write the store to a temporary directory and swap it into place."""
+    vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "vectors.npy"), vectors)
+    np.save(os.path.join(tmp, "norms.npy"), (vectors * vectors).sum(axis=1).astype(np.float32))
+    store = chunks if isinstance(chunks, ChunkStore) else ChunkStore.from_lists(chunks, chunk_sources)
+    store.save(tmp)
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": STORE_FORMAT,
+            "fingerprint": fingerprint,
+            "model": EMBEDDING_MODEL,
+            "count": len(store),
+            "dim": int(vectors.shape[1]) if len(vectors) else 0,
+            "created": time.time(),
+        }, f)
+    old = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_current(directory, fingerprint):
+    manifest = read_manifest(directory)
+    return manifest is not None and manifest.get("format") == STORE_FORMAT and manifest.get("fingerprint") == fingerprint
+
+
+def open_store(directory):
+    """(index, chunks, chunk_sources) opened read-only and memory-mapped; chunks is a ChunkStore."""
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No index store in {directory}")
+    index = MmapFlatIndex(os.path.join(directory, "vectors.npy"), os.path.join(directory, "norms.npy"))
+    chunks = ChunkStore.open(directory)
+    return index, chunks, chunks.sources
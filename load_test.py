@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Find how many concurrent agent questions one bot instance sustains.
+
+    python load_test.py --rates 0.5,1,2,4 --duration 30
+    python load_test.py --target socket --rates 1,2,4 --openai-latency lognormal:1.2,0.5
+    python load_test.py --command "gunicorn -c gunicorn.conf.py app:app" --rates 2,4,8
+
+A fake Slack Web API and a fake OpenAI API (benchmark_fakes) run on 127.0.0.1 with the
+given latency distributions. The bot is pointed at them with SLACK_API_URL and
+OPENAI_API_BASE:
+
+  --target webhook  starts `python app.py` (or --command) and POSTs app_mention event
+                    payloads to /slack/events,
+                    signed with the SLACK_SIGNING_SECRET the app is started with
+  --target socket   imports slack_doc_bot and hands the same payloads to the Bolt app the
+                    way SocketModeHandler does (app.dispatch, socket_mode request), without
+                    the websocket transport
+
+Events arrive as a Poisson process at each rate in --rates for --duration seconds, from
+--users agents across --channels channels. A question's end-to-end latency runs from
+sending the event to the fake Slack receiving the answer in the question's thread. Each
+step reports throughput, p50/p95/p99 latency and the error rate (rejected events, apologies,
+degraded answers and questions unanswered after --timeout, each counted under its own reason). The saturation point is the first rate where p95
+exceeds --slo, errors exceed --max-error-rate or throughput falls below 90% of the
+offered rate.
+
+Latency distributions: fixed:S, uniform:LOW,HIGH, exp:MEAN, lognormal:MEDIAN,SIGMA (seconds).
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+from slack_sdk.signature import SignatureVerifier
+
+from benchmark_fakes import FakeOpenAIServer, FakeSlackServer
+from bulk_runner import percentile
+from retrieval_eval import GOLD_PATH, read_gold
+
+BOT_USER_ID = "U0DOCGPT"
+SIGNING_SECRET = "load-test-signing-secret"
+# How the bot's thread replies start (slack_doc_bot.respond and degraded_answer)
+ACK_PREFIX = "🔍 Processing"
+ERROR_REPLIES = (("⚠️ Sorry", "apology"), ("⚠️ *Degraded answer:*", "degraded"))
+# Questions the rules engine, the codex and the answer bank settle, next to the retrieval ones
+FIXED_QUESTIONS = [
+    "Is Oportun accepted for a client in California?",
+    "When is the first payment date?",
+    "¿El cliente puede incluir préstamos estudiantiles privados?",
+    "Are payday loans accepted in Texas?",
+]
+
+
+def parse_latency(spec, seed=0):
+    """A latency(kind) -> seconds sampler for 'fixed:S', 'uniform:LOW,HIGH', 'exp:MEAN' or 'lognormal:MEDIAN,SIGMA'."""
+    name, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    rng = np.random.default_rng(seed)
+    lock = threading.Lock()
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: rng.uniform(values[0], values[1]),
+        "exp": lambda: rng.exponential(values[0]),
+        "lognormal": lambda: values[0] * float(np.exp(rng.normal(0.0, values[1]))),
+    }
+    if name not in samplers:
+        raise ValueError(f"Unknown latency distribution {spec!r}")
+
+    def latency(kind=None):
+        with lock:
+            return max(float(samplers[name]()), 0.0)
+    return latency
+
+
+def questions():
+    gold, _ = read_gold(GOLD_PATH)
+    return [case["question"] for case in gold] + FIXED_QUESTIONS
+
+
+def event_payload(number, question, user, channel, now=None):
+    """An app_mention event_callback as Slack delivers it."""
+    now = now or time.time()
+    ts = f"{int(now)}.{number:06d}"
+    return {
+        "token": "load-test",
+        "team_id": "T0LOAD",
+        "api_app_id": "A0DOCGPT",
+        "type": "event_callback",
+        "event_id": f"Ev{number:010d}",
+        "event_time": int(now),
+        "authorizations": [{"team_id": "T0LOAD", "user_id": BOT_USER_ID, "is_bot": True}],
+        "event": {
+            "type": "app_mention",
+            "client_msg_id": str(uuid.uuid4()),
+            "user": user,
+            "text": f"<@{BOT_USER_ID}> {question}",
+            "ts": ts,
+            "event_ts": ts,
+            "channel": channel,
+        },
+    }
+
+
+class Tracker:
+    """Matches answers posted to the fake Slack with the events that asked for them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # thread ts -> sent at
+        self.latencies = {}  # thread ts -> seconds
+        self.failed = {}  # thread ts -> reason
+        self.answered = threading.Condition(self.lock)
+
+    def sent(self, ts):
+        with self.lock:
+            self.pending[ts] = time.perf_counter()
+
+    def fail(self, ts, reason):
+        with self.lock:
+            if self.pending.pop(ts, None) is not None:
+                self.failed[ts] = reason
+                self.answered.notify_all()
+
+    def on_message(self, message):
+        """A reply in a question's thread: the answer, or an apology / degraded answer counted as an error."""
+        text = message["text"] or ""
+        if text.startswith(ACK_PREFIX):
+            return
+        reason = next((reason for prefix, reason in ERROR_REPLIES if text.startswith(prefix)), None)
+        with self.lock:
+            started = self.pending.pop(message["thread_ts"], None)
+            if started is None:
+                return
+            if reason:
+                self.failed[message["thread_ts"]] = reason
+            else:
+                self.latencies[message["thread_ts"]] = time.perf_counter() - started
+            self.answered.notify_all()
+
+    def drain(self, timeout):
+        """Wait for outstanding answers; what is left after `timeout` counts as timed out."""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.pending and time.monotonic() < deadline:
+                self.answered.wait(min(0.5, max(deadline - time.monotonic(), 0)))
+            for ts in list(self.pending):
+                self.failed[ts] = "timeout"
+            self.pending.clear()
+
+    def take(self):
+        with self.lock:
+            latencies, failed = self.latencies, self.failed
+            self.latencies, self.failed = {}, {}
+        return latencies, failed
+
+
+def webhook_sender(url, signing_secret=SIGNING_SECRET):
+    verifier = SignatureVerifier(signing_secret)
+
+    def send(payload):
+        body = json.dumps(payload)
+        timestamp = str(int(time.time()))
+        request = urllib.request.Request(f"{url}/slack/events", data=body.encode("utf-8"), headers={
+            "Content-Type": "application/json",
+            "X-Slack-Request-Timestamp": timestamp,
+            "X-Slack-Signature": verifier.generate_signature(timestamp=timestamp, body=body),
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return None if response.status == 200 else f"http_{response.status}"
+        except urllib.error.HTTPError as e:
+            return f"http_{e.code}"
+        except Exception as e:
+            return type(e).__name__
+    return send
+
+
+def socket_sender(bot):
+    from slack_bolt.request import BoltRequest
+
+    def send(payload):
+        try:
+            response = bot.app.dispatch(BoltRequest(body=payload, mode="socket_mode"))
+        except Exception as e:
+            return type(e).__name__
+        return None if response.status == 200 else f"bolt_{response.status}"
+    return send
+
+
+def run_step(send, tracker, rate, duration, timeout, users, channels, pool, start_number, seed):
+    """Offer `rate` events/second for `duration` seconds and summarize the answers."""
+    rng = np.random.default_rng(seed)
+    senders = []
+    started = time.perf_counter()
+    arrival = 0.0
+    number = start_number
+    while True:
+        arrival += rng.exponential(1.0 / rate)
+        if arrival >= duration:
+            break
+        time.sleep(max(started + arrival - time.perf_counter(), 0))
+        payload = event_payload(number, pool[rng.integers(len(pool))],
+                                f"U{rng.integers(users):05d}", f"C{rng.integers(channels):04d}")
+        ts = payload["event"]["ts"]
+        tracker.sent(ts)
+
+        def deliver(payload=payload, ts=ts):
+            error = send(payload)
+            if error:
+                tracker.fail(ts, error)
+        thread = threading.Thread(target=deliver, daemon=True)
+        thread.start()
+        senders.append(thread)
+        number += 1
+    for thread in senders:
+        thread.join(10)
+    tracker.drain(timeout)
+    elapsed = time.perf_counter() - started
+    latencies, failed = tracker.take()
+    values = sorted(latencies.values())
+    sent = len(latencies) + len(failed)
+    reasons = {}
+    for reason in failed.values():
+        reasons[reason] = reasons.get(reason, 0) + 1
+    return {
+        "rate": rate,
+        "sent": sent,
+        "answered": len(values),
+        "throughput": round(len(values) / elapsed, 3) if elapsed else 0.0,
+        "p50_s": round(percentile(values, 50), 3),
+        "p95_s": round(percentile(values, 95), 3),
+        "p99_s": round(percentile(values, 99), 3),
+        "error_rate": round(len(failed) / sent, 4) if sent else 0.0,
+        "errors": reasons,
+    }, number
+
+
+def saturated(step, slo, max_error_rate):
+    """Why this step is past the saturation point, or None."""
+    if step["error_rate"] > max_error_rate:
+        return f"error rate {step['error_rate']:.1%}"
+    if step["p95_s"] > slo:
+        return f"p95 {step['p95_s']:.1f}s over the {slo:g}s SLO"
+    if step["sent"] and step["answered"] / step["sent"] < 0.9:
+        return "fewer than 90% of the questions answered"
+    return None
+
+
+def bot_environment(slack, openai_server, workdir, warm_caches):
+    env = {
+        "SLACK_API_URL": slack.url,
+        "OPENAI_API_BASE": openai_server.url,
+        "SLACK_BOT_TOKEN": "xoxb-load-test",
+        "SLACK_SIGNING_SECRET": SIGNING_SECRET,
+        "OPENAI_API_KEY": "sk-load-test",
+        "WARMUP_ENABLED": "0",
+        "ANSWER_BANK_PATH": os.path.join(workdir, "answer_bank.json"),
+        "QUERY_LOG_PATH": os.path.join(workdir, "query_log.sqlite3"),
+        "TRANSLATION_MEMORY_PATH": os.path.join(workdir, "translation_memory.sqlite3"),
+        "INDEX_STORE_DIR": os.path.join(workdir, "index_store"),
+        "TRACE_LOG_PATH": os.path.join(workdir, "traces.jsonl"),
+        "SLOW_QUERY_LOG_PATH": os.path.join(workdir, "slow_queries.jsonl"),
+    }
+    if not warm_caches:
+        env.update(ANSWER_CACHE_SIZE="0", EMBEDDING_CACHE_SIZE="0")
+    return env
+
+
+def start_app(command, env, port, timeout=300):
+    """Start the web app and wait until /health reports the bot initialized."""
+    process = subprocess.Popen(command, shell=True, env=dict(os.environ, **env, PORT=str(port)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{command!r} exited with {process.returncode}")
+        with contextlib.suppress(Exception):
+            with urllib.request.urlopen(f"{url}/health", timeout=2) as response:
+                if json.load(response).get("bot_initialized"):
+                    return process, url
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{command!r} was not ready after {timeout}s")
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the bot with simulated Slack event bursts.")
+    parser.add_argument("--target", choices=("webhook", "socket"), default="webhook")
+    parser.add_argument("--command", default=f"{sys.executable} app.py", help="webhook target: command starting the app")
+    parser.add_argument("--rates", default="0.5,1,2,4", help="arrival rates to step through (events/second)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per rate")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for an answer")
+    parser.add_argument("--users", type=int, default=500, help="distinct agents asking")
+    parser.add_argument("--channels", type=int, default=50, help="distinct channels")
+    parser.add_argument("--openai-latency", default="lognormal:1.0,0.4", help="chat completion latency distribution")
+    parser.add_argument("--embedding-latency", default="lognormal:0.15,0.3", help="embedding latency distribution")
+    parser.add_argument("--slack-latency", default="fixed:0.05", help="Slack Web API latency distribution")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="share of OpenAI calls failing with a 500")
+    parser.add_argument("--warm-caches", action="store_true", help="keep the answer and embedding caches on")
+    parser.add_argument("--slo", type=float, default=10.0, help="p95 end-to-end latency objective (seconds)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    chat_latency = parse_latency(args.openai_latency, args.seed)
+    embedding_latency = parse_latency(args.embedding_latency, args.seed + 1)
+    openai_server = FakeOpenAIServer(lambda kind: embedding_latency() if kind == "embedding" else chat_latency(),
+                                     args.openai_error_rate, seed=args.seed)
+    slack = FakeSlackServer(parse_latency(args.slack_latency, args.seed + 2))
+    tracker = Tracker()
+    slack.listeners.append(tracker.on_message)
+    workdir = tempfile.mkdtemp(prefix="docgpt-load-")
+    env = bot_environment(slack, openai_server, workdir, args.warm_caches)
+
+    process = None
+    print(f"🚦 Starting the bot ({args.target}) against fake Slack {slack.url} and OpenAI {openai_server.url}...")
+    if args.target == "webhook":
+        process, url = start_app(args.command, env, free_port())
+        send = webhook_sender(url)
+    else:
+        os.environ.update(env)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            import slack_doc_bot as bot
+            bot.build_index()
+        send = socket_sender(bot)
+
+    pool = questions()
+    steps = []
+    saturation = None
+    number = 1
+    try:
+        for i, rate in enumerate(float(rate) for rate in args.rates.split(",")):
+            step, number = run_step(send, tracker, rate, args.duration, args.timeout, args.users, args.channels,
+                                    pool, number, args.seed + i)
+            steps.append(step)
+            errors = ", ".join(f"{reason}={count}" for reason, count in sorted(step["errors"].items())) or "none"
+            print(f"  {rate:>6.2f}/s  sent {step['sent']:>4}  answered {step['answered']:>4}  "
+                  f"throughput {step['throughput']:>6.2f}/s  p50 {step['p50_s']:.2f}s  p95 {step['p95_s']:.2f}s  "
+                  f"p99 {step['p99_s']:.2f}s  errors {step['error_rate']:.1%} ({errors})")
+            reason = saturated(step, args.slo, args.max_error_rate)
+            if reason:
+                saturation = {"rate": rate, "reason": reason,
+                              "max_sustained_rate": steps[-2]["rate"] if len(steps) > 1 else None}
+                break
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        slack.close()
+        openai_server.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if saturation:
+        sustained = saturation["max_sustained_rate"]
+        print(f"📉 Saturated at {saturation['rate']:g}/s ({saturation['reason']}); "
+              f"sustained {sustained:g}/s" if sustained else f"📉 Saturated at the first rate ({saturation['reason']})")
+    else:
+        print(f"📈 No saturation up to {steps[-1]['rate']:g}/s")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"target": args.target, "settings": vars(args), "steps": steps, "saturation": saturation},
+                      f, indent=2, ensure_ascii=False)
+        print(f"📝 Report written to {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters and histograms are plain objects guarded by one lock each; observing a value
+is a dict lookup, a bisect and two additions, so timing every stage of every question
+costs microseconds.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; OpenAI calls land in the 0.25-20 s range, FAISS and rules well under 10 ms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        with self.lock:
+            return self.values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            if position < len(self.buckets):
+                series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, *label_values):
+        """{"count", "sum", "buckets": {le: cumulative count}} for one label set."""
+        with self.lock:
+            series = list(self.series.get(label_values) or [0] * (len(self.buckets) + 2))
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets, series):
+            total += count
+            cumulative[bound] = total
+        return {"count": series[-1], "sum": series[-2], "buckets": cumulative}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((key, list(series)) for key, series in self.series.items())
+        for label_values, series in items:
+            total = 0
+            for bound, count in zip(self.buckets, series):
+                total += count
+                labels = _label_text(self.labels + ("le",), label_values + (repr(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {total}")
+            labels = _label_text(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, label_values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, label_values)} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "docgpt_stage_seconds",
+    "Time spent in each answer stage (detect_language, translate_question, embed_query, faiss_search, gpt_answer, translate_answer)",
+    labels=("stage",),
+)
+QUESTION_SECONDS = Histogram("docgpt_question_seconds", "End-to-end time to answer a question")
+DECISION_PATHS = Counter("docgpt_decision_path_total", "Questions answered per decision path", labels=("path",))
+OPENAI_TOKENS = Counter("docgpt_openai_tokens_total", "OpenAI tokens used", labels=("model", "type"))
+OPENAI_CALLS = Counter("docgpt_openai_calls_total", "OpenAI API calls", labels=("model",))
+ERRORS = Counter("docgpt_errors_total", "Errors while answering", labels=("stage",))
+CONTEXT_TOKENS_SAVED = Counter("docgpt_context_tokens_saved_total", "Prompt tokens saved by context packing")
+
+REGISTRY = [STAGE_SECONDS, QUESTION_SECONDS, DECISION_PATHS, OPENAI_TOKENS, OPENAI_CALLS, ERRORS, CONTEXT_TOKENS_SAVED]
+
+
+def register(metric):
+    """Add a metric defined in another module; a re-imported module gets the existing one back."""
+    for existing in REGISTRY:
+        if existing.name == metric.name:
+            return existing
+    REGISTRY.append(metric)
+    return metric
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of the block under STAGE_SECONDS{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+def record_tokens(model, usage):
+    OPENAI_CALLS.inc(model)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            OPENAI_TOKENS.inc(model, kind.split("_")[0], amount=usage[kind])
+
+
+def render_prometheus():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,70 @@
+"""
+Per-stage model routing: which model, timeout and max_tokens each generative step uses.
+
+Routes come from model_routing.json (MODEL_ROUTING_PATH) and can be overridden per stage
+from the environment without touching the file, e.g.
+
+    MODEL_ROUTE_TRANSLATE_ANSWER_MODEL=gpt-4
+    MODEL_ROUTE_ANSWER_TIMEOUT=90
+    MODEL_ROUTE_DETECT_LANGUAGE_MAX_TOKENS=3
+"""
+import json
+import os
+import threading
+
+ROUTING_PATH = os.getenv(
+    "MODEL_ROUTING_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_routing.json")
+)
+STAGES = ("detect_language", "translate_question", "answer", "translate_answer")
+FIELDS = {"model": str, "timeout": float, "max_tokens": int, "temperature": float}
+DEFAULT_ROUTE = {"model": "gpt-4", "timeout": 30.0, "max_tokens": 800, "temperature": 0.3}
+
+_routes = None
+_lock = threading.Lock()
+
+
+def _env_overrides(stage, environ):
+    overrides = {}
+    for field, cast in FIELDS.items():
+        value = environ.get(f"MODEL_ROUTE_{stage.upper()}_{field.upper()}")
+        if value not in (None, ""):
+            overrides[field] = cast(value)
+    return overrides
+
+
+def load_routes(path=None, environ=None):
+    """Read the routing file and apply environment overrides; returns {stage: route}."""
+    path = path or ROUTING_PATH
+    environ = os.environ if environ is None else environ
+    config = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    else:
+        # Every stage would silently fall back to DEFAULT_ROUTE (gpt-4 everywhere)
+        print(f"⚠️ No model routing file at {path}; every stage uses the default route")
+    default = dict(DEFAULT_ROUTE, **config.get("default", {}))
+    routes = {}
+    for stage in set(STAGES) | set(config.get("stages", {})):
+        route = dict(default, **config.get("stages", {}).get(stage, {}))
+        route.update(_env_overrides(stage, environ))
+        unknown = set(route) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown route fields for {stage}: {', '.join(sorted(unknown))}")
+        routes[stage] = {field: FIELDS[field](value) for field, value in route.items()}
+    return routes
+
+
+def reload_routes(path=None):
+    global _routes
+    routes = load_routes(path)
+    with _lock:
+        _routes = routes
+    print("🧭 Model routes: " + ", ".join(f"{stage}={route['model']}" for stage, route in sorted(routes.items())))
+    return routes
+
+
+def get_route(stage):
+    """Route for one pipeline stage (model, timeout, max_tokens, temperature)."""
+    routes = _routes if _routes is not None else reload_routes()
+    return routes[stage]
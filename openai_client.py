@@ -0,0 +1,419 @@
+"""
+One client layer for every OpenAI call the bot makes.
+
+- a shared requests.Session with a keep-alive connection pool (openai.requestssession)
+- a per-call timeout (request_timeout)
+- retries with jittered exponential backoff on rate limits, timeouts and 5xx errors
+- per-model token buckets for requests and tokens per minute, so bursts wait in line
+  instead of failing with 429s
+- a circuit breaker: after OPENAI_BREAKER_FAILURES consecutive calls that failed all their
+  retries (429s aside) every call fails fast with CircuitOpen for OPENAI_BREAKER_RESET_SECONDS,
+  then one trial call decides
+- a deadline (`with deadline(at):`) that bounds the limiter waits, request timeouts and
+  retries of every call made inside the block; DeadlineExceeded once it has passed
+
+achat/aembed are the non-blocking versions for asyncio code: openai's aiohttp client
+(acreate) on one keep-alive aiohttp session per event loop, with the same limiter and
+retry policy.
+"""
+import asyncio
+import atexit
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import aiohttp
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Counter, Histogram, register
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "20"))
+# Requests and tokens per minute, per model; defaults are conservative tier-1 style limits
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "40000"))
+OPENAI_EMBEDDING_RPM = int(os.getenv("OPENAI_EMBEDDING_RPM", "3000"))
+OPENAI_EMBEDDING_TPM = int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_RESET_SECONDS = float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+
+RETRIES = register(Counter("docgpt_openai_retries_total", "OpenAI calls retried", labels=("model", "error")))
+LIMITER_WAIT = register(Histogram(
+    "docgpt_openai_limiter_wait_seconds", "Time OpenAI calls waited for the rate limiter", labels=("model",),
+    buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+))
+BREAKER_OPENED = register(Counter("docgpt_openai_breaker_opened_total", "Times the OpenAI circuit breaker opened"))
+FAILED_FAST = register(Counter(
+    "docgpt_openai_failed_fast_total", "OpenAI calls not made: breaker open or deadline passed", labels=("model", "reason"),
+))
+
+
+class ModelUnavailable(Exception):
+    """No model call can be made for this question: the breaker is open or its deadline passed."""
+
+
+class CircuitOpen(ModelUnavailable):
+    pass
+
+
+class DeadlineExceeded(ModelUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. Opens after `failures` consecutive failed calls, and then
+    refuses every call until `reset_seconds` have passed; the next call is a trial
+    (half-open) whose outcome closes the breaker or opens it again. A trial that never
+    reports back is replaced by another one after `reset_seconds`.
+    """
+
+    def __init__(self, failures=OPENAI_BREAKER_FAILURES, reset_seconds=OPENAI_BREAKER_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.clock() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+            self.opened_at = self.clock()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.failures):
+                self.state = "open"
+                self.opened_at = self.clock()
+                self.opens += 1
+                BREAKER_OPENED.inc()
+
+    def report(self):
+        with self.lock:
+            retry_in = None
+            if self.state != "closed":
+                retry_in = round(max(0.0, self.reset_seconds - (self.clock() - self.opened_at)), 1)
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures, "opens": self.opens,
+                    "retry_in_s": retry_in}
+
+
+_breaker = CircuitBreaker()
+_deadline = contextvars.ContextVar("openai_deadline", default=None)
+
+
+def get_breaker():
+    return _breaker
+
+
+@contextmanager
+def deadline(at):
+    """Bound the model calls made inside the block by `at` (a time.monotonic() value)."""
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def _left(model):
+    left = remaining()
+    if left is not None and left <= 0:
+        FAILED_FAST.inc(model, "deadline")
+        raise DeadlineExceeded(f"No time left for a {model} call")
+    return left
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holds at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount=1):
+        """Take `amount` units and return 0 if they are available, else the seconds to wait."""
+        # A single request larger than the bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def acquire(self, amount=1, limit=None):
+        """
+        Block until `amount` units are available, take them and return the time waited.
+        DeadlineExceeded instead of waiting longer than `limit` seconds.
+        """
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(amount)
+            if not delay:
+                return waited
+            self._check_limit(waited + delay, limit)
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self, amount=1, limit=None):
+        """acquire() for asyncio code: waits without blocking the event loop."""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(amount)
+            if not delay:
+                return waited
+            self._check_limit(waited + delay, limit)
+            await asyncio.sleep(delay)
+            waited += delay
+
+    @staticmethod
+    def _check_limit(wait, limit):
+        if limit is not None and wait > limit:
+            raise DeadlineExceeded(f"Rate limiter wait of {wait:.1f}s exceeds the {limit:.1f}s left")
+
+    def refund(self, amount):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+_session = None
+_aiosessions = {}  # event loop -> aiohttp.ClientSession
+_limiters = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    """The shared keep-alive session, installed as openai.requestssession on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=OPENAI_POOL_SIZE, pool_maxsize=OPENAI_POOL_SIZE, max_retries=0)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        openai.requestssession = _session
+        return _session
+
+
+def get_aiosession():
+    """
+    The keep-alive aiohttp session for the running event loop, installed as openai.aiosession
+    for the current context. Must be called from a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        session = _aiosessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=OPENAI_POOL_SIZE)
+            session = _aiosessions[loop] = aiohttp.ClientSession(connector=connector)
+            atexit.register(_close_aiosession, loop, session)
+    if isinstance(getattr(openai, "aiosession", None), contextvars.ContextVar):
+        openai.aiosession.set(session)
+    return session
+
+
+def _close_aiosession(loop, session):
+    if loop.is_running() and not session.closed:
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+
+
+def get_limiters(model):
+    with _lock:
+        if model not in _limiters:
+            if model.startswith("text-embedding"):
+                _limiters[model] = (TokenBucket(OPENAI_EMBEDDING_RPM), TokenBucket(OPENAI_EMBEDDING_TPM))
+            else:
+                _limiters[model] = (TokenBucket(OPENAI_RPM), TokenBucket(OPENAI_TPM))
+        return _limiters[model]
+
+
+def estimate_tokens(texts, max_tokens=0):
+    """Rough prompt size (4 characters per token) plus the completion allowance."""
+    return sum(len(text) for text in texts) // 4 + (max_tokens or 0)
+
+
+def _is_retryable(error):
+    retryable = (
+        openai.error.RateLimitError, openai.error.Timeout, openai.error.APIConnectionError,
+        openai.error.ServiceUnavailableError, openai.error.TryAgain,
+    )
+    if isinstance(error, retryable):
+        return True
+    if isinstance(error, openai.error.APIError):
+        status = getattr(error, "http_status", None)
+        return status is None or status >= 500
+    return False
+
+
+def is_transient(error):
+    """
+    True when a failed call says nothing about the request itself: the breaker was open, the
+    deadline passed, or OpenAI was unreachable, overloaded or rate limiting after every retry.
+    Authentication and invalid-request errors are not transient.
+    """
+    return isinstance(error, ModelUnavailable) or _is_retryable(error)
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt))."""
+    return random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _admit(model, attempt):
+    """
+    Fail fast while the breaker is open, before any limiter wait or reservation. The breaker
+    admits calls, not attempts: a call it let through keeps its retries.
+    """
+    _left(model)
+    if attempt == 0 and not _breaker.allow():
+        FAILED_FAST.inc(model, "breaker_open")
+        raise CircuitOpen(f"OpenAI circuit breaker is open; {model} call not made")
+
+
+def _request_timeout(model, timeout):
+    """The request timeout for the next attempt, cut to the deadline."""
+    left = _left(model)
+    timeout = timeout or OPENAI_TIMEOUT
+    return timeout if left is None else min(timeout, left)
+
+
+def _give_up(error):
+    # One breaker failure per call whose retries ran out; a 429 means OpenAI is up but we are over our quota
+    if not isinstance(error, openai.error.RateLimitError):
+        _breaker.record_failure()
+
+
+def _retry_delay(model, error, attempt):
+    """The backoff before retrying a failed attempt; re-raises when it should not be retried."""
+    if not _is_retryable(error):
+        # The API answered; the request itself was wrong
+        _breaker.record_success()
+        raise error
+    if attempt >= OPENAI_MAX_RETRIES:
+        _give_up(error)
+        raise error
+    delay = backoff_delay(attempt)
+    left = remaining()
+    if left is not None and delay >= left:
+        _give_up(error)
+        FAILED_FAST.inc(model, "deadline")
+        raise DeadlineExceeded(f"No time left to retry a {model} call after {type(error).__name__}") from error
+    RETRIES.inc(model, type(error).__name__)
+    return delay
+
+
+def _call(create, model, prompt_texts, max_tokens, timeout, kwargs):
+    get_session()
+    requests_bucket, tokens_bucket = get_limiters(model)
+    estimate = estimate_tokens(prompt_texts, max_tokens)
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        _admit(model, attempt)
+        waited = requests_bucket.acquire(1, _left(model))
+        waited += tokens_bucket.acquire(estimate, _left(model))
+        LIMITER_WAIT.observe(waited, model)
+        request_timeout = _request_timeout(model, timeout)
+        try:
+            response = create(model=model, request_timeout=request_timeout, **kwargs)
+        except Exception as e:
+            # No usage is reported for a failed attempt; a retry reserves its estimate again
+            tokens_bucket.refund(estimate)
+            time.sleep(_retry_delay(model, e, attempt))
+            continue
+        _breaker.record_success()
+        return _settle(tokens_bucket, estimate, response)
+
+
+async def _acall(acreate, model, prompt_texts, max_tokens, timeout, kwargs):
+    get_aiosession()
+    requests_bucket, tokens_bucket = get_limiters(model)
+    estimate = estimate_tokens(prompt_texts, max_tokens)
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        _admit(model, attempt)
+        waited = await requests_bucket.acquire_async(1, _left(model))
+        waited += await tokens_bucket.acquire_async(estimate, _left(model))
+        LIMITER_WAIT.observe(waited, model)
+        request_timeout = _request_timeout(model, timeout)
+        try:
+            response = await acreate(model=model, request_timeout=request_timeout, **kwargs)
+        except Exception as e:
+            # No usage is reported for a failed attempt; a retry reserves its estimate again
+            tokens_bucket.refund(estimate)
+            await asyncio.sleep(_retry_delay(model, e, attempt))
+            continue
+        _breaker.record_success()
+        return _settle(tokens_bucket, estimate, response)
+
+
+def _settle(tokens_bucket, estimate, response):
+    # Give back what the estimate over-reserved
+    used = (response.get("usage") or {}).get("total_tokens")
+    if used is not None and used < estimate:
+        tokens_bucket.refund(estimate - used)
+    return response
+
+
+def chat(model, messages, timeout=None, max_tokens=None, **kwargs):
+    """openai.ChatCompletion.create through the pool, limiter and retry policy."""
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    return _call(
+        openai.ChatCompletion.create, model, [m["content"] for m in messages], max_tokens or 500, timeout,
+        dict(kwargs, messages=messages),
+    )
+
+
+def embed(inputs, model="text-embedding-ada-002", timeout=None):
+    """openai.Embedding.create through the pool, limiter and retry policy."""
+    return _call(openai.Embedding.create, model, inputs, 0, timeout, {"input": inputs})
+
+
+async def achat(model, messages, timeout=None, max_tokens=None, **kwargs):
+    """Non-blocking chat(): openai.ChatCompletion.acreate with the same limiter and retry policy."""
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    return await _acall(
+        openai.ChatCompletion.acreate, model, [m["content"] for m in messages], max_tokens or 500, timeout,
+        dict(kwargs, messages=messages),
+    )
+
+
+async def aembed(inputs, model="text-embedding-ada-002", timeout=None):
+    """Non-blocking embed(): openai.Embedding.acreate with the same limiter and retry policy."""
+    return await _acall(openai.Embedding.acreate, model, inputs, 0, timeout, {"input": inputs})
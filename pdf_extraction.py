@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Tiered PDF text extraction.
+
+Every page is first read with pdfium's text layer (pypdfium2), which is 15-25x faster than
+pdfplumber's layout analysis. The result is checked page by page, and only the pages that
+fail the check are re-read with pdfplumber, then OCR (pdf_ocr) if pdfplumber finds no text either:
+
+  - too_short: fewer than PDF_MIN_PAGE_CHARS characters (scans, image-only pages)
+  - garbage:   more than PDF_MAX_GARBAGE_RATIO of the characters are replacement, control
+               or unmapped "(cid:N)" glyphs (broken font encodings)
+  - table:     the page draws a ruled grid, where pdfplumber keeps cell lines in row order
+
+A PDF whose content is already in a .txt next to it (a "twin": same words, by shingle
+similarity of at least TWIN_SIMILARITY) is skipped, since the curated text reads better.
+
+    python pdf_extraction.py [documents] [--report pdf_extraction.json]
+
+prints, per document, the time of the fast, pdfplumber-only and tiered extractions, how
+many pages went to each tier, and how much of pdfplumber's text the tiered output keeps.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from pdf_ocr import ocr_pages
+
+PDF_MIN_PAGE_CHARS = int(os.getenv("PDF_MIN_PAGE_CHARS", "40"))
+PDF_MAX_GARBAGE_RATIO = float(os.getenv("PDF_MAX_GARBAGE_RATIO", "0.02"))
+# A ruled table: at least this many horizontal and this many vertical lines on the page
+PDF_TABLE_RULINGS = int(os.getenv("PDF_TABLE_RULINGS", "3"))
+TWIN_SIMILARITY = float(os.getenv("TWIN_SIMILARITY", "0.9"))
+
+CID_GLYPH = re.compile(r"\(cid:\d+\)")
+WORD = re.compile(r"\w+")
+RULING_MIN_LENGTH = 20  # points
+RULING_MAX_WIDTH = 2
+
+
+def garbage_ratio(text):
+    """Share of characters that are replacement, control (other than whitespace), private-use or unassigned glyphs."""
+    if not text:
+        return 0.0
+    cids = CID_GLYPH.findall(text)
+    text = CID_GLYPH.sub("", text)
+    bad = sum(1 for c in text if c == "�" or (unicodedata.category(c) in ("Cc", "Co", "Cn", "Cs") and not c.isspace()))
+    return (bad + sum(len(cid) for cid in cids)) / (len(text) + sum(len(cid) for cid in cids))
+
+
+def count_rulings(page):
+    """(horizontal, vertical) long thin path objects on a pdfium page: the lines of a ruled table."""
+    horizontal = vertical = 0
+    for obj in page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_PATH,)):
+        left, bottom, right, top = obj.get_bounds()
+        width, height = right - left, top - bottom
+        if height < RULING_MAX_WIDTH and width > RULING_MIN_LENGTH:
+            horizontal += 1
+        elif width < RULING_MAX_WIDTH and height > RULING_MIN_LENGTH:
+            vertical += 1
+    return horizontal, vertical
+
+
+def check_page(text, rulings=(0, 0)):
+    """Why the fast text of a page cannot be used as is, or None if it can."""
+    if len(text.strip()) < PDF_MIN_PAGE_CHARS:
+        return "too_short"
+    if garbage_ratio(text) > PDF_MAX_GARBAGE_RATIO:
+        return "garbage"
+    if min(rulings) >= PDF_TABLE_RULINGS:
+        return "table"
+    return None
+
+
+def fast_page_text(page):
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+    finally:
+        textpage.close()
+
+
+def apply_ocr(path, pages, tiers):
+    """OCR the pages left empty (see pdf_ocr) and fill in their text; returns the per-page OCR results."""
+    numbers = [number for number, text in enumerate(pages) if not text]
+    results = ocr_pages(path, numbers) if numbers else []
+    for result in results:
+        pages[result["page"]] = result["text"].strip()
+        tiers[result["page"]] = "ocr"
+    return [{key: result[key] for key in ("page", "dpi", "confidence")} for result in results]
+
+
+def extract_pdf_text(path):
+    """
+    (text, report) for a PDF, pages joined with newlines. The report counts the tier that
+    produced each page ("fast", "pdfplumber" or "ocr") and why the fast text was rejected.
+    """
+    started = time.perf_counter()
+    pages = []
+    tiers = []
+    reasons = Counter()
+    plumber = None
+    document = pdfium.PdfDocument(path)
+    try:
+        for number, page in enumerate(document):
+            try:
+                text = fast_page_text(page)
+                reason = check_page(text, count_rulings(page))
+            finally:
+                page.close()
+            tier = "fast"
+            if reason:
+                reasons[reason] += 1
+                if plumber is None:
+                    plumber = pdfplumber.open(path)
+                text, tier = plumber.pages[number].extract_text() or "", "pdfplumber"
+            tiers.append(tier)
+            pages.append(text.strip())
+    finally:
+        document.close()
+        if plumber is not None:
+            plumber.close()
+    report = {"pages": len(pages), "reasons": dict(reasons), "ocr": apply_ocr(path, pages, tiers)}
+    report["tiers"] = dict(Counter(tiers))
+    report["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return "\n".join(pages), report
+
+
+def extract_pdf_text_layout(path):
+    """pdfplumber (and OCR) for every page: the reference extraction the tiers are compared against."""
+    with pdfplumber.open(path) as pdf:
+        pages = [(page.extract_text() or "").strip() for page in pdf.pages]
+    apply_ocr(path, pages, ["pdfplumber"] * len(pages))
+    return "\n".join(pages)
+
+
+def _shingles(text, size=3):
+    words = WORD.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))} if words else set()
+
+
+def similarity(a, b):
+    """Jaccard similarity of the word 3-grams of two texts."""
+    a, b = _shingles(a), _shingles(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def fidelity(text, reference):
+    """Share of the reference's words (with multiplicity) that the text also has."""
+    reference_words = Counter(WORD.findall(reference.lower()))
+    if not reference_words:
+        return 1.0
+    kept = reference_words & Counter(WORD.findall(text.lower()))
+    return sum(kept.values()) / sum(reference_words.values())
+
+
+def read_txt_files(folder_path):
+    """{filename: text} for the .txt files in a folder."""
+    texts = {}
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(folder_path, filename), "r", encoding="utf-8") as f:
+                texts[filename] = f.read()
+    return texts
+
+
+def txt_twin(pdf_text, txt_texts):
+    """The name of the .txt (from {filename: text}) with the same content as the PDF, or None."""
+    best, best_score = None, TWIN_SIMILARITY
+    for filename, text in txt_texts.items():
+        score = similarity(pdf_text, text)
+        if score >= best_score:
+            best, best_score = filename, score
+    return best
+
+
+def compare_document(path, txt_texts=None):
+    """Timing and fidelity of the fast, pdfplumber-only and tiered extractions of one PDF."""
+    started = time.perf_counter()
+    document = pdfium.PdfDocument(path)
+    try:
+        fast = "\n".join(fast_page_text(page).strip() for page in document)
+    finally:
+        document.close()
+    fast_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    reference = extract_pdf_text_layout(path)
+    layout_ms = (time.perf_counter() - started) * 1000
+
+    tiered, report = extract_pdf_text(path)
+    return {
+        "document": os.path.basename(path),
+        "pages": report["pages"],
+        "fast_ms": round(fast_ms, 1),
+        "pdfplumber_ms": round(layout_ms, 1),
+        "tiered_ms": report["ms"],
+        "speedup": round(layout_ms / report["ms"], 2) if report["ms"] else None,
+        "tiers": report["tiers"],
+        "reasons": report["reasons"],
+        "fast_fidelity": round(fidelity(fast, reference), 4),
+        "tiered_fidelity": round(fidelity(tiered, reference), 4),
+        "txt_twin": txt_twin(tiered, txt_texts or {}),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fast, pdfplumber and tiered PDF extraction per document.")
+    parser.add_argument("folder", nargs="?", default="documents", help="folder of PDFs (default: documents)")
+    parser.add_argument("--report", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    txt_texts = read_txt_files(args.folder)
+    for filename in sorted(os.listdir(args.folder)):
+        if not filename.endswith(".pdf"):
+            continue
+        rows.append(compare_document(os.path.join(args.folder, filename), txt_texts))
+
+    print(f"{'document':40} {'pages':>5} {'fast':>8} {'plumber':>8} {'tiered':>8} {'speedup':>7} {'fidelity':>8}  tiers")
+    for row in rows:
+        tiers = ", ".join(f"{tier}={count}" for tier, count in sorted(row["tiers"].items()))
+        twin = f"  (twin of {row['txt_twin']})" if row["txt_twin"] else ""
+        print(f"{row['document'][:40]:40} {row['pages']:>5} {row['fast_ms']:>6.0f}ms {row['pdfplumber_ms']:>6.0f}ms "
+              f"{row['tiered_ms']:>6.0f}ms {row['speedup'] or 0:>6.1f}x {row['tiered_fidelity']:>8.3f}  {tiers}{twin}")
+    if rows:
+        total_layout = sum(row["pdfplumber_ms"] for row in rows)
+        total_tiered = sum(row["tiered_ms"] for row in rows)
+        print(f"Total: {total_layout:.0f}ms pdfplumber-only vs {total_tiered:.0f}ms tiered "
+              f"({total_layout / total_tiered:.1f}x)")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+        print(f"📝 Report written to {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+OCR for scanned PDF pages.
+
+Pages are rendered by pdfium straight into an 8-bit grayscale bitmap that PIL wraps without
+copying, at OCR_DPI first. The ink on that render gives the text's bounding box; tesseract
+reads only that crop, and a page whose mean word confidence is below OCR_MIN_CONFIDENCE is
+rendered again at OCR_HIGH_DPI, cropped at render time so the large bitmap covers only the
+text. Pages run in a process pool of OCR_WORKERS, each worker keeping the document open.
+
+The previous path rendered every page at 300 DPI in RGB and copied it twice (the page
+image, then Image.frombytes) before tesseract ran.
+
+    python pdf_ocr.py documents/Scan.pdf [--pages 1,3] [--workers 2] [--report pdf_ocr.json]
+
+OCRs the pages with both paths and reports peak memory and pages per second.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+import pypdfium2 as pdfium
+import pytesseract
+from PIL import Image
+
+OCR_DPI = int(os.getenv("OCR_DPI", "150"))
+OCR_HIGH_DPI = int(os.getenv("OCR_HIGH_DPI", "300"))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "75"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(2, os.cpu_count() or 1))))
+LEGACY_OCR_DPI = 300
+
+INK_THRESHOLD = 200  # gray levels darker than this are ink
+CROP_MARGIN = 12  # points kept around the text
+
+
+def tesseract_recognize(image):
+    """(text, mean word confidence 0-100 or None) for a PIL image, lines kept as tesseract found them."""
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if confidence < 0 or not word.strip():
+            continue
+        confidences.append(confidence)
+        lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), []).append(word)
+    text = "\n".join(" ".join(words) for words in lines.values())
+    return text, (sum(confidences) / len(confidences) if confidences else None)
+
+
+def render_only(image):
+    """Recognizer that skips tesseract, for timing the image pipeline alone; zero confidence forces the retry."""
+    return "", 0.0
+
+
+def render_gray(page, dpi, crop=(0, 0, 0, 0)):
+    """Grayscale PIL image of a pdfium page; `crop` is (left, bottom, right, top) points cut off each side."""
+    return page.render(scale=dpi / 72, grayscale=True, crop=crop).to_pil()
+
+
+def ink_box(image):
+    """Pixel bounding box (left, top, right, bottom) of the dark pixels, or None for a blank page."""
+    return image.point(lambda value: 255 if value < INK_THRESHOLD else 0).getbbox()
+
+
+def crop_points(box, dpi, page_size):
+    """The render crop (points cut off left, bottom, right, top) that keeps `box` plus CROP_MARGIN."""
+    scale = dpi / 72
+    width, height = page_size
+    left, top, right, bottom = (value / scale for value in box)
+    return (
+        max(left - CROP_MARGIN, 0),
+        max(height - bottom - CROP_MARGIN, 0),
+        max(width - right - CROP_MARGIN, 0),
+        max(top - CROP_MARGIN, 0),
+    )
+
+
+def ocr_page(page, recognize=tesseract_recognize):
+    """
+    {"text", "confidence", "dpi", "pixels"} for one pdfium page: the low-DPI crop, then the
+    high-DPI crop if tesseract was not confident; `pixels` counts every bitmap rendered.
+    """
+    low = render_gray(page, OCR_DPI)
+    result = {"text": "", "confidence": None, "dpi": OCR_DPI, "pixels": low.width * low.height}
+    box = ink_box(low)
+    if box is None:
+        return result
+    margin = round(CROP_MARGIN * OCR_DPI / 72)
+    padded = (max(box[0] - margin, 0), max(box[1] - margin, 0), min(box[2] + margin, low.width), min(box[3] + margin, low.height))
+    result["text"], result["confidence"] = recognize(low.crop(padded))
+    del low
+    if result["confidence"] is None or result["confidence"] >= OCR_MIN_CONFIDENCE:
+        return result
+    # A rotated page renders rotated, so the crop computed on the render would not match the page box
+    crop = crop_points(box, OCR_DPI, page.get_size()) if page.get_rotation() == 0 else (0, 0, 0, 0)
+    high = render_gray(page, OCR_HIGH_DPI, crop)
+    result["pixels"] += high.width * high.height
+    text, confidence = recognize(high)
+    if confidence is not None and confidence > result["confidence"]:
+        result.update(text=text, confidence=confidence, dpi=OCR_HIGH_DPI)
+    return result
+
+
+_document = None  # (path, PdfDocument) kept open by each pool worker
+
+
+def _open_document(path):
+    global _document
+    if _document is None or _document[0] != path:
+        if _document is not None:
+            _document[1].close()
+        _document = (path, pdfium.PdfDocument(path))
+    return _document[1]
+
+
+def _ocr_task(args):
+    path, number, recognize = args
+    page = _open_document(path)[number]
+    try:
+        return dict(ocr_page(page, recognize), page=number)
+    finally:
+        page.close()
+
+
+def ocr_pages(path, numbers, workers=None, recognize=tesseract_recognize):
+    """OCR results (see ocr_page) for the 0-based page `numbers` of a PDF, in order."""
+    workers = OCR_WORKERS if workers is None else workers
+    tasks = [(path, number, recognize) for number in numbers]
+    if workers <= 1 or len(tasks) <= 1:
+        global _document
+        try:
+            return [_ocr_task(task) for task in tasks]
+        finally:
+            if _document is not None:
+                _document[1].close()
+                _document = None
+    # Spawned, not forked: the bot calls this with its scheduler and HTTP pools running, and fork is not on every OS
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as pool:
+        return list(pool.map(_ocr_task, tasks))
+
+
+def legacy_ocr_pages(path, numbers, recognize=None):
+    """The previous OCR path, for comparison: 300 DPI RGB through page.to_image and Image.frombytes."""
+    texts = []
+    with pdfplumber.open(path) as pdf:
+        for number in numbers:
+            img = pdf.pages[number].to_image(resolution=LEGACY_OCR_DPI).original
+            pil_image = Image.frombytes("RGB", img.size, img.tobytes())
+            texts.append(recognize(pil_image)[0] if recognize else pytesseract.image_to_string(pil_image))
+    return texts
+
+
+def _measure(variant, path, numbers, workers, render_only_mode):
+    """Runs in a fresh process: (seconds, peak RSS growth in MB, worker peak RSS in MB or None). Unix only."""
+    import resource
+    recognize = render_only if render_only_mode else tesseract_recognize
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if variant == "legacy":
+        legacy_ocr_pages(path, numbers, render_only if render_only_mode else None)
+    else:
+        ocr_pages(path, numbers, workers, recognize)
+    seconds = time.perf_counter() - started
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024 if workers > 1 else None
+    return seconds, peak, children
+
+
+def compare(path, numbers, workers=OCR_WORKERS, render_only_mode=False):
+    """Pages per second and peak memory of the previous path, the new path serially and in the pool."""
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for variant, variant_workers in (("legacy", 1), ("grayscale", 1), ("grayscale_pool", workers)):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as runner:
+            seconds, peak, worker_peak = runner.submit(
+                _measure, variant, path, numbers, variant_workers, render_only_mode).result()
+        rows.append({
+            "variant": variant,
+            "workers": variant_workers,
+            "pages": len(numbers),
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(len(numbers) / seconds, 2) if seconds else None,
+            "peak_rss_growth_mb": round(peak, 1),
+            "worker_peak_rss_mb": round(worker_peak, 1) if worker_peak is not None else None,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the previous and the grayscale OCR paths on a PDF.")
+    parser.add_argument("pdf", help="PDF to OCR")
+    parser.add_argument("--pages", help="comma-separated 1-based pages (default: all)")
+    parser.add_argument("--workers", type=int, default=max(OCR_WORKERS, 2), help="pool size for the pooled run")
+    parser.add_argument("--render-only", action="store_true", help="skip tesseract and time the image pipeline alone")
+    parser.add_argument("--report", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    render_only_mode = args.render_only
+    if not render_only_mode and shutil.which(pytesseract.pytesseract.tesseract_cmd) is None:
+        print("⚠️ tesseract is not installed; timing the image pipeline only (--render-only)")
+        render_only_mode = True
+    if args.pages:
+        numbers = [int(page) - 1 for page in args.pages.split(",")]
+    else:
+        document = pdfium.PdfDocument(args.pdf)
+        numbers = list(range(len(document)))
+        document.close()
+
+    rows = compare(args.pdf, numbers, args.workers, render_only_mode)
+    print(f"{'variant':16} {'workers':>7} {'pages/s':>8} {'peak MB':>8} {'worker MB':>9}")
+    for row in rows:
+        worker_peak = f"{row['worker_peak_rss_mb']:>9.1f}" if row["worker_peak_rss_mb"] is not None else f"{'-':>9}"
+        print(f"{row['variant']:16} {row['workers']:>7} {row['pages_per_second']:>8.2f} "
+              f"{row['peak_rss_growth_mb']:>8.1f} {worker_peak}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"render_only": render_only_mode, "results": rows}, f, indent=2)
+        print(f"📝 Report written to {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
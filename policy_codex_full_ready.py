@@ -222,7 +222,7 @@ POLICY_CODEX = [
         "topic": "Clarity High-Risk Lenders",
         "keywords": [
             "accion usa",
-            "goodelap",
+            "goodleap",
             "loanosity",
             "tower loans",
             "webbank"
@@ -0,0 +1,240 @@
+"""
+Persistent query log and warm-start replay.
+
+Every question answered in Slack is written to a local SQLite log (QUERY_LOG_PATH) with
+its normalized form, decision path, latency and answer, indexed for frequency queries.
+After a restart every in-memory cache is empty, so once the index is ready the bot replays
+the WARMUP_TOP_N most frequent questions of the last WARMUP_WINDOW_DAYS in a background
+thread. That fills the query embedding cache, the answer cache and the translation memory
+before the morning rush instead of during it.
+
+The log holds agents' raw questions and full answers, so rows older than
+QUERY_LOG_RETENTION_DAYS (default four warm-up windows) are deleted when the log is
+opened and then at most once an hour.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter, register
+
+QUERY_LOG_PATH = os.getenv(
+    "QUERY_LOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_log.sqlite3")
+)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1").lower() not in ("0", "false", "no")
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "50"))
+WARMUP_WINDOW_DAYS = float(os.getenv("WARMUP_WINDOW_DAYS", "7"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(6 * 3600)))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+# 0 keeps every row
+QUERY_LOG_RETENTION_DAYS = float(os.getenv("QUERY_LOG_RETENTION_DAYS", str(WARMUP_WINDOW_DAYS * 4)))
+PRUNE_INTERVAL_SECONDS = 3600
+
+MENTION = re.compile(r"<@[^>]+>")
+PUNCTUATION = re.compile(r"[^\w\s%$]")
+
+CACHE_LOOKUPS = register(Counter("docgpt_query_cache_lookups_total", "Answer and embedding cache lookups",
+                                 labels=("cache", "result")))
+
+
+def normalize_question(question):
+    """Lowercased, without Slack mentions, punctuation and repeated spaces: the key questions are counted by."""
+    text = MENTION.sub(" ", question).lower()
+    return " ".join(PUNCTUATION.sub(" ", text).split())
+
+
+class QueryLog:
+    def __init__(self, path=QUERY_LOG_PATH, retention_days=QUERY_LOG_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.pruned_at = 0.0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " id INTEGER PRIMARY KEY, ts REAL NOT NULL, question TEXT NOT NULL, normalized TEXT NOT NULL,"
+            " language TEXT, path TEXT, latency_ms REAL, answer TEXT, model_calls INTEGER, total_tokens INTEGER,"
+            " channel TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS queries_normalized_ts ON queries (normalized, ts)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS queries_ts ON queries (ts)")
+        self.conn.commit()
+        self.prune()
+
+    def record(self, question, path, latency_ms, answer=None, language=None, model_calls=0, total_tokens=0,
+               channel=None, ts=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO queries (ts, question, normalized, language, path, latency_ms, answer, model_calls,"
+                " total_tokens, channel) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ts or time.time(), question, normalize_question(question), language, path, latency_ms, answer,
+                 model_calls, total_tokens, channel),
+            )
+            self.conn.commit()
+        if time.time() - self.pruned_at > PRUNE_INTERVAL_SECONDS:
+            self.prune()
+
+    def prune(self, now=None):
+        """Delete the rows older than the retention period; returns how many went."""
+        now = now or time.time()
+        self.pruned_at = now
+        if self.retention_days <= 0:
+            return 0
+        with self.lock:
+            deleted = self.conn.execute("DELETE FROM queries WHERE ts < ?",
+                                        (now - self.retention_days * 86400,)).rowcount
+            self.conn.commit()
+        return deleted
+
+    def top_questions(self, limit=WARMUP_TOP_N, window_days=WARMUP_WINDOW_DAYS, now=None):
+        """
+        [(question, count)] for the most frequent normalized questions since `window_days`
+        ago, most frequent first; the question is its most recent wording.
+        """
+        since = (now or time.time()) - window_days * 86400
+        with self.lock:
+            # SQLite takes the bare `question` column from the row holding MAX(ts)
+            rows = self.conn.execute(
+                "SELECT question, MAX(ts), COUNT(*) AS n FROM queries"
+                " WHERE ts >= ? AND path IS NOT NULL AND path != 'error'"
+                " GROUP BY normalized ORDER BY n DESC, MAX(ts) DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        return [(question, count) for question, _, count in rows]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+
+
+class QueryCache:
+    """LRU map with an optional TTL, keyed by normalized question."""
+
+    def __init__(self, name, max_entries, ttl=None, clock=time.monotonic):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (stored at, value), least recently used first
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and self.clock() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                CACHE_LOOKUPS.inc(self.name, "miss")
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+        CACHE_LOOKUPS.inc(self.name, "hit")
+        return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (self.clock(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def report(self):
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, entries=len(self.entries),
+                        hit_rate=round(self.stats["hits"] / lookups, 4) if lookups else 0.0)
+
+
+class Warmup:
+    """Replays the most frequent logged questions once, in a background thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.state = {"state": "idle", "total": 0, "done": 0, "errors": 0, "started": None, "finished": None}
+
+    def start(self, query_log, answer, limit=WARMUP_TOP_N, window_days=WARMUP_WINDOW_DAYS):
+        """Replay the top questions through `answer(question)`; returns False if a replay already ran."""
+        with self.lock:
+            if self.thread is not None:
+                return False
+            self.state.update(state="running", started=time.time())
+            self.thread = threading.Thread(target=self._run, args=(query_log, answer, limit, window_days),
+                                           name="query-warmup", daemon=True)
+        self.thread.start()
+        return True
+
+    def _run(self, query_log, answer, limit, window_days):
+        try:
+            questions = query_log.top_questions(limit, window_days)
+        except Exception as e:
+            print(f"⚠️ Warm-up could not read the query log: {e}")
+            with self.lock:
+                self.state.update(state="failed", finished=time.time())
+            return
+        with self.lock:
+            self.state["total"] = len(questions)
+        print(f"🔥 Warming caches with the {len(questions)} most frequent recent questions...")
+        for question, _ in questions:
+            try:
+                answer(question)
+            except Exception as e:
+                print(f"⚠️ Warm-up question failed: {e}")
+                with self.lock:
+                    self.state["errors"] += 1
+            with self.lock:
+                self.state["done"] += 1
+        with self.lock:
+            self.state.update(state="done", finished=time.time())
+        print(f"🔥 Warm-up done: {self.state['done']} questions replayed, {self.state['errors']} errors")
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def report(self):
+        with self.lock:
+            report = dict(self.state)
+        report["progress"] = round(report["done"] / report["total"], 4) if report["total"] else (
+            1.0 if report["state"] == "done" else 0.0)
+        return report
+
+
+_query_log = None
+_answer_cache = QueryCache("answer", ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS)
+_embedding_cache = QueryCache("embedding", EMBEDDING_CACHE_SIZE)
+_warmup = Warmup()
+_lock = threading.Lock()
+
+
+def get_query_log():
+    global _query_log
+    with _lock:
+        if _query_log is None:
+            _query_log = QueryLog(QUERY_LOG_PATH)
+        return _query_log
+
+
+def get_answer_cache():
+    return _answer_cache
+
+
+def get_embedding_cache():
+    return _embedding_cache
+
+
+def get_warmup():
+    return _warmup
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Measure retrieval quality and latency for chunker/index settings against a gold question set.
+
+    python retrieval_eval.py                                      # current settings, cached embeddings
+    python retrieval_eval.py --config max_chunk_words=80 --config max_chunk_words=200,k=8
+    python retrieval_eval.py --config header_line_words=4 --config min_chunk_words=5
+    python retrieval_eval.py --live --config max_chunk_words=80   # embed unseen chunks with OpenAI
+    python retrieval_eval.py --embeddings hashed                  # no API or cache: lexical baseline
+
+retrieval_gold.jsonl maps agent questions to the passages that answer them. A retrieved
+chunk is relevant when it contains one of the passages (ignoring case and whitespace), so
+the gold set does not depend on where a chunker cuts. For each configuration the report
+gives recall@k (share of a question's passages found in the top k chunks), MRR (1 / rank
+of the first relevant chunk), the empty-context rate (no retrieved chunk passes
+is_valid_primary_chunk) and p50/p95 search latency.
+
+Settings: the chunker's max_chunk_words and merge thresholds (header_max_words,
+merge_line_words, header_line_words, min_chunk_words; see extract_chunks_from_text), the
+number of chunks retrieved (k) and is_valid_primary_chunk's min_words. Unset ones keep
+the bot's current values.
+
+Embeddings are cached in EVAL_EMBEDDING_CACHE, keyed by model and text hash. A comparison
+only needs the API (--live) for chunks no earlier run has embedded, and with a filled
+cache the same command gives the same numbers offline.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from bulk_runner import percentile
+
+GOLD_PATH = os.getenv("RETRIEVAL_GOLD_PATH", "retrieval_gold.jsonl")
+EVAL_EMBEDDING_CACHE = os.getenv("EVAL_EMBEDDING_CACHE", "retrieval_eval_embeddings.sqlite3")
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBED_BATCH = 500
+CHUNKER_SETTINGS = ("max_chunk_words", "header_max_words", "merge_line_words", "header_line_words", "min_chunk_words")
+SETTINGS = CHUNKER_SETTINGS + ("k", "min_words")
+
+
+class MissingEmbeddings(Exception):
+    pass
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def read_gold(path=GOLD_PATH):
+    """(gold cases, version): the cases of a JSONL gold file and the hash of its contents."""
+    with open(path, "rb") as f:
+        data = f.read()
+    cases = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+    return cases, hashlib.sha1(data).hexdigest()[:12]
+
+
+def default_config(bot):
+    """The settings the bot runs with."""
+    return {
+        "max_chunk_words": bot.MAX_CHUNK_WORDS, "header_max_words": bot.HEADER_MAX_WORDS,
+        "merge_line_words": bot.MERGE_LINE_WORDS, "header_line_words": bot.HEADER_LINE_WORDS,
+        "min_chunk_words": bot.MIN_CHUNK_WORDS, "k": 5, "min_words": bot.PRIMARY_MIN_WORDS,
+    }
+
+
+def parse_config(text, defaults):
+    """'max_chunk_words=80,k=8' -> a full settings dict, starting from `defaults`."""
+    config = dict(defaults)
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        if name not in SETTINGS:
+            raise ValueError(f"Unknown setting {name!r} (expected one of {', '.join(SETTINGS)})")
+        config[name] = int(value)
+    return config
+
+
+class EmbeddingCache:
+    """Embedding vectors on disk (SQLite), keyed by model and the SHA-1 of the text."""
+
+    def __init__(self, path=EVAL_EMBEDDING_CACHE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, digest))"
+        )
+        self.conn.commit()
+
+    def get_many(self, model, digests):
+        found = {}
+        digests = list(digests)
+        for start in range(0, len(digests), 500):
+            batch = digests[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({','.join('?' * len(batch))})",
+                [model] + batch,
+            ).fetchall()
+            found.update((digest, np.frombuffer(vector, dtype=np.float32)) for digest, vector in rows)
+        return found
+
+    def put_many(self, model, items):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+            [(model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in items],
+        )
+        self.conn.commit()
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def make_embedder(model, cache=None, fetch=None):
+    """
+    embed(texts) -> float32 matrix. Vectors come from the cache when it has them; the rest
+    from fetch(texts) (then cached), or MissingEmbeddings when there is no fetch.
+    """
+    def embed(texts):
+        digests = [text_digest(text) for text in texts]
+        found = cache.get_many(model, set(digests)) if cache is not None else {}
+        missing = {digest: text for digest, text in zip(digests, texts) if digest not in found}
+        if missing and fetch is None:
+            raise MissingEmbeddings(f"{len(missing)} texts have no cached {model} embedding; run once with --live")
+        items = list(missing.items())
+        for start in range(0, len(items), EMBED_BATCH):
+            batch = items[start:start + EMBED_BATCH]
+            vectors = fetch([text for _, text in batch])
+            fetched = [(digest, np.asarray(vector, dtype=np.float32)) for (digest, _), vector in zip(batch, vectors)]
+            found.update(fetched)
+            if cache is not None:
+                cache.put_many(model, fetched)
+        return np.array([found[digest] for digest in digests], dtype=np.float32)
+    return embed
+
+
+def evaluate(bot, documents, gold, config, embed):
+    """Quality and latency of one configuration (see the module docstring)."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        chunks, sources = bot.chunk_documents(documents, **{name: config[name] for name in CHUNKER_SETTINGS})
+    index = bot.create_vector_index(embed(chunks))
+    normalized = [normalize(chunk) for chunk in chunks]
+    question_vectors = embed([case["question"] for case in gold])
+
+    recalls, reciprocal_ranks, latencies = [], [], []
+    empty = 0
+    misses = []
+    for case, vector in zip(gold, question_vectors):
+        started = time.perf_counter()
+        _, I = index.search(vector[None, :], config["k"])
+        ids = [int(i) for i in I[0] if 0 <= i < len(chunks)]
+        valid = [i for i in ids if bot.is_valid_primary_chunk(chunks[i], sources[i], config["min_words"])]
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        passages = [normalize(passage) for passage in case["passages"]]
+        found = [any(passage in normalized[i] for i in ids) for passage in passages]
+        recalls.append(sum(found) / len(passages))
+        rank = next((rank for rank, i in enumerate(ids, 1) if any(p in normalized[i] for p in passages)), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        empty += not valid
+        if not all(found):
+            misses.append(case["id"])
+
+    count = len(gold)
+    return {
+        "config": dict(config),
+        "chunks": len(chunks),
+        "mean_chunk_words": round(sum(len(chunk.split()) for chunk in chunks) / len(chunks), 1) if chunks else 0.0,
+        "recall_at_k": round(sum(recalls) / count, 4),
+        "mrr": round(sum(reciprocal_ranks) / count, 4),
+        "empty_context_rate": round(empty / count, 4),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "misses": misses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate chunker/index settings against the retrieval gold set.")
+    parser.add_argument("--config", action="append",
+                        help="settings to evaluate, e.g. max_chunk_words=80,k=8,min_words=5 (repeatable)")
+    parser.add_argument("--gold", default=GOLD_PATH, help="gold set JSONL (id, question, passages)")
+    parser.add_argument("--documents", default="documents", help="documents folder")
+    parser.add_argument("--embeddings", choices=("cached", "hashed"), default="cached",
+                        help="cached: OpenAI embeddings from the cache; hashed: local bag-of-words vectors")
+    parser.add_argument("--cache", default=EVAL_EMBEDDING_CACHE, help="embedding cache (SQLite)")
+    parser.add_argument("--live", action="store_true", help="embed texts missing from the cache with the OpenAI API")
+    parser.add_argument("--report", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.live:
+        import slack_doc_bot as bot
+    else:
+        from benchmark_fakes import install_fakes
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            bot, _ = install_fakes()
+    configs = [parse_config(text, default_config(bot)) for text in (args.config or [""])]
+
+    if args.embeddings == "hashed":
+        from benchmark_fakes import fake_embedding
+        model = "hashed"
+        embed = make_embedder(model, fetch=lambda texts: [fake_embedding(text) for text in texts])
+    else:
+        model = EMBEDDING_MODEL
+        embed = make_embedder(model, EmbeddingCache(args.cache), bot.embed_chunks if args.live else None)
+
+    gold, version = read_gold(args.gold)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        documents = bot.read_documents(args.documents)
+
+    rows = []
+    print(f"🎯 {len(gold)} gold questions ({args.gold} @ {version}), {model} embeddings")
+    for config in configs:
+        try:
+            row = evaluate(bot, documents, gold, config, embed)
+        except MissingEmbeddings as e:
+            print(f"❌ {e}")
+            return 1
+        rows.append(row)
+        # Only what this configuration changes, to keep the table readable
+        settings = " ".join(f"{name}={config[name]}" for name in SETTINGS if config[name] != default_config(bot)[name])
+        print(f"  {settings or 'current settings':<40} {row['chunks']:>4} chunks  recall@{config['k']} {row['recall_at_k']:.3f}  "
+              f"MRR {row['mrr']:.3f}  empty {row['empty_context_rate']:.1%}  "
+              f"p50 {row['p50_ms']:.2f} ms  p95 {row['p95_ms']:.2f} ms")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"gold": args.gold, "gold_version": version, "embeddings": model, "results": rows},
+                      f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Check model routing choices for quality and latency before rolling them out.
+
+    python route_eval.py                                    # current model_routing.json, stubbed models
+    python route_eval.py --routes model_routing.json --routes candidate.json --report route_eval.json
+    python route_eval.py --live --routes candidate.json     # same cases against the real API
+
+Each case runs the real stage function (detect_language, translate_answer, the answer
+call) under the given routes. Quality checks are mechanical: the detected language must
+match, translations and answers must keep the verdict emojis, percentages, creditor and
+program names, and no reply may be cut off by max_tokens. The stubbed models answer
+deterministically with a per-model latency profile, so a run shows what a route costs in
+time and tokens; --live repeats the cases against OpenAI.
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+import model_routing
+from bulk_runner import COST_PER_1K, percentile
+
+# Stub latency profile: (seconds per call, seconds per completion token)
+STUB_MODEL_LATENCY = {
+    "gpt-4": (0.6, 0.04),
+    "gpt-4-turbo": (0.4, 0.015),
+    "gpt-3.5-turbo": (0.2, 0.006),
+}
+
+VERDICT = (
+    "❌ *Elevate:* Oportun is not accepted in California.\n"
+    "✅ *Clarity:* Oportun is accepted, max 25% of the enrolled debt.\n"
+    "📝 *Please ensure client meets all other program criteria.*"
+)
+NOT_FOUND = (
+    "⚠️ *Elevate:* No specific information found in policy documents.\n"
+    "⚠️ *Clarity:* No specific information found in policy documents.\n"
+    "📝 *Please consult the latest program guidelines or contact support for assistance.*"
+)
+CASES = [
+    {"stage": "detect_language", "input": "Is Oportun accepted in California?", "expect": "english"},
+    {"stage": "detect_language", "input": "¿El cliente puede incluir una deuda de Oportun?", "expect": "spanish"},
+    {"stage": "detect_language", "input": "Can we enroll a payday loan from CashNetUSA?", "expect": "english"},
+    {"stage": "translate_question", "input": "¿Se acepta Oportun en California para Elevate?",
+     "keep": ["Oportun", "California", "Elevate"]},
+    {"stage": "translate_question", "input": "¿Los préstamos estudiantiles privados se aceptan en Clarity?",
+     "keep": ["Clarity"]},
+    {"stage": "translate_answer", "input": VERDICT, "keep": ["❌", "✅", "📝", "*Elevate:*", "*Clarity:*", "Oportun", "25%"]},
+    {"stage": "translate_answer", "input": NOT_FOUND, "keep": ["⚠️", "*Elevate:*", "*Clarity:*"]},
+    {"stage": "answer", "input": "Are private student loans accepted?",
+     "context": "[ComparisonTable.txt]: PRIVATE STUDENT LOANS Elevate: ✅ Accepted (non-federal only, max 25%) "
+                "Clarity: ✅ Accepted (must verify private)",
+     "keep": ["Elevate", "Clarity"]},
+]
+
+
+def run_case(bot, case):
+    if case["stage"] == "detect_language":
+        return bot.detect_language(case["input"])
+    if case["stage"] == "translate_question":
+        return bot.translate_answer(case["input"], "english", stage="translate_question")
+    if case["stage"] == "translate_answer":
+        return bot.translate_answer(case["input"], "spanish")
+    user_prompt = f"DOCUMENTS:\n{case['context']}\n\nQUESTION:\n{case['input']}"
+    return bot.ask_gpt_with_system_prompt(bot.ANSWER_SYSTEM_PROMPT, user_prompt)
+
+
+def score(case, output, finish_reason):
+    """1.0 when the output passes every check for its case, else the fraction that passed."""
+    if finish_reason == "length" or not output:
+        return 0.0
+    if "expect" in case:
+        return 1.0 if case["expect"] in output.lower() else 0.0
+    kept = [marker for marker in case["keep"] if marker in output]
+    return len(kept) / len(case["keep"])
+
+
+def evaluate(bot, routes, cases, latency_scale=1.0):
+    """Run every case under `routes`; return per-stage quality, latency, token and cost figures."""
+    model_routing._routes = routes
+    captured = {}
+    chat = bot.openai_client.chat
+
+    def recording_chat(*args, **kwargs):
+        captured["response"] = response = chat(*args, **kwargs)
+        return response
+
+    bot.openai_client.chat = recording_chat
+    per_stage = {}
+    try:
+        for case in cases:
+            captured.clear()
+            start = time.perf_counter()
+            output = run_case(bot, case)
+            elapsed_ms = (time.perf_counter() - start) * 1000 / latency_scale
+            response = captured["response"]
+            finish_reason = response["choices"][0].get("finish_reason")
+            usage = response.get("usage") or {}
+            stage = per_stage.setdefault(case["stage"], {"scores": [], "latencies": [], "prompt": 0, "completion": 0, "failures": []})
+            case_score = score(case, output, finish_reason)
+            stage["scores"].append(case_score)
+            stage["latencies"].append(elapsed_ms)
+            stage["prompt"] += usage.get("prompt_tokens", 0)
+            stage["completion"] += usage.get("completion_tokens", 0)
+            if case_score < 1.0:
+                stage["failures"].append({"input": case["input"], "output": output, "finish_reason": finish_reason})
+    finally:
+        bot.openai_client.chat = chat
+
+    report = {}
+    for stage, data in per_stage.items():
+        model = routes[stage]["model"]
+        prompt_price, completion_price = COST_PER_1K.get(model, (0.0, 0.0))
+        report[stage] = {
+            "model": model,
+            "max_tokens": routes[stage]["max_tokens"],
+            "cases": len(data["scores"]),
+            "quality": round(statistics.mean(data["scores"]), 4),
+            "p50_ms": round(percentile(data["latencies"], 50), 1),
+            "p95_ms": round(percentile(data["latencies"], 95), 1),
+            "tokens": data["prompt"] + data["completion"],
+            "cost_usd": round(data["prompt"] / 1000 * prompt_price + data["completion"] / 1000 * completion_price, 6),
+            "failures": data["failures"],
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate per-stage model routes for quality and latency.")
+    parser.add_argument("--routes", action="append", help="routing file(s) to evaluate (default: MODEL_ROUTING_PATH)")
+    parser.add_argument("--cases", help="JSONL file of cases (stage, input, expect|keep[, context])")
+    parser.add_argument("--live", action="store_true", help="call the real OpenAI API instead of the stubs")
+    parser.add_argument("--latency-scale", type=float, default=0.05,
+                        help="stub only: sleep this fraction of the simulated latency (reported latency is rescaled)")
+    parser.add_argument("--min-quality", type=float, default=1.0, help="fail when any stage scores below this")
+    parser.add_argument("--report", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    cases = CASES
+    if args.cases:
+        with open(args.cases, "r", encoding="utf-8") as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+
+    if args.live:
+        import slack_doc_bot as bot
+        scale = 1.0
+    else:
+        from benchmark_fakes import install_fakes
+        scale = args.latency_scale
+        model_latency = {model: (call * scale, token * scale) for model, (call, token) in STUB_MODEL_LATENCY.items()}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            bot, _ = install_fakes(model_latency=model_latency)
+
+    results = {}
+    failed = False
+    for path in args.routes or [model_routing.ROUTING_PATH]:
+        routes = model_routing.load_routes(path)
+        results[path] = evaluate(bot, routes, cases, scale)
+        print(f"🧭 {path}")
+        for stage, row in sorted(results[path].items()):
+            mark = "✅" if row["quality"] >= args.min_quality else "❌"
+            failed = failed or row["quality"] < args.min_quality
+            print(f"  {mark} {stage:<20} {row['model']:<16} quality {row['quality']:.2f}  "
+                  f"p50 {row['p50_ms']:.0f} ms  p95 {row['p95_ms']:.0f} ms  {row['tokens']} tokens  ${row['cost_usd']:.4f}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
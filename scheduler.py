@@ -0,0 +1,212 @@
+"""
+Fair scheduling of answer jobs across users and channels.
+
+Jobs wait in one queue per user. A fixed pool of workers picks the next job by:
+1. priority class (escalation channels, then supervisors, then everyone else),
+2. per-user and per-channel token buckets (a user over their rate waits, others go ahead),
+3. weighted fair queuing: the smallest virtual finish time among the users that may run.
+
+So one agent pasting 30 questions gets their share of the workers, not all of them.
+"""
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import Counter, Histogram, register
+
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+# Sustained questions per minute and burst size, per user and per channel
+USER_RATE_PER_MINUTE = float(os.getenv("SCHEDULER_USER_RATE", "6"))
+USER_BURST = float(os.getenv("SCHEDULER_USER_BURST", "3"))
+CHANNEL_RATE_PER_MINUTE = float(os.getenv("SCHEDULER_CHANNEL_RATE", "30"))
+CHANNEL_BURST = float(os.getenv("SCHEDULER_CHANNEL_BURST", "10"))
+
+# Lower priority number runs first; weight is the share of workers within a priority level
+PRIORITY_CLASSES = {
+    "escalation": {"priority": 0, "weight": 4.0, "rate_multiplier": 4.0},
+    "supervisor": {"priority": 1, "weight": 2.0, "rate_multiplier": 2.0},
+    "default": {"priority": 2, "weight": 1.0, "rate_multiplier": 1.0},
+}
+ESCALATION_CHANNELS = {c.strip() for c in os.getenv("SCHEDULER_ESCALATION_CHANNELS", "").split(",") if c.strip()}
+SUPERVISORS = {u.strip() for u in os.getenv("SCHEDULER_SUPERVISORS", "").split(",") if u.strip()}
+
+QUEUE_DELAY = register(Histogram(
+    "docgpt_queue_delay_seconds", "Time answer jobs waited for a worker", labels=("class",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+))
+JOBS = register(Counter("docgpt_scheduler_jobs_total", "Answer jobs scheduled", labels=("class",)))
+
+
+def classify(user, channel):
+    if channel in ESCALATION_CHANNELS:
+        return "escalation"
+    if user in SUPERVISORS:
+        return "supervisor"
+    return "default"
+
+
+class Bucket:
+    """Non-blocking token bucket: `per_minute` sustained, up to `burst` at once."""
+
+    def __init__(self, per_minute, burst, now):
+        self.rate = per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now):
+        """Seconds until one token is available (0 if available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class Scheduler:
+    def __init__(self, workers=SCHEDULER_WORKERS, user_rate=USER_RATE_PER_MINUTE, user_burst=USER_BURST,
+                 channel_rate=CHANNEL_RATE_PER_MINUTE, channel_burst=CHANNEL_BURST, classify=classify,
+                 clock=time.monotonic):
+        self.workers = workers
+        self.user_rate, self.user_burst = user_rate, user_burst
+        self.channel_rate, self.channel_burst = channel_rate, channel_burst
+        self.classify = classify
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.flows = {}            # user -> list of pending jobs, oldest first
+        self.finish = {}           # user -> virtual finish time of their last queued job
+        self.virtual_time = 0.0
+        self.user_buckets = {}
+        self.channel_buckets = {}
+        self.sequence = itertools.count()
+        self.threads = []
+        self.stopped = False
+        self.stats = {name: {"queued": 0, "done": 0, "delay_total": 0.0, "delay_max": 0.0} for name in PRIORITY_CLASSES}
+
+    def start(self):
+        with self.condition:
+            if self.threads:
+                return self
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"answer-worker-{n}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+    def submit(self, fn, *args, user=None, channel=None, cost=1.0, **kwargs):
+        """Queue fn(*args, **kwargs) on behalf of user/channel; returns a Future."""
+        job_class = self.classify(user, channel)
+        config = PRIORITY_CLASSES[job_class]
+        future = Future()
+        with self.condition:
+            start = max(self.virtual_time, self.finish.get(user, 0.0))
+            finish = start + cost / config["weight"]
+            self.finish[user] = finish
+            self.flows.setdefault(user, []).append({
+                "fn": fn, "args": args, "kwargs": kwargs, "future": future, "user": user, "channel": channel,
+                "class": job_class, "start": start, "finish": finish, "sequence": next(self.sequence), "queued": self.clock(),
+            })
+            self.stats[job_class]["queued"] += 1
+            self.condition.notify()
+        JOBS.inc(job_class)
+        return future
+
+    def _bucket(self, buckets, key, rate, burst, multiplier, now):
+        if key not in buckets:
+            buckets[key] = Bucket(rate * multiplier, burst * multiplier, now)
+        return buckets[key]
+
+    def _next_job(self, now):
+        """The job to run now, or (None, seconds to wait) if every queued job is rate limited."""
+        best, wait = None, None
+        for user, jobs in self.flows.items():
+            if not jobs:
+                continue
+            job = jobs[0]
+            multiplier = PRIORITY_CLASSES[job["class"]]["rate_multiplier"]
+            user_bucket = self._bucket(self.user_buckets, user, self.user_rate, self.user_burst, multiplier, now)
+            channel_bucket = self._bucket(self.channel_buckets, job["channel"], self.channel_rate, self.channel_burst, multiplier, now)
+            delay = max(user_bucket.ready_in(now), channel_bucket.ready_in(now))
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            key = (PRIORITY_CLASSES[job["class"]]["priority"], job["finish"], job["sequence"])
+            if best is None or key < best[0]:
+                best = (key, job)
+        if best is None:
+            return None, wait
+        job = best[1]
+        self.flows[job["user"]].pop(0)
+        if not self.flows[job["user"]]:
+            del self.flows[job["user"]]
+        self.user_buckets[job["user"]].take(now)
+        self.channel_buckets[job["channel"]].take(now)
+        # Virtual time follows the start tag of the job entering service
+        self.virtual_time = max(self.virtual_time, job["start"])
+        return job, None
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopped:
+                        return
+                    job, wait = self._next_job(self.clock())
+                    if job is not None:
+                        break
+                    self.condition.wait(timeout=wait)
+            delay = self.clock() - job["queued"]
+            QUEUE_DELAY.observe(delay, job["class"])
+            if not job["future"].set_running_or_notify_cancel():
+                continue
+            try:
+                job["future"].set_result(job["fn"](*job["args"], **job["kwargs"]))
+            except BaseException as e:
+                job["future"].set_exception(e)
+            with self.condition:
+                stats = self.stats[job["class"]]
+                stats["done"] += 1
+                stats["delay_total"] += delay
+                stats["delay_max"] = max(stats["delay_max"], delay)
+
+    def report(self):
+        with self.condition:
+            pending = {}
+            for jobs in self.flows.values():
+                for job in jobs:
+                    pending[job["class"]] = pending.get(job["class"], 0) + 1
+            return {
+                name: {
+                    "pending": pending.get(name, 0),
+                    "done": stats["done"],
+                    "avg_delay_s": round(stats["delay_total"] / stats["done"], 3) if stats["done"] else 0.0,
+                    "max_delay_s": round(stats["delay_max"], 3),
+                }
+                for name, stats in self.stats.items()
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler().start()
+        return _scheduler
@@ -1,35 +1,137 @@
 import os
 import re
+import sys
+import threading
+import time
+import contextvars
+import logging
 import openai
+import openai_client
 import faiss
 import numpy as np
-import pdfplumber
-from PIL import Image
-import pytesseract
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from slack_sdk.web import WebClient
 from dotenv import load_dotenv
 from policy_codex_full_ready import POLICY_CODEX
+from codex_index import match_codex, is_direct_codex_match, format_codex_answer, format_codex_context
+from eligibility_rules import reload_rules, get_rules, extract_entities, evaluate_creditor, format_verdict
+from eligibility_batch import check_debt_file, parse_debt_file_text, format_debt_file_table
+from metrics import record_tokens, DECISION_PATHS, QUESTION_SECONDS, ERRORS, CONTEXT_TOKENS_SAVED
+from tracing import start_trace, span, stage, annotate
+from context_packing import pack_context
+from model_routing import get_route
+from translation_memory import get_memory, rules_translation_pairs
+from scheduler import get_scheduler
+from pdf_extraction import extract_pdf_text, read_txt_files, txt_twin
+from chunk_store import ChunkStore
+from index_store import INDEX_STORE_DIR, documents_fingerprint, is_current, save_store, open_store
+from conversation_cache import (
+    get_conversations, new_conversation, is_followup, carry_over_entities, reusable_chunk_ids,
+    remember_chunks, remember_turn, format_history,
+)
+from query_log import (
+    WARMUP_ENABLED, normalize_question, get_query_log, get_answer_cache, get_embedding_cache, get_warmup,
+)
+import answer_bank
+from answer_bank import get_bank, lookup as lookup_answer_bank
+import async_pipeline
 
 load_dotenv()
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
+# Verifies that webhook requests (/slack/events) come from Slack; Socket Mode does not need it
+SLACK_SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Run detection, embedding and rule matching concurrently (see async_pipeline.py)
+ASYNC_PIPELINE = os.getenv("ASYNC_PIPELINE", "0").lower() in ("1", "true", "yes")
+# Budget per question once a scheduler worker picks it up; past it the answer is degraded
+QUESTION_DEADLINE_SECONDS = float(os.getenv("QUESTION_DEADLINE_SECONDS", "30"))
+# A throttled agent's questions wait their turn in the scheduler; one older than this is answered degraded
+QUESTION_MAX_AGE_SECONDS = float(os.getenv("QUESTION_MAX_AGE_SECONDS", "900"))
 openai.api_key = OPENAI_API_KEY
-
-app = App(token=SLACK_BOT_TOKEN)
-client = WebClient(token=SLACK_BOT_TOKEN)
+# Chunking and retrieval knobs; compare changes with retrieval_eval.py before touching them
+MAX_CHUNK_WORDS = 120
+PRIMARY_MIN_WORDS = 5
+# extract_chunks_from_text's merge rules: an all-caps line of at most HEADER_MAX_WORDS is a header,
+# a policy line of at most MERGE_LINE_WORDS or any line of at most HEADER_LINE_WORDS under a header
+# joins the chunk before it, and chunks under MIN_CHUNK_WORDS are dropped unless they are policy blocks
+HEADER_MAX_WORDS = 4
+MERGE_LINE_WORDS = 5
+HEADER_LINE_WORDS = 8
+MIN_CHUNK_WORDS = 3
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s")
+logger = logging.getLogger(__name__)
+
+# Slack Web API base URL; load_test.py points it at a local fake (OPENAI_API_BASE does the same for OpenAI)
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+
+client = WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL)
+app = App(token=SLACK_BOT_TOKEN, signing_secret=SLACK_SIGNING_SECRET, client=client)
 
 index = None
 chunks = []
 chunk_sources = []
+# Bumped whenever the index is rebuilt or reopened, so cached chunk ids from an older one are not reused
+index_generation = 0
+
+# How many questions were answered by (or enriched with) the policy codex
+codex_stats = {"questions": 0, "short_circuit": 0, "context": 0}
+codex_stats_lock = threading.Lock()
+
+def record_codex_stat(key):
+    with codex_stats_lock:
+        codex_stats[key] += 1
+        return dict(codex_stats)
+
+# Per-question decision path and OpenAI token usage (see run_question)
+question_stats = contextvars.ContextVar("question_stats", default=None)
 
-def extract_chunks_from_text(text, source):
+def new_question_stats():
+    return {"path": None, "model_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "models": {}}
+
+def record_usage(model, response):
+    """
+    Add the token usage of an OpenAI response to the token metrics and to the current
+    question's stats, if any.
+    """
+    usage = response.get("usage") or {}
+    record_tokens(model, usage)
+    stats = question_stats.get()
+    if stats is None:
+        return
+    stats["model_calls"] += 1
+    per_model = stats["models"].setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    per_model["calls"] += 1
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        stats[key] += usage.get(key, 0)
+        if key in per_model:
+            per_model[key] += usage.get(key, 0)
+
+def record_context_packing(report):
+    """Per-request context packing savings: metrics, trace and the question's stats."""
+    CONTEXT_TOKENS_SAVED.inc(amount=max(0, report["tokens_saved"]))
+    annotate(context=report)
+    logger.debug(f"🧮 Context packed: {report['tokens_before']} → {report['tokens_after']} tokens "
+                 f"({report['duplicates_dropped']} duplicate sentences dropped)")
+    stats = question_stats.get()
+    if stats is not None:
+        stats["context"] = report
+
+def set_decision_path(path):
+    DECISION_PATHS.inc(path)
+    annotate(path=path)
+    stats = question_stats.get()
+    if stats is not None:
+        stats["path"] = path
+
+def extract_chunks_from_text(text, source, max_chunk_words=MAX_CHUNK_WORDS, header_max_words=HEADER_MAX_WORDS,
+                             merge_line_words=MERGE_LINE_WORDS, header_line_words=HEADER_LINE_WORDS,
+                             min_chunk_words=MIN_CHUNK_WORDS):
     output = []
     lines = text.split("\n")
     buffer = []
-    max_chunk_words = 120
     
     # Keywords that indicate important policy content even in short chunks
     policy_keywords = [
@@ -57,7 +159,7 @@ def extract_chunks_from_text(text, source):
     def is_policy_header(line):
         """Check if line is a policy header (all caps, short, likely creditor name)"""
         return (line.isupper() and 
-                len(line.split()) <= 4 and  # Reduced from 8 to 4 for shorter headers like "OPORTUN"
+                len(line.split()) <= header_max_words and  # Short headers like "OPORTUN"
                 len(line) >= 2 and
                 not line.startswith("-") and
                 not line.startswith("•"))
@@ -79,7 +181,7 @@ def extract_chunks_from_text(text, source):
             return True
         
         # Merge short lines that seem related to previous content
-        if len(line.split()) <= 5 and is_important_content(line):
+        if len(line.split()) <= merge_line_words and is_important_content(line):
             return True
         
         # Merge lines that continue a policy rule (containing emojis or keywords)
@@ -91,7 +193,7 @@ def extract_chunks_from_text(text, source):
             return True
         
         # Merge if we have a policy header and current line is short and related
-        if buffer and is_policy_header(buffer[0]) and len(line.split()) <= 8:
+        if buffer and is_policy_header(buffer[0]) and len(line.split()) <= header_line_words:
             return True
         
         return False
@@ -122,7 +224,7 @@ def extract_chunks_from_text(text, source):
         if buffer:
             joined = " ".join(buffer).strip()
             # Always preserve policy blocks, regardless of length
-            if is_policy_block(buffer) or len(joined.split()) >= 3:
+            if is_policy_block(buffer) or len(joined.split()) >= min_chunk_words:
                 output.append((joined, source))
             buffer.clear()
 
@@ -147,41 +249,51 @@ def extract_chunks_from_text(text, source):
     flush_buffer()
     return output
 
-def load_documents(folder_path="documents"):
-    print("📄 Loading and chunking documents...")
-    all_chunks = []
-    all_sources = []
+def read_documents(folder_path="documents"):
+    """
+    [(filename, text)] for the PDFs and .txt files in the folder, skipping PDFs with a .txt twin.
+    """
+    documents = []
+    txt_texts = read_txt_files(folder_path)
     for filename in os.listdir(folder_path):
         if filename.endswith(".pdf") or filename.endswith(".txt"):
             path = os.path.join(folder_path, filename)
             print(f"🔍 Processing: {filename}")
             try:
                 if filename.endswith(".pdf"):
-                    with pdfplumber.open(path) as pdf:
-                        text_blocks = []
-                        for page in pdf.pages:
-                            text = page.extract_text()
-                            if not text:
-                                img = page.to_image(resolution=300).original
-                                pil_image = Image.frombytes("RGB", img.size, img.tobytes())
-                                text = pytesseract.image_to_string(pil_image)
-                            text_blocks.append(text.strip())
-                        combined = "\n".join(text_blocks)
+                    text, report = extract_pdf_text(path)
+                    twin = txt_twin(text, txt_texts)
+                    if twin:
+                        print(f"⏭️ Skipping {filename}: same content as {twin}")
+                        continue
+                    tiers = ", ".join(f"{count} {tier}" for tier, count in sorted(report["tiers"].items()))
+                    print(f"📑 {report['pages']} pages in {report['ms']:.0f}ms ({tiers})")
                 else:
-                    with open(path, "r", encoding="utf-8") as f:
-                        combined = f.read()
-                doc_chunks = extract_chunks_from_text(combined, filename)
-                for chunk, source in doc_chunks:
-                    all_chunks.append(chunk)
-                    all_sources.append(filename)
-                print(f"✅ Extracted {len(doc_chunks)} chunks from: {filename}")
+                    text = txt_texts[filename]
+                documents.append((filename, text))
             except Exception as e:
                 print(f"❌ ERROR processing {filename}: {str(e)}")
+    return documents
+
+def chunk_documents(documents, max_chunk_words=MAX_CHUNK_WORDS, **merge_thresholds):
+    all_chunks = []
+    all_sources = []
+    for filename, text in documents:
+        doc_chunks = extract_chunks_from_text(text, filename, max_chunk_words, **merge_thresholds)
+        for chunk, source in doc_chunks:
+            all_chunks.append(chunk)
+            all_sources.append(filename)
+        print(f"✅ Extracted {len(doc_chunks)} chunks from: {filename}")
     return all_chunks, all_sources
 
+def load_documents(folder_path="documents"):
+    print("📄 Loading and chunking documents...")
+    return chunk_documents(read_documents(folder_path))
+
 def embed_chunks(chunks):
     print("🔢 Creating embeddings...")
-    response = openai.Embedding.create(model="text-embedding-ada-002", input=chunks)
+    response = openai_client.embed(chunks)
+    record_usage("text-embedding-ada-002", response)
     return [np.array(r["embedding"], dtype=np.float32) for r in response["data"]]
 
 def create_vector_index(vectors):
@@ -191,47 +303,97 @@ def create_vector_index(vectors):
     return index
 
 def search_codex(question):
-    question_lower = question.lower()
-    matched = []
-    for entry in POLICY_CODEX:
-        if any(k.lower() in question_lower for k in entry["keywords"]):
-            matched.append(entry)
-    return matched
-
-def ask_gpt(prompt):
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
+    return [entry for entry, _ in match_codex(question)]
+
+def chat_for_stage(stage, messages):
+    """
+    Run a chat completion with the model, timeout and max_tokens routed to this stage.
+    """
+    route = get_route(stage)
+    response = openai_client.chat(
+        model=route["model"],
+        messages=messages,
+        temperature=route["temperature"],
+        max_tokens=route["max_tokens"],
+        timeout=route["timeout"]
     )
+    record_usage(route["model"], response)
     return response.choices[0].message["content"].strip()
 
-def detect_language(text):
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": f"What language is this question in? Just reply with one word.\n{text}"}]
-    )
-    return response.choices[0].message["content"].strip().lower()
+def ask_gpt(prompt, stage="answer"):
+    return chat_for_stage(stage, [{"role": "user", "content": prompt}])
 
-def translate_answer(answer, target_lang):
+def detect_language(text):
+    prompt = f"What language is this question in? Just reply with one word.\n{text}"
+    return chat_for_stage("detect_language", [{"role": "user", "content": prompt}]).lower()
+
+def translate_answer(answer, target_lang, stage="translate_answer"):
+    if stage == "translate_answer":
+        # Answers repeat fixed templates and stock sentences: only new sentences go to the model
+        translated, result = get_memory().translate(answer, target_lang, lambda prompt: ask_gpt(prompt, stage))
+        annotate(translation_memory=result)
+        return translated
     prompt = f"Translate the following text to {target_lang}:\n{answer}"
-    return ask_gpt(prompt)
+    return ask_gpt(prompt, stage)
+
+def prewarm_translations():
+    """
+    Seed the translation memory from the rules file and pre-translate the fixed answer templates.
+    """
+    memory = get_memory()
+    try:
+        seeded = memory.seed_pairs(rules_translation_pairs(get_rules()), "spanish")
+        templates = [NO_CONTEXT_ANSWER] + [format_codex_answer(entry) for entry in POLICY_CODEX]
+        added = memory.prewarm(templates, "spanish", lambda prompt: ask_gpt(prompt, "translate_answer"))
+        print(f"🌐 Translation memory: {memory.report()['entries']} sentences ({seeded} seeded from rules, {added} translated)")
+    except Exception as e:
+        print(f"⚠️ Could not pre-warm the translation memory: {e}")
+
+def embed_question(question):
+    """The question's embedding, from the embedding cache when the same question was asked before."""
+    key = normalize_question(question)
+    question_vec = get_embedding_cache().get(key)
+    if question_vec is None:
+        with stage("embed_query"):
+            response = openai_client.embed([question])
+        record_usage("text-embedding-ada-002", response)
+        question_vec = response["data"][0]["embedding"]
+        get_embedding_cache().put(key, question_vec)
+    return question_vec
+
+def get_top_chunk_ids(question, k=5):
+    question_vec = embed_question(question)
+    with stage("faiss_search"):
+        D, I = index.search(np.array([question_vec], dtype=np.float32), k)
+    return [int(i) for i in I[0] if 0 <= i < len(chunks)]
 
 def get_top_chunks(question, k=5):
-    question_vec = openai.Embedding.create(model="text-embedding-ada-002", input=[question])["data"][0]["embedding"]
-    D, I = index.search(np.array([question_vec], dtype=np.float32), k)
-    return [(chunks[i], chunk_sources[i]) for i in I[0] if i < len(chunks)]
+    return [(chunks[i], chunk_sources[i]) for i in get_top_chunk_ids(question, k)]
+
+def get_top_chunks_batch(questions, k=5):
+    """
+    Embed several questions in one request and search the index once for all of them.
+    """
+    if not questions:
+        return []
+    with stage("embed_query"):
+        response = openai_client.embed(questions)
+    record_usage("text-embedding-ada-002", response)
+    vectors = np.array([r["embedding"] for r in response["data"]], dtype=np.float32)
+    with stage("faiss_search"):
+        D, I = index.search(vectors, k)
+    return [[(chunks[i], chunk_sources[i]) for i in row if 0 <= i < len(chunks)] for row in I]
 
 
 
-def is_valid_primary_chunk(chunk, source):
+def is_valid_primary_chunk(chunk, source, min_words=PRIMARY_MIN_WORDS):
     """
     Check if a chunk is valid for primary document-based answers.
-    Must have at least 5 words and come from relevant policy documents.
+    Must have at least `min_words` words and come from relevant policy documents.
     """
     # Check word count (reduced from 10 to 5 for important policy content)
     word_count = len(chunk.split())
-    if word_count < 5:
+    if word_count < min_words:
         return False
     
     # Check if source is from relevant policy documents
@@ -256,7 +418,7 @@ def is_valid_primary_chunk(chunk, source):
     if has_policy_indicators:
         return True
     
-    return (is_clarity or is_elevate or is_policy) and word_count >= 5
+    return is_clarity or is_elevate or is_policy
 
 def get_program_sources_from_chunks(chunk_sources):
     """
@@ -275,542 +437,482 @@ def ask_gpt_with_system_prompt(system_prompt, user_prompt):
     """
     Ask GPT with a specific system prompt.
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.3
-    )
-    return response.choices[0].message["content"].strip()
+    return chat_for_stage("answer", [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ])
 
-def handle_question(question):
-    print(f"🚀 handle_question called with: {question}")
-    # Step 1: Normalize question
-    question_clean = question.lower()
-    print(f"🔍 Normalized question: {question_clean}")
-    
-    # Step 2: Comprehensive hardcoded acceptance/rejection logic
-    hard_rejections = {
-        # DEBT TYPES - NOT ACCEPTED
-        "mortgage": {
-            "global": (
-                "❌ *Elevate:* Mortgage loans are not accepted.\n"
-                "❌ *Clarity:* Mortgage loans are not accepted.\n"
-                "📝 *Please inform the client that mortgage loans must be resolved outside the program.*",
-                "❌ *Elevate:* Los préstamos hipotecarios no se aceptan.\n"
-                "❌ *Clarity:* Los préstamos hipotecarios no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los préstamos hipotecarios deben resolverse fuera del programa.*"
-            )
-        },
-        "secured loan": {
-            "global": (
-                "❌ *Elevate:* Secured loans are not accepted.\n"
-                "❌ *Clarity:* Secured loans are not accepted.\n"
-                "📝 *Please inform the client that secured loans must be resolved outside the program.*",
-                "❌ *Elevate:* Los préstamos con garantía no se aceptan.\n"
-                "❌ *Clarity:* Los préstamos con garantía no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los préstamos con garantía deben resolverse fuera del programa.*"
-            )
-        },
-        "federal student loan": {
-            "global": (
-                "❌ *Elevate:* Federal student loans are not accepted.\n"
-                "❌ *Clarity:* Federal student loans are not accepted.\n"
-                "📝 *Please inform the client that federal student loans must be resolved outside the program.*",
-                "❌ *Elevate:* Los préstamos estudiantiles federales no se aceptan.\n"
-                "❌ *Clarity:* Los préstamos estudiantiles federales no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los préstamos estudiantiles federales deben resolverse fuera del programa.*"
-            )
-        },
-        "auto loan": {
-            "global": (
-                "❌ *Elevate:* Auto loans are not accepted.\n"
-                "❌ *Clarity:* Auto loans are not accepted (except post-repossession deficiencies).\n"
-                "📝 *Please inform the client that auto loans must be resolved outside the program.*",
-                "❌ *Elevate:* Los préstamos de auto no se aceptan.\n"
-                "❌ *Clarity:* Los préstamos de auto no se aceptan (excepto deficiencias post-embargo).\n"
-                "📝 *Por favor informe al cliente que los préstamos de auto deben resolverse fuera del programa.*"
-            )
-        },
-        "irs": {
-            "global": (
-                "❌ *Elevate:* IRS/tax debt is not accepted.\n"
-                "❌ *Clarity:* IRS/tax debt is not accepted.\n"
-                "📝 *Please inform the client that IRS/tax debt must be resolved outside the program.*",
-                "❌ *Elevate:* La deuda del IRS/impuestos no se acepta.\n"
-                "❌ *Clarity:* La deuda del IRS/impuestos no se acepta.\n"
-                "📝 *Por favor informe al cliente que la deuda del IRS/impuestos debe resolverse fuera del programa.*"
-            )
-        },
-        "judgment": {
-            "global": (
-                "❌ *Elevate:* Judgments are not accepted.\n"
-                "❌ *Clarity:* Judgments are not accepted (unless filed 6+ months ago with no active collection).\n"
-                "📝 *Please inform the client that judgments must be resolved outside the program.*",
-                "❌ *Elevate:* Los juicios no se aceptan.\n"
-                "❌ *Clarity:* Los juicios no se aceptan (a menos que se presentaron hace 6+ meses sin cobro activo).\n"
-                "📝 *Por favor informe al cliente que los juicios deben resolverse fuera del programa.*"
-            )
-        },
-        "alimony": {
-            "global": (
-                "❌ *Elevate:* Alimony/child support is not accepted.\n"
-                "❌ *Clarity:* Alimony/child support is not accepted.\n"
-                "📝 *Please inform the client that alimony/child support must be resolved outside the program.*",
-                "❌ *Elevate:* La pensión alimenticia no se acepta.\n"
-                "❌ *Clarity:* La pensión alimenticia no se acepta.\n"
-                "📝 *Por favor informe al cliente que la pensión alimenticia debe resolverse fuera del programa.*"
-            )
-        },
-        "gambling": {
-            "global": (
-                "❌ *Elevate:* Gambling debts are not accepted.\n"
-                "❌ *Clarity:* Gambling debts are not accepted.\n"
-                "📝 *Please inform the client that gambling debts must be resolved outside the program.*",
-                "❌ *Elevate:* Las deudas de juego no se aceptan.\n"
-                "❌ *Clarity:* Las deudas de juego no se aceptan.\n"
-                "📝 *Por favor informe al cliente que las deudas de juego deben resolverse fuera del programa.*"
-            )
-        },
-        "timeshare": {
-            "global": (
-                "❌ *Elevate:* Timeshares are not accepted.\n"
-                "❌ *Clarity:* Timeshares are not accepted.\n"
-                "📝 *Please inform the client that timeshares must be resolved outside the program.*",
-                "❌ *Elevate:* Los tiempos compartidos no se aceptan.\n"
-                "❌ *Clarity:* Los tiempos compartidos no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los tiempos compartidos deben resolverse fuera del programa.*"
-            )
-        },
-        "property tax": {
-            "global": (
-                "❌ *Elevate:* Property taxes are not accepted.\n"
-                "❌ *Clarity:* Property taxes are not accepted.\n"
-                "📝 *Please inform the client that property taxes must be resolved outside the program.*",
-                "❌ *Elevate:* Los impuestos sobre la propiedad no se aceptan.\n"
-                "❌ *Clarity:* Los impuestos sobre la propiedad no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los impuestos sobre la propiedad deben resolverse fuera del programa.*"
-            )
-        },
-        "bail bond": {
-            "global": (
-                "❌ *Elevate:* Bail bonds are not accepted.\n"
-                "❌ *Clarity:* Bail bonds are not accepted.\n"
-                "📝 *Please inform the client that bail bonds must be resolved outside the program.*",
-                "❌ *Elevate:* Las fianzas no se aceptan.\n"
-                "❌ *Clarity:* Las fianzas no se aceptan.\n"
-                "📝 *Por favor informe al cliente que las fianzas deben resolverse fuera del programa.*"
-            )
-        },
-        
-        # SPECIFIC CREDITORS - NOT ACCEPTED
-        "ncb": {
-            "global": (
-                "❌ *Elevate:* NCB Management Services is not accepted.\n"
-                "❌ *Clarity:* NCB Management Services is not accepted.\n"
-                "📝 *Please inform the client that NCB debts must be resolved outside the program.*",
-                "❌ *Elevate:* NCB Management Services no se acepta.\n"
-                "❌ *Clarity:* NCB Management Services no se acepta.\n"
-                "📝 *Por favor informe al cliente que las deudas de NCB deben resolverse fuera del programa.*"
-            )
-        },
-        "rocket loan": {
-            "global": (
-                "❌ *Elevate:* Rocket Loans is not accepted.\n"
-                "❌ *Clarity:* Rocket Loans is not accepted.\n"
-                "📝 *Please inform the client that Rocket Loans must be resolved outside the program.*",
-                "❌ *Elevate:* Rocket Loans no se acepta.\n"
-                "❌ *Clarity:* Rocket Loans no se acepta.\n"
-                "📝 *Por favor informe al cliente que Rocket Loans debe resolverse fuera del programa.*"
-            )
-        },
-        "goodleap": {
-            "global": (
-                "❌ *Elevate:* GoodLeap is not accepted.\n"
-                "❌ *Clarity:* GoodLeap is not accepted.\n"
-                "📝 *Please inform the client that GoodLeap must be resolved outside the program.*",
-                "❌ *Elevate:* GoodLeap no se acepta.\n"
-                "❌ *Clarity:* GoodLeap no se acepta.\n"
-                "📝 *Por favor informe al cliente que GoodLeap debe resolverse fuera del programa.*"
-            )
-        },
-        "military star": {
-            "global": (
-                "❌ *Elevate:* Military Star is not accepted.\n"
-                "❌ *Clarity:* Military Star is not accepted.\n"
-                "📝 *Please inform the client that Military Star must be resolved outside the program.*",
-                "❌ *Elevate:* Military Star no se acepta.\n"
-                "❌ *Clarity:* Military Star no se acepta.\n"
-                "📝 *Por favor informe al cliente que Military Star debe resolverse fuera del programa.*"
-            )
-        },
-        "tower loan": {
-            "global": (
-                "❌ *Elevate:* Tower Loan is not accepted.\n"
-                "❌ *Clarity:* Tower Loan is not accepted.\n"
-                "📝 *Please inform the client that Tower Loan must be resolved outside the program.*",
-                "❌ *Elevate:* Tower Loan no se acepta.\n"
-                "❌ *Clarity:* Tower Loan no se acepta.\n"
-                "📝 *Por favor informe al cliente que Tower Loan debe resolverse fuera del programa.*"
-            )
-        },
-        "aqua finance": {
-            "global": (
-                "❌ *Elevate:* Aqua Finance is not accepted.\n"
-                "❌ *Clarity:* Aqua Finance is not accepted.\n"
-                "📝 *Please inform the client that Aqua Finance must be resolved outside the program.*",
-                "❌ *Elevate:* Aqua Finance no se acepta.\n"
-                "❌ *Clarity:* Aqua Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que Aqua Finance debe resolverse fuera del programa.*"
-            )
-        },
-        "pentagon": {
-            "global": (
-                "❌ *Elevate:* Pentagon FCU installment loans are not accepted (credit cards only).\n"
-                "❌ *Clarity:* Pentagon FCU installment loans are not accepted.\n"
-                "📝 *Please inform the client that Pentagon FCU installment loans must be resolved outside the program.*",
-                "❌ *Elevate:* Los préstamos a plazos de Pentagon FCU no se aceptan (solo tarjetas de crédito).\n"
-                "❌ *Clarity:* Los préstamos a plazos de Pentagon FCU no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los préstamos a plazos de Pentagon FCU deben resolverse fuera del programa.*"
-            )
-        },
-        "koalafi": {
-            "global": (
-                "❌ *Elevate:* KOALAFI is not accepted.\n"
-                "❌ *Clarity:* KOALAFI is not accepted.\n"
-                "📝 *Please inform the client that KOALAFI must be resolved outside the program.*",
-                "❌ *Elevate:* KOALAFI no se acepta.\n"
-                "❌ *Clarity:* KOALAFI no se acepta.\n"
-                "📝 *Por favor informe al cliente que KOALAFI debe resolverse fuera del programa.*"
-            )
-        },
-        "republic finance": {
-            "global": (
-                "❌ *Elevate:* Republic Finance is not accepted.\n"
-                "❌ *Clarity:* Republic Finance is not accepted.\n"
-                "📝 *Please inform the client that Republic Finance must be resolved outside the program.*",
-                "❌ *Elevate:* Republic Finance no se acepta.\n"
-                "❌ *Clarity:* Republic Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que Republic Finance debe resolverse fuera del programa.*"
-            )
-        },
-        "snap tools": {
-            "global": (
-                "❌ *Elevate:* Snap Tools is not accepted.\n"
-                "❌ *Clarity:* Snap Tools is not accepted.\n"
-                "📝 *Please inform the client that Snap Tools must be resolved outside the program.*",
-                "❌ *Elevate:* Snap Tools no se acepta.\n"
-                "❌ *Clarity:* Snap Tools no se acepta.\n"
-                "📝 *Por favor informe al cliente que Snap Tools debe resolverse fuera del programa.*"
-            )
-        },
-        "cnh": {
-            "global": (
-                "❌ *Elevate:* CNH Industrial is not accepted.\n"
-                "❌ *Clarity:* CNH Industrial is not accepted.\n"
-                "📝 *Please inform the client that CNH Industrial must be resolved outside the program.*",
-                "❌ *Elevate:* CNH Industrial no se acepta.\n"
-                "❌ *Clarity:* CNH Industrial no se acepta.\n"
-                "📝 *Por favor informe al cliente que CNH Industrial debe resolverse fuera del programa.*"
-            )
-        },
-        "duvera": {
-            "global": (
-                "❌ *Elevate:* Duvera Finance is not accepted.\n"
-                "❌ *Clarity:* Duvera Finance is not accepted.\n"
-                "📝 *Please inform the client that Duvera Finance must be resolved outside the program.*",
-                "❌ *Elevate:* Duvera Finance no se acepta.\n"
-                "❌ *Clarity:* Duvera Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que Duvera Finance debe resolverse fuera del programa.*"
-            )
-        },
-        "grt american": {
-            "global": (
-                "❌ *Elevate:* GRT American Financial is not accepted.\n"
-                "❌ *Clarity:* GRT American Financial is not accepted.\n"
-                "📝 *Please inform the client that GRT American Financial must be resolved outside the program.*",
-                "❌ *Elevate:* GRT American Financial no se acepta.\n"
-                "❌ *Clarity:* GRT American Financial no se acepta.\n"
-                "📝 *Por favor informe al cliente que GRT American Financial debe resolverse fuera del programa.*"
-            )
-        },
-        "service finance": {
-            "global": (
-                "❌ *Elevate:* Service Finance is not accepted.\n"
-                "❌ *Clarity:* Service Finance is not accepted.\n"
-                "📝 *Please inform the client that Service Finance must be resolved outside the program.*",
-                "❌ *Elevate:* Service Finance no se acepta.\n"
-                "❌ *Clarity:* Service Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que Service Finance debe resolverse fuera del programa.*"
-            )
-        },
-        "schools first": {
-            "global": (
-                "❌ *Elevate:* Schools First CU loans are not accepted (credit cards only).\n"
-                "❌ *Clarity:* Schools First CU loans are not accepted.\n"
-                "📝 *Please inform the client that Schools First CU loans must be resolved outside the program.*",
-                "❌ *Elevate:* Los préstamos de Schools First CU no se aceptan (solo tarjetas de crédito).\n"
-                "❌ *Clarity:* Los préstamos de Schools First CU no se aceptan.\n"
-                "📝 *Por favor informe al cliente que los préstamos de Schools First CU deben resolverse fuera del programa.*"
-            )
-        },
-        "nebraska furniture": {
-            "global": (
-                "❌ *Elevate:* Nebraska Furniture is not accepted.\n"
-                "❌ *Clarity:* Nebraska Furniture is not accepted.\n"
-                "📝 *Please inform the client that Nebraska Furniture must be resolved outside the program.*",
-                "❌ *Elevate:* Nebraska Furniture no se acepta.\n"
-                "❌ *Clarity:* Nebraska Furniture no se acepta.\n"
-                "📝 *Por favor informe al cliente que Nebraska Furniture debe resolverse fuera del programa.*"
-            )
-        },
-        "aaron": {
-            "global": (
-                "❌ *Elevate:* Aaron's Rent is not accepted.\n"
-                "❌ *Clarity:* Aaron's Rent is not accepted.\n"
-                "📝 *Please inform the client that Aaron's Rent must be resolved outside the program.*",
-                "❌ *Elevate:* Aaron's Rent no se acepta.\n"
-                "❌ *Clarity:* Aaron's Rent no se acepta.\n"
-                "📝 *Por favor informe al cliente que Aaron's Rent debe resolverse fuera del programa.*"
-            )
-        },
-        "sofi": {
-            "global": (
-                "❌ *Elevate:* SoFi is not accepted if federally backed.\n"
-                "❌ *Clarity:* SoFi is not accepted if federally backed.\n"
-                "📝 *Please inform the client that SoFi must be resolved outside the program.*",
-                "❌ *Elevate:* SoFi no se acepta si está respaldado federalmente.\n"
-                "❌ *Clarity:* SoFi no se acepta si está respaldado federalmente.\n"
-                "📝 *Por favor informe al cliente que SoFi debe resolverse fuera del programa.*"
-            )
-        },
-        "rc willey": {
-            "global": (
-                "❌ *Elevate:* RC Willey is not accepted.\n"
-                "❌ *Clarity:* RC Willey is not accepted.\n"
-                "📝 *Please inform the client that RC Willey must be resolved outside the program.*",
-                "❌ *Elevate:* RC Willey no se acepta.\n"
-                "❌ *Clarity:* RC Willey no se acepta.\n"
-                "📝 *Por favor informe al cliente que RC Willey debe resolverse fuera del programa.*"
-            )
-        },
-        "fortiva": {
-            "global": (
-                "❌ *Elevate:* Fortiva is not accepted.\n"
-                "❌ *Clarity:* Fortiva is not accepted.\n"
-                "📝 *Please inform the client that Fortiva must be resolved outside the program.*",
-                "❌ *Elevate:* Fortiva no se acepta.\n"
-                "❌ *Clarity:* Fortiva no se acepta.\n"
-                "📝 *Por favor informe al cliente que Fortiva debe resolverse fuera del programa.*"
-            )
-        },
-        "omni financial": {
-            "global": (
-                "❌ *Elevate:* OMNI Financial is not accepted.\n"
-                "❌ *Clarity:* OMNI Financial is not accepted.\n"
-                "📝 *Please inform the client that OMNI Financial must be resolved outside the program.*",
-                "❌ *Elevate:* OMNI Financial no se acepta.\n"
-                "❌ *Clarity:* OMNI Financial no se acepta.\n"
-                "📝 *Por favor informe al cliente que OMNI Financial debe resolverse fuera del programa.*"
-            )
-        },
-        "srvfinco": {
-            "global": (
-                "❌ *Elevate:* SRVFINCO is not accepted.\n"
-                "❌ *Clarity:* SRVFINCO is not accepted.\n"
-                "📝 *Please inform the client that SRVFINCO must be resolved outside the program.*",
-                "❌ *Elevate:* SRVFINCO no se acepta.\n"
-                "❌ *Clarity:* SRVFINCO no se acepta.\n"
-                "📝 *Por favor informe al cliente que SRVFINCO debe resolverse fuera del programa.*"
-            )
-        },
-        "bhg": {
-            "global": (
-                "❌ *Elevate:* BHG Bankers Healthcare Group is not accepted.\n"
-                "❌ *Clarity:* BHG Bankers Healthcare Group is not accepted.\n"
-                "📝 *Please inform the client that BHG must be resolved outside the program.*",
-                "❌ *Elevate:* BHG Bankers Healthcare Group no se acepta.\n"
-                "❌ *Clarity:* BHG Bankers Healthcare Group no se acepta.\n"
-                "📝 *Por favor informe al cliente que BHG debe resolverse fuera del programa.*"
-            )
-        },
-        "mariner finance": {
-            "global": (
-                "❌ *Elevate:* Mariner Finance is not accepted.\n"
-                "❌ *Clarity:* Mariner Finance is not accepted.\n"
-                "📝 *Please inform the client that Mariner Finance must be resolved outside the program.*",
-                "❌ *Elevate:* Mariner Finance no se acepta.\n"
-                "❌ *Clarity:* Mariner Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que Mariner Finance debe resolverse fuera del programa.*"
-            )
-        },
-        "security finance": {
-            "global": (
-                "❌ *Elevate:* Security Finance is not accepted.\n"
-                "❌ *Clarity:* Security Finance is not accepted.\n"
-                "📝 *Please inform the client that Security Finance must be resolved outside the program.*",
-                "❌ *Elevate:* Security Finance no se acepta.\n"
-                "❌ *Clarity:* Security Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que Security Finance debe resolverse fuera del programa.*"
-            )
-        },
-        "pioneer credit": {
-            "global": (
-                "❌ *Elevate:* Pioneer Credit is not accepted.\n"
-                "❌ *Clarity:* Pioneer Credit is not accepted.\n"
-                "📝 *Please inform the client that Pioneer Credit must be resolved outside the program.*",
-                "❌ *Elevate:* Pioneer Credit no se acepta.\n"
-                "❌ *Clarity:* Pioneer Credit no se acepta.\n"
-                "📝 *Por favor informe al cliente que Pioneer Credit debe resolverse fuera del programa.*"
-            )
-        },
-        "world finance": {
-            "global": (
-                "❌ *Elevate:* World Finance is not accepted.\n"
-                "❌ *Clarity:* World Finance is not accepted.\n"
-                "📝 *Please inform the client that World Finance must be resolved outside the program.*",
-                "❌ *Elevate:* World Finance no se acepta.\n"
-                "❌ *Clarity:* World Finance no se acepta.\n"
-                "📝 *Por favor informe al cliente que World Finance debe resolverse fuera del programa.*"
-            )
-        },
-        
-        # CONDITIONAL ACCEPTANCE
-        "oportun": {
-            "california": (
-                "❌ *Elevate:* Oportun is not accepted in California.\n"
-                "❌ *Clarity:* Oportun is not accepted in California.\n"
-                "📝 *Please inform the client that this debt must be resolved outside the program.*",
-                "❌ *Elevate:* Oportun no se acepta en California.\n"
-                "❌ *Clarity:* Oportun no se acepta en California.\n"
-                "📝 *Por favor informe al cliente que esta deuda debe resolverse fuera del programa.*"
-            ),
-            "global": (
-                "✅ *Elevate:* Oportun is accepted (max 25% of total debt).\n"
-                "✅ *Clarity:* Oportun is accepted (no cap stated).\n"
-                "📝 *Please ensure client meets all other program criteria.*",
-                "✅ *Elevate:* Oportun se acepta (máx 25% de la deuda total).\n"
-                "✅ *Clarity:* Oportun se acepta (sin límite establecido).\n"
-                "📝 *Por favor asegúrese de que el cliente cumpla con todos los demás criterios del programa.*"
-            )
-        },
-        "regional finance": {
-            "global": (
-                "❌ *Elevate:* Regional Finance is not accepted.\n"
-                "✅ *Clarity:* Regional Finance is accepted if unsecured and meets standard criteria.\n"
-                "📝 *Please check specific program requirements.*",
-                "❌ *Elevate:* Regional Finance no se acepta.\n"
-                "✅ *Clarity:* Regional Finance se acepta si es sin garantía y cumple con los criterios estándar.\n"
-                "📝 *Por favor verifique los requisitos específicos del programa.*"
-            )
-        }
-    }
-    
-    # Check for hardcoded rejections
-    for creditor, conditions in hard_rejections.items():
-        if creditor in question_clean:
-            print(f"🔍 Found creditor: {creditor}")
-            for condition, (eng_msg, spa_msg) in conditions.items():
-                print(f"🔍 Checking condition: {condition}")
-                print(f"🔍 Question contains 'california': {'california' in question_clean}")
-                print(f"🔍 Question contains 'ca': {'ca' in question_clean}")
-                print(f"🔍 Full question: {question_clean}")
-                if condition == "global" or (condition in question_clean or "ca" in question_clean):
-                    print(f"🔒 Hardcoded rejection triggered for {creditor} + {condition}")
-                    return f"💬 *Answer (English):*\n{eng_msg}\n\n💬 *Respuesta (Spanish):*\n{spa_msg}"
-                else:
-                    print(f"❌ Condition not met: {condition} not in question and not 'ca'")
-    
-    # Step 3: Global disqualification check (additional creditors not in hardcoded rules)
-    global_disqualified = [
-        "accion usa", "diamond resorts", "cashnetusa", "advance financial", "armed forces bank",
-        "army navy exchange", "ashley furniture", "avio credit", "b&f finance", "bannerbank",
-        "blue green corp", "cc flow", "christianccu", "commonwealth cu", "conns credit",
-        "cornwell tools", "credit america", "crest financial", "diamond resorts", "duvera finance",
-        "educators cu", "enerbank", "founders fcu", "future income payments", "gecrb", "intermountain healthcare",
-        "ispc", "john deere", "karrot loans", "lending usa", "lendmark", "loanmart", "loanosity",
-        "mac credit", "mahindra finance", "mcservices", "monterey collections", "nasa fcu",
-        "new credit america", "orange lake", "paramount", "payday loans", "qualstar cu",
-        "schewels furniture", "snap tools", "spteachercu", "starwood vacation", "superior financial group",
-        "teachers cu", "tempoe llc", "texans credit corp", "time investments", "tribal loans",
-        "tsi trans world systems", "veridian credit union", "virginia cu", "webbank", "welk resort group",
-        "wf/bobsfurniture", "wilshire commercial", "wilson b&t", "world acceptance corporation"
-    ]
-    
-    for keyword in global_disqualified:
-        if keyword in question_clean:
-            eng = (
-                "❌ *Elevate:* This creditor is disqualified and not eligible under any circumstances.\n"
-                "❌ *Clarity:* This creditor is disqualified based on policy documents.\n"
-                "📝 *Please advise the client to resolve this debt outside the program.*"
-            )
-            spa = translate_answer(eng, "spanish")
-            return f"💬 *Answer (English):*\n{eng}\n\n💬 *Respuesta (Spanish):*\n{spa}"
+NO_CONTEXT_ANSWER = (
+    "⚠️ *Elevate:* No specific information found in policy documents.\n"
+    "⚠️ *Clarity:* No specific information found in policy documents.\n"
+    "📝 *Please consult the latest program guidelines or contact support for assistance.*"
+)
+
+# System prompt for document-grounded answers (Step 4 of handle_question)
+ANSWER_SYSTEM_PROMPT = (
+    "You are an expert in Elevate and Clarity debt relief programs. "
+    "Use ONLY the provided document chunks to answer. "
+    "Format answers clearly for each program, using emojis and friendly explanation.\n"
+    "Always answer for *both* Elevate and Clarity, even if the question mentions only one.\n"
+    "Use ✅ for accepted, ❌ for not accepted, ⚠️ for uncertain. "
+    "If unsure or unsupported, say so clearly. If no info found in the chunks, say that too.\n\n"
+    "If the question mentions a specific creditor (e.g., \"Oportun\", \"Regional Finance\", \"CashNetUSA\"), your response must evaluate that creditor's eligibility. Use rejection lists and conditional acceptance rules where found. Also check for conditions such as state restrictions (e.g., \"in California\").\n\n"
+    "Be very specific when interpreting program policies. If a creditor is allowed under certain conditions (like \"Oportun not allowed in CA\"), explain those conditions clearly. Do not confuse this with overall program availability by state.\n\n"
+    "If a creditor has conditional eligibility based on a state (e.g., \"Oportun not allowed in California\"), this restriction must override any general acceptance. Clearly state the condition and outcome, e.g.:\n\n"
+    "> ❌ Oportun is not accepted in California, even though it may be accepted elsewhere.\n\n"
+    "Do not say \"uncertain\" if a state-based restriction is present in the documents. Apply the rule directly when the question includes both the creditor and the state."
+)
+
+def format_answer(answer_en, answer_es):
+    return f"💬 *Answer (English):*\n{answer_en}\n\n💬 *Respuesta (Spanish):*\n{answer_es}"
 
-    # Step 4: Embed and retrieve top 5 chunks
-    top_chunks = get_top_chunks(question, k=5)
+def rule_answer(question, conversation=None, followup=False):
+    """
+    Deterministic eligibility verdict (creditor × program × state table) for the first
+    creditor named in the question, as (English, Spanish), or None. In a Slack thread a
+    follow-up inherits the creditor/state it leaves out.
+    """
+    with span("rules"):
+        rules = get_rules()
+        creditors, states = extract_entities(question, rules)
+        if conversation is not None:
+            creditors, states = carry_over_entities(conversation, creditors, states, followup)
+    for creditor in creditors:
+        verdict = evaluate_creditor(creditor, states, rules)
+        set_decision_path("hard_rule" if rules["creditors"][creditor]["kind"] in ("debt_type", "creditor") else "disqualified_list")
+        logger.debug(f"🔒 Eligibility rule triggered for {creditor} (states: {', '.join(states) or 'any'})")
+        return format_verdict(verdict)
+    return None
+
+def lookup_codex(question, codex_matches=None):
+    """
+    Policy codex lookup. Returns (entry, []) for a direct match that answers the question
+    on its own, else (None, codex context entries for the answer prompt).
+    """
+    if codex_matches is None:
+        with span("codex"):
+            codex_matches = match_codex(question)
+    record_codex_stat("questions")
+    if is_direct_codex_match(codex_matches):
+        set_decision_path("codex")
+        stats = record_codex_stat("short_circuit")
+        logger.debug(f"📘 Codex short-circuit: {codex_matches[0][0]['topic']} "
+              f"({stats['short_circuit']}/{stats['questions']} questions)")
+        return codex_matches[0][0], []
+    codex_context = format_codex_context(codex_matches)
+    if codex_context:
+        stats = record_codex_stat("context")
+        logger.debug(f"📘 Codex context injected: {len(codex_context)} entries "
+              f"({stats['context']}/{stats['questions']} questions)")
+    return None, codex_context
+
+def build_answer_prompt(question, top_chunks, codex_context, history=""):
+    """
+    The user prompt for the answer call from the retrieved chunks, codex context and
+    earlier turns of the thread, or None when there is no usable context.
+    """
     valid_chunks = [(chunk, src) for chunk, src in top_chunks if is_valid_primary_chunk(chunk, src)]
-    
-    # Check if we have valid context
-    if not valid_chunks:
-        eng = (
-            "⚠️ *Elevate:* No specific information found in policy documents.\n"
-            "⚠️ *Clarity:* No specific information found in policy documents.\n"
-            "📝 *Please consult the latest program guidelines or contact support for assistance.*"
-        )
-        spa = translate_answer(eng, "spanish")
-        return f"💬 *Answer (English):*\n{eng}\n\n💬 *Respuesta (Spanish):*\n{spa}"
-    
-    context = "\n\n".join(f"[{src}]: {chunk}" for chunk, src in valid_chunks)
-
-    # Step 5: Create new system prompt
-    system_prompt = (
-        "You are an expert in Elevate and Clarity debt relief programs. "
-        "Use ONLY the provided document chunks to answer. "
-        "Format answers clearly for each program, using emojis and friendly explanation.\n"
-        "Always answer for *both* Elevate and Clarity, even if the question mentions only one.\n"
-        "Use ✅ for accepted, ❌ for not accepted, ⚠️ for uncertain. "
-        "If unsure or unsupported, say so clearly. If no info found in the chunks, say that too.\n\n"
-        "If the question mentions a specific creditor (e.g., \"Oportun\", \"Regional Finance\", \"CashNetUSA\"), your response must evaluate that creditor's eligibility. Use rejection lists and conditional acceptance rules where found. Also check for conditions such as state restrictions (e.g., \"in California\").\n\n"
-        "Be very specific when interpreting program policies. If a creditor is allowed under certain conditions (like \"Oportun not allowed in CA\"), explain those conditions clearly. Do not confuse this with overall program availability by state.\n\n"
-        "If a creditor has conditional eligibility based on a state (e.g., \"Oportun not allowed in California\"), this restriction must override any general acceptance. Clearly state the condition and outcome, e.g.:\n\n"
-        "> ❌ Oportun is not accepted in California, even though it may be accepted elsewhere.\n\n"
-        "Do not say \"uncertain\" if a state-based restriction is present in the documents. Apply the rule directly when the question includes both the creditor and the state."
-    )
-    user_prompt = f"DOCUMENTS:\n{context}\n\nQUESTION:\n{question}"
-
-    answer_en = ask_gpt_with_system_prompt(system_prompt, user_prompt)
-    answer_es = translate_answer(answer_en, "spanish")
-    return f"💬 *Answer (English):*\n{answer_en}\n\n💬 *Respuesta (Spanish):*\n{answer_es}"
+    annotate(chunks_retrieved=len(top_chunks), chunks_used=len(valid_chunks))
+
+    # Check if we have valid context (codex entries count as context)
+    if not valid_chunks and not codex_context:
+        set_decision_path("no_context")
+        return None
+
+    # Codex entries go first so the model treats them as the highest-priority context;
+    # retrieved chunks are deduplicated and packed into the token budget
+    with span("pack_context"):
+        context, packing = pack_context(question, valid_chunks, pinned=codex_context, system_prompt=ANSWER_SYSTEM_PROMPT)
+    record_context_packing(packing)
+    set_decision_path("vector_gpt")
+    if history:
+        return f"DOCUMENTS:\n{context}\n\nEARLIER IN THIS THREAD:\n{history}\n\nQUESTION:\n{question}"
+    return f"DOCUMENTS:\n{context}\n\nQUESTION:\n{question}"
+
+def finish_turn(conversation, question, answer_en, answer_es):
+    if conversation is not None:
+        remember_turn(conversation, question, answer_en)
+    return format_answer(answer_en, answer_es)
+
+def bank_answer(question, conversation=None):
+    """
+    The stored bilingual answer when the question maps onto a canonical one (answer_bank),
+    else None. Follow-ups depend on the thread, so they always take the live path.
+    """
+    if is_followup(question, conversation):
+        return None
+    rules = get_rules()
+    bank = get_bank(rules)
+    if bank is None:
+        return None
+    with span("answer_bank"):
+        found = lookup_answer_bank(bank, question, rules)
+    if found is None:
+        return None
+    set_decision_path(found["path"])
+    annotate(answer_bank=found["key"])
+    stats = question_stats.get()
+    if stats is not None:
+        stats["answer_bank"] = found["key"]
+    if conversation is not None:
+        carry_over_entities(conversation, found["creditors"], found["states"], False)
+    return finish_turn(conversation, question, found["en"], found["es"])
+
+# Decision paths whose answers depend only on the question and the index, so they can be reused
+CACHEABLE_PATHS = ("codex", "no_context", "vector_gpt")
+
+def cached_answer(question, conversation=None):
+    """The answer given earlier to the same (normalized) question on the current index, or None."""
+    if is_followup(question, conversation):
+        return None
+    cached = get_answer_cache().get((normalize_question(question), index_generation))
+    if cached is None:
+        return None
+    set_decision_path(cached["path"])
+    annotate(answer_cache=True)
+    stats = question_stats.get()
+    if stats is not None:
+        stats["answer_cache"] = True
+    if conversation is not None:
+        remember_turn(conversation, question, cached["answer"])
+    return cached["answer"]
+
+def cache_answer(question, conversation, answer, stats):
+    if stats["path"] in CACHEABLE_PATHS and not stats.get("followup"):
+        get_answer_cache().put((normalize_question(question), index_generation), {"answer": answer, "path": stats["path"]})
+
+def handle_question(question, conversation=None):
+    """
+    Answer an English question. `conversation` is the Slack thread's context
+    (conversation_cache), updated in place; a follow-up reuses its entities and chunks.
+    """
+    logger.debug(f"🚀 handle_question called with: {question}")
+    followup = is_followup(question, conversation)
+    if followup:
+        annotate(followup=True)
+        stats = question_stats.get()
+        if stats is not None:
+            stats["followup"] = True
+
+    # Step 1: Deterministic eligibility rules
+    verdict = rule_answer(question, conversation, followup)
+    if verdict is not None:
+        return finish_turn(conversation, question, *verdict)
+
+    # Step 2: Policy codex lookup before any embedding work
+    codex_entry, codex_context = lookup_codex(question)
+    if codex_entry is not None:
+        eng = format_codex_answer(codex_entry)
+        with stage("translate_answer"):
+            spa = translate_answer(eng, "spanish")
+        return finish_turn(conversation, question, eng, spa)
+
+    # Step 3: Embed and retrieve top 5 chunks (a follow-up reuses the thread's chunks)
+    chunk_ids = reusable_chunk_ids(conversation, index_generation, followup) if conversation is not None else None
+    if chunk_ids is not None:
+        annotate(chunks_reused=len(chunk_ids))
+    else:
+        chunk_ids = get_top_chunk_ids(question, k=5)
+        if conversation is not None:
+            remember_chunks(conversation, chunk_ids, index_generation)
+    stats = question_stats.get()
+    if stats is not None:
+        stats["chunk_ids"] = chunk_ids
+    top_chunks = [(chunks[i], chunk_sources[i]) for i in chunk_ids]
+    history = format_history(conversation) if followup else ""
+    user_prompt = build_answer_prompt(question, top_chunks, codex_context, history)
+    if user_prompt is None:
+        answer_en = NO_CONTEXT_ANSWER
+    else:
+        # Step 4: Ask GPT-4 with the answer system prompt
+        with stage("gpt_answer"):
+            answer_en = ask_gpt_with_system_prompt(ANSWER_SYSTEM_PROMPT, user_prompt)
+    with stage("translate_answer"):
+        answer_es = translate_answer(answer_en, "spanish")
+    return finish_turn(conversation, question, answer_en, answer_es)
+
+def retrieve_debt_evidence(queries):
+    """
+    Batched retrieval for debt file checks, keeping only valid policy passages.
+    """
+    if index is None:
+        return [[] for _ in queries]
+    return [
+        [(chunk, src) for chunk, src in found if is_valid_primary_chunk(chunk, src)]
+        for found in get_top_chunks_batch(queries, k=3)
+    ]
 
-def respond(channel, thread_ts, user_mention, question):
+def run_debt_file_check(debts, state=None):
+    """
+    Check a client's whole debt file against the rules, the codex and one batched retrieval.
+    """
+    return check_debt_file(debts, state, retrieve=retrieve_debt_evidence)
+
+DEGRADED_NOTICE = (
+    "⚠️ *Degraded answer:* the AI service is slow or unavailable right now, so this answer was not "
+    "written or translated by the AI. It comes straight from {source}."
+)
+DEGRADED_SOURCES = {
+    "rules": "the eligibility rules",
+    "codex": "the policy codex",
+    "passages": "the policy documents, quoted as written",
+}
+DEGRADED_PASSAGES = 3
+
+def keyword_chunk_ids(question, k=DEGRADED_PASSAGES):
+    """Chunks sharing the most (4+ letter) words with the question, best first; no embedding needed."""
+    words = {word for word in re.findall(r"\w+", question.lower()) if len(word) >= 4}
+    scored = []
+    for i, chunk in enumerate(chunks):
+        score = len(words & set(re.findall(r"\w+", chunk.lower())))
+        if score:
+            scored.append((-score, i))
+    return [i for _, i in sorted(scored)[:k]]
+
+def degraded_passages(question, stats=None):
+    """
+    The valid passages already retrieved for the question, else the ones its cached
+    embedding finds, else the keyword matches.
+    """
+    chunk_ids = (stats or {}).get("chunk_ids")
+    if chunk_ids is None and index is not None:
+        question_vec = get_embedding_cache().get(normalize_question(question))
+        if question_vec is not None:
+            D, I = index.search(np.array([question_vec], dtype=np.float32), 5)
+            chunk_ids = [int(i) for i in I[0] if 0 <= i < len(chunks)]
+    if chunk_ids is None:
+        chunk_ids = keyword_chunk_ids(question, k=10)
+    found = [(chunks[i], chunk_sources[i]) for i in chunk_ids]
+    return [(chunk, src) for chunk, src in found if is_valid_primary_chunk(chunk, src)][:DEGRADED_PASSAGES]
+
+def degraded_answer(question, conversation=None, reason=None):
+    """
+    The answer when the model is unavailable: the rules verdict, the direct codex match or
+    the top retrieved passages quoted verbatim, labelled as degraded. No model calls, no
+    translation.
+    """
+    with span("degraded", reason=type(reason).__name__ if reason else None):
+        source = None
+        verdict = rule_answer(question, conversation, is_followup(question, conversation))
+        if verdict is not None:
+            source, body = "rules", format_answer(*verdict)
+        else:
+            codex_matches = match_codex(question)
+            if is_direct_codex_match(codex_matches):
+                source, body = "codex", format_codex_answer(codex_matches[0][0])
+            else:
+                passages = degraded_passages(question, question_stats.get())
+                if passages:
+                    source = "passages"
+                    body = "\n\n".join(f"> {' '.join(chunk.split())}\n_{src}_" for chunk, src in passages)
+    set_decision_path("degraded")
+    annotate(degraded={"reason": str(reason) if reason else None, "source": source})
+    stats = question_stats.get()
+    if stats is not None:
+        stats["degraded"] = source
+    logger.warning(f"🪫 Degraded answer ({source or 'nothing found'}): {reason}")
+    if source is None:
+        return f"{DEGRADED_NOTICE.format(source='nowhere: nothing matched the question')}\n\n{NO_CONTEXT_ANSWER}"
+    return f"{DEGRADED_NOTICE.format(source=DEGRADED_SOURCES[source])}\n\n{body}"
+
+def run_question(question, conversation=None, deadline=None):
+    """
+    Detect the language, translate to English if needed and answer the question.
+    Returns (answer, stats) where stats holds the decision path and OpenAI token usage.
+    Model calls share one deadline (`deadline`, a time.monotonic() value, by default
+    QUESTION_DEADLINE_SECONDS from now); when it passes, the OpenAI circuit breaker is
+    open or a call fails, the answer is degraded_answer().
+    """
+    deadline = deadline or time.monotonic() + QUESTION_DEADLINE_SECONDS
+    if ASYNC_PIPELINE:
+        with openai_client.deadline(deadline):
+            return async_pipeline.run_question(question, sys.modules[__name__], conversation)
+    stats = new_question_stats()
+    token = question_stats.set(stats)
+    start = time.perf_counter()
+    lang = None
     try:
-        client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=f"🔍 Processing your question, {user_mention}...")
-        lang = detect_language(question)
-        if lang == "spanish":
-            question_en = translate_answer(question, "english")
+        # Canonical questions are answered from the bank in either language, before any model call
+        answer = bank_answer(question, conversation) or cached_answer(question, conversation)
+        if answer is not None:
+            return answer, stats
+        try:
+            with openai_client.deadline(deadline):
+                with stage("detect_language"):
+                    lang = detect_language(question)
+                if lang == "spanish":
+                    with stage("translate_question"):
+                        question_en = translate_answer(question, "english", stage="translate_question")
+                else:
+                    question_en = question
+                answer = handle_question(question_en, conversation)
+        except Exception as e:
+            # The model could not answer in time; a broken key or request still fails loudly
+            if not openai_client.is_transient(e):
+                raise
+            answer = degraded_answer(question, conversation, e)
         else:
-            question_en = question
-        answer = handle_question(question_en)
-        client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=answer)
+            cache_answer(question, conversation, answer, stats)
+    except Exception:
+        ERRORS.inc("question")
+        raise
+    finally:
+        question_stats.reset(token)
+        QUESTION_SECONDS.observe(time.perf_counter() - start)
+        stats["language"] = lang
+        annotate(language=lang, model_calls=stats["model_calls"], total_tokens=stats["total_tokens"])
+    return answer, stats
+
+def build_index(folder_path="documents"):
+    """
+    Compile the rules, load and embed the documents and build the vector index.
+    """
+    global chunks, chunk_sources, index, index_generation
+    reload_rules(force=True)
+    chunk_list, source_list = load_documents(folder_path)
+    print(f"📚 Loaded {len(chunk_list)} chunks from documents.")
+    vectors = embed_chunks(chunk_list)
+    index = create_vector_index(vectors)
+    chunks = ChunkStore.from_lists(chunk_list, source_list)
+    chunk_sources = chunks.sources
+    index_generation += 1
+    prewarm_translations()
+    build_answer_bank(folder_path)
+    return chunks, chunk_sources, index
+
+def build_answer_bank(folder_path="documents", path=None, force=False):
+    """
+    Rebuild the answer bank when the documents, rules or codex changed since it was built.
+    """
+    rules = get_rules()
+    fingerprint = answer_bank.bank_fingerprint(documents_fingerprint(folder_path), rules, POLICY_CODEX)
+    bank = answer_bank.load_bank(path)
+    if not force and bank is not None and bank["fingerprint"] == fingerprint:
+        print(f"🏦 Answer bank is current ({len(bank['answers'])} answers).")
+        answer_bank.reset_bank()
+        return False
+    bank = answer_bank.build_bank(rules, POLICY_CODEX, lambda text: translate_answer(text, "spanish"), fingerprint)
+    answer_bank.save_bank(bank, path)
+    answer_bank.reset_bank()
+    print(f"🏦 Answer bank built: {len(bank['answers'])} answers ({len(bank['rejected'])} left to the live path)")
+    return True
+
+def build_index_store(folder_path="documents", directory=INDEX_STORE_DIR, force=False):
+    """
+    Build the on-disk index store for pre-forked workers, unless it is already current.
+    """
+    fingerprint = documents_fingerprint(folder_path)
+    if not force and is_current(directory, fingerprint):
+        print(f"📦 Index store in {directory} is current.")
+        return False
+    store_chunks, store_sources = load_documents(folder_path)
+    print(f"📚 Loaded {len(store_chunks)} chunks from documents.")
+    vectors = embed_chunks(store_chunks)
+    save_store(directory, vectors, store_chunks, store_sources, fingerprint)
+    print(f"📦 Index store written to {directory}.")
+    return True
+
+def open_index_store(directory=INDEX_STORE_DIR):
+    """
+    Compile the rules and open the shared index store read-only (memory-mapped).
+    """
+    global chunks, chunk_sources, index, index_generation
+    reload_rules(force=True)
+    index, chunks, chunk_sources = open_store(directory)
+    index_generation += 1
+    print(f"📦 Opened index store {directory}: {len(chunks)} chunks, memory-mapped.")
+    return chunks, chunk_sources, index
+
+def chunk_memory_report():
+    """Bytes per chunk in the chunk store against the same chunks as lists of str."""
+    store = chunks if isinstance(chunks, ChunkStore) else ChunkStore.from_lists(chunks, chunk_sources)
+    return store.memory_report()
+
+def log_query(question, answer, start, channel=None, stats=None):
+    """Write a handled question to the query log (path "error" when it failed)."""
+    stats = stats or {}
+    try:
+        get_query_log().record(
+            question, stats.get("path") or "error", (time.perf_counter() - start) * 1000, answer,
+            language=stats.get("language"), model_calls=stats.get("model_calls", 0),
+            total_tokens=stats.get("total_tokens", 0), channel=channel,
+        )
     except Exception as e:
-        print("❌ Error:", e)
+        logger.warning(f"⚠️ Could not write the query log: {e}")
+
+def start_warmup():
+    """
+    Replay the most frequent recent questions in the background, once the index is ready,
+    to warm the embedding and answer caches and the translation memory.
+    """
+    if not WARMUP_ENABLED:
+        return False
+    return get_warmup().start(get_query_log(), run_question)
+
+def respond(channel, thread_ts, user_mention, question, event_id=None, received=None):
+    with start_trace("app_mention", event_id=event_id, channel=channel, thread_ts=thread_ts, question=question):
+        try:
+            with span("slack_post", kind="ack"):
+                client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=f"🔍 Processing your question, {user_mention}...")
+            # Follow-ups in the same thread reuse its entities, chunks and earlier answers
+            conversations = get_conversations()
+            conversation = conversations.get(channel, thread_ts) or new_conversation()
+            start = time.perf_counter()
+            try:
+                # The budget starts when the question leaves the scheduler queue, so a throttled user's
+                # later questions are answered in full; only questions queued for too long are cut short
+                now = time.monotonic()
+                deadline = min(now + QUESTION_DEADLINE_SECONDS, (received or now) + QUESTION_MAX_AGE_SECONDS)
+                answer, stats = run_question(question, conversation, deadline=deadline)
+            except Exception:
+                log_query(question, None, start, channel)
+                raise
+            log_query(question, answer, start, channel, stats)
+            conversations.put(channel, thread_ts, conversation)
+            logger.info(f"📈 Answered via {stats['path']} with {stats['model_calls']} model calls, {stats['total_tokens']} tokens")
+            with span("slack_post", kind="answer"):
+                client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=answer)
+        except Exception as e:
+            annotate(error=f"{type(e).__name__}: {e}")
+            logger.exception(f"❌ Error: {e}")
+            try:
+                client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=(
+                    f"⚠️ Sorry {user_mention}, something went wrong while answering. Please try again in a moment."
+                ))
+            except Exception:
+                logger.exception("❌ Could not post the error reply")
 
 @app.event("app_mention")
 def handle_app_mention_events(body, event, say):
     text = event.get("text", "")
     channel = event["channel"]
-    thread_ts = event.get("ts")
+    # A mention inside a thread belongs to that thread, not to a new one under the mention
+    thread_ts = event.get("thread_ts") or event.get("ts")
     user_mention = f"<@{event.get('user')}>"
-    respond(channel, thread_ts, user_mention, text)
+    # Answered by the fair scheduler's workers, not first-come-first-served
+    get_scheduler().submit(respond, channel, thread_ts, user_mention, text, event_id=body.get("event_id"),
+                           received=time.monotonic(), user=event.get("user"), channel=channel)
+
+@app.command("/debtcheck")
+def handle_debtcheck_command(ack, command, respond):
+    ack()
+    channel = command["channel_id"]
+    with start_trace("debtcheck", trigger_id=command.get("trigger_id"), channel=channel):
+        try:
+            state, debts = parse_debt_file_text(command.get("text", ""))
+            with span("debt_file_check", debts=len(debts)):
+                result = run_debt_file_check(debts, state)
+            # respond() replies ephemerally through the command's response_url, so it also works
+            # in channels and DMs the bot has not joined
+            respond(text=format_debt_file_table(result))
+        except ValueError as e:
+            respond(text=f"⚠️ {e}\nUsage: `/debtcheck CA; Oportun 2500; Discover 4000; Chase 8000`")
+        except Exception as e:
+            annotate(error=f"{type(e).__name__}: {e}")
+            logger.exception(f"❌ Error: {e}")
 
 if __name__ == "__main__":
     print("🚀 Starting final patched Slack DocGPT bot with codex and document fallback...")
-    chunks, chunk_sources = load_documents()
-    print(f"📚 Loaded {len(chunks)} chunks from documents.")
-    vectors = embed_chunks(chunks)
-    index = create_vector_index(vectors)
+    build_index()
     print("✅ Bot is ready.")
     SocketModeHandler(app, SLACK_APP_TOKEN).start()
@@ -0,0 +1,73 @@
+import re
+
+# Every state, DC and PR, so states missing from StateList.txt (e.g. North Dakota) are still recognized
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "FL": "Florida", "GA": "Georgia",
+    "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa",
+    "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+    "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+    "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+    "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont",
+    "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "DC": "District of Columbia", "PR": "Puerto Rico",
+}
+
+# Codes that are also everyday words; they only count when written in capitals after a location cue
+# ("VA" as in a VA loan, "MD" as in a doctor)
+AMBIGUOUS_CODES = {"AL", "CO", "DE", "HI", "ID", "IN", "LA", "MA", "MD", "ME", "MI", "MO", "MS", "OH", "OK", "OR", "PA", "VA"}
+LOCATION_CUES = {"in", "from", "to", "of", "for", "state", "resides", "lives", "living"}
+
+TOKEN = re.compile(r"[A-Za-z]+")
+
+
+def build_state_index(document_states=None):
+    """
+    Index full state names and two-letter codes.
+    `document_states` ({code: name}, parsed from StateList.txt) extends or overrides the built-in table.
+    """
+    codes = dict(US_STATES)
+    codes.update(document_states or {})
+    names = {name.lower(): code for code, name in codes.items()}
+    # Longest names first so "West Virginia" is not read as "Virginia"
+    alternation = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return {
+        "codes": codes,
+        "names": names,
+        "name_pattern": re.compile(r"(?<![A-Za-z])(" + alternation + r")(?![A-Za-z])", re.IGNORECASE),
+    }
+
+
+def _overlaps(start, end, spans):
+    return any(start < span_end and end > span_start for span_start, span_end in spans)
+
+
+def extract_states(question, state_index, exclude_spans=()):
+    """
+    State codes mentioned in the question, in order of appearance.
+    Full names match case-insensitively as whole words; codes match as whole tokens.
+    Text inside `exclude_spans` (e.g. a matched "Virginia CU") is ignored.
+    """
+    found = []
+    for match in state_index["name_pattern"].finditer(question):
+        if not _overlaps(match.start(), match.end(), exclude_spans):
+            found.append((match.start(), state_index["names"][match.group(1).lower()]))
+    name_spans = [(m.start(), m.end()) for m in state_index["name_pattern"].finditer(question)]
+
+    previous = None
+    for match in TOKEN.finditer(question):
+        token = match.group(0)
+        code = token.upper()
+        span = (match.start(), match.end())
+        if len(token) == 2 and code in state_index["codes"] and not _overlaps(*span, list(exclude_spans) + name_spans):
+            if code not in AMBIGUOUS_CODES or (token == code and previous in LOCATION_CUES):
+                found.append((match.start(), code))
+        previous = token.lower()
+
+    states = []
+    for _, code in sorted(found):
+        if code not in states:
+            states.append(code)
+    return states
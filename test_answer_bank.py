@@ -0,0 +1,62 @@
+import copy
+
+import pytest
+
+import answer_bank
+import translation_memory
+from eligibility_rules import get_rules, evaluate_creditor, format_verdict
+from policy_codex_full_ready import POLICY_CODEX
+
+
+def spanish(text):
+    return text.replace("Source", "Fuente")
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return answer_bank.build_bank(get_rules(), POLICY_CODEX, spanish, "test")
+
+
+def test_lookup_matches_the_live_verdict(bank):
+    rules = get_rules()
+    found = answer_bank.lookup(bank, "Is Oportun accepted for a client in California?", rules)
+    assert found["key"] == "creditor:oportun:CA"
+    assert (found["en"], found["es"]) == format_verdict(evaluate_creditor("oportun", ["CA"], rules))
+
+    # A state that does not change the verdict maps onto the creditor's default answer
+    found = answer_bank.lookup(bank, "Is Oportun accepted for a client in Ohio?", rules)
+    assert found["key"] == "creditor:oportun:*"
+    assert (found["en"], found["es"]) == format_verdict(evaluate_creditor("oportun", ["OH"], rules))
+
+    found = answer_bank.lookup(bank, "When is the first payment date?", rules)
+    assert found["path"] == "codex" and "Fuente" in found["es"]
+    assert answer_bank.lookup(bank, "Are private student loans accepted in Elevate?", rules) is None
+
+
+def test_unvetted_translations_are_left_to_the_live_path():
+    bank = answer_bank.build_bank(get_rules(), POLICY_CODEX[:2], lambda text: "Sin formato", "test")
+    assert not any(key.startswith("codex:") for key in bank["answers"])
+    assert len(bank["rejected"]) == 2
+
+
+def test_bank_answers_without_model_calls(fakes, tmp_path, monkeypatch):
+    monkeypatch.setattr(answer_bank, "ANSWER_BANK_PATH", str(tmp_path / "answer_bank.json"))
+    # The bank is translated through the translation memory: never the one in the working directory
+    monkeypatch.setattr(translation_memory, "_memory", translation_memory.TranslationMemory(":memory:"))
+    answer_bank.reset_bank()
+    bot, fake = fakes()
+    (tmp_path / "docs").mkdir()
+    assert bot.build_answer_bank(str(tmp_path / "docs"))
+    assert not bot.build_answer_bank(str(tmp_path / "docs"))  # unchanged documents: kept as is
+
+    fake.reset()
+    answer, stats = bot.run_question("Is Oportun accepted for a client in California?")
+    assert fake.count() == 0
+    assert stats["answer_bank"] == "creditor:oportun:CA" and stats["path"] == "hard_rule"
+    assert answer.startswith("💬 *Answer (English):*")
+
+    # A rules reload that changes a verdict turns the bank off until it is rebuilt
+    changed = copy.deepcopy(get_rules())
+    changed["table"][("oportun", "elevate", "CA")] = dict(changed["table"][("oportun", "elevate", "CA")], en="Changed.")
+    assert answer_bank.get_bank(changed) is None
+    answer_bank.reset_bank()
@@ -0,0 +1,85 @@
+import pytest
+
+import async_pipeline
+from conversation_cache import new_conversation
+
+
+@pytest.fixture(scope="module", autouse=True)
+def slow_model(bot):
+    """Model calls take 50 ms, so overlapping them shows in the timeline."""
+    bot.fake.latency = 0.05
+    yield
+    bot.fake.latency = 0.0
+
+
+def clear_caches(bot):
+    bot.get_answer_cache().clear()
+    bot.get_embedding_cache().clear()
+
+
+def ask_both(bot, question):
+    clear_caches(bot)
+    bot.ASYNC_PIPELINE = False
+    expected, sync_stats = bot.run_question(question)
+    clear_caches(bot)
+    bot.ASYNC_PIPELINE = True
+    try:
+        answer, stats = bot.run_question(question)
+    finally:
+        bot.ASYNC_PIPELINE = False
+    assert answer == expected
+    assert stats["path"] == sync_stats["path"]
+    return stats
+
+
+def test_detection_and_embedding_overlap(bot):
+    stats = ask_both(bot, "Are private student loans accepted in Elevate?")
+    timeline = stats["timeline"]
+    steps = {step["name"]: step for step in timeline["steps"]}
+    # Both calls were in flight together, so the answer call waited for one of them, not both
+    assert steps["embed_query"]["start_ms"] < steps["detect_language"]["start_ms"] + steps["detect_language"]["duration_ms"]
+    assert timeline["critical_path"][-2:] == ["gpt_answer", "translate_answer"]
+    assert timeline["saved_ms"] > 30
+    assert timeline["wall_ms"] < timeline["serial_ms"]
+
+
+def test_hard_rule_cancels_model_calls(bot):
+    stats = ask_both(bot, "Is Oportun accepted for a client in California?")
+    assert stats["path"] == "hard_rule"
+    assert stats["model_calls"] == 0
+    assert set(stats["timeline"]["cancelled"]) == {"detect_language", "embed_query"}
+    assert stats["timeline"]["critical_path"] == ["answer_bank", "match"]
+
+
+def test_spanish_question_is_embedded_in_english(bot):
+    bot.fake.reset()
+    stats = ask_both(bot, "¿El cliente puede incluir préstamos estudiantiles privados?")
+    names = [step["name"] for step in stats["timeline"]["steps"] if step["status"] == "done"]
+    assert "translate_question" in names
+    embedded = [call["payload"][0] for call in bot.fake.calls if call["kind"] == "embedding"]
+    # sync run, then the async run: the speculative Spanish embedding and the English one
+    assert embedded[-1] == embedded[0] and embedded[0].startswith("[english]")
+
+
+
+def test_untranslated_spanish_question_does_not_reset_the_thread(bot, monkeypatch):
+    clear_caches(bot)
+    conversation = new_conversation()
+    bot.run_question("Is Oportun accepted for a client?", conversation)
+    atranslate = async_pipeline.atranslate
+
+    async def translate(bot, text, target_lang, stage_name="translate_answer"):
+        if stage_name == "translate_question":
+            return "And if the client lives in Florida and the loan is older than two years?"
+        return await atranslate(bot, text, target_lang, stage_name)
+
+    monkeypatch.setattr(async_pipeline, "atranslate", translate)
+    bot.ASYNC_PIPELINE = True
+    try:
+        # Matched as written, this is no follow-up: it must not wipe the thread's creditor before translation
+        answer, stats = bot.run_question("¿Si el cliente vive en la Florida y el préstamo tiene más de dos años?",
+                                         conversation)
+    finally:
+        bot.ASYNC_PIPELINE = False
+    assert stats["path"] == "hard_rule" and "Oportun" in answer
+    assert conversation["creditors"] == ["oportun"] and conversation["states"] == ["FL"]
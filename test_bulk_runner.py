@@ -0,0 +1,63 @@
+import json
+
+from bulk_runner import percentile, read_questions, read_results, run, summarize
+
+
+def stats(path="vector_gpt"):
+    return {"path": path, "model_calls": 1, "prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120,
+            "models": {"gpt-4": {"prompt_tokens": 100, "completion_tokens": 20}}}
+
+
+def write_questions(tmp_path):
+    path = tmp_path / "questions.csv"
+    path.write_text("id,question\nq1,Is Oportun accepted?\nq2,When is the first payment date?\nq3,\n", encoding="utf-8")
+    return str(path)
+
+
+def test_rerun_skips_answered_questions_and_retries_errors_on_request(tmp_path):
+    questions = list(read_questions(write_questions(tmp_path)))
+    assert questions == [("q1", "Is Oportun accepted?"), ("q2", "When is the first payment date?")]
+    output = str(tmp_path / "results.jsonl")
+    asked = []
+
+    def flaky(question):
+        asked.append(question)
+        if question.startswith("When"):
+            raise TimeoutError("model timed out")
+        return f"answer to {question}", stats()
+
+    summary = run(questions, output, flaky, concurrency=2)
+    assert summary["questions"] == 2 and summary["errors"] == 1
+    # A line cut off by an interruption is ignored, and that question runs again
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "q3", "quest')
+
+    asked.clear()
+    run(questions, output, flaky)
+    assert asked == []
+
+    summary = run(questions, output, lambda question: (asked.append(question) or "fixed", stats()), retry_errors=True)
+    assert asked == ["When is the first payment date?"]
+    assert summary["errors"] == 0 and read_results(output)["q2"]["answer"] == "fixed"
+
+
+def test_baseline_marks_changed_answers(tmp_path):
+    baseline = {"q1": {"id": "q1", "answer": "❌ Not accepted."}, "q2": {"id": "q2", "answer": "The 15th."}}
+    output = str(tmp_path / "results.jsonl")
+    answers = {"Is Oportun accepted?": "❌ Not accepted.", "When is the first payment date?": "The 1st."}
+    summary = run(read_questions(write_questions(tmp_path)), output, lambda q: (answers[q], stats()), baseline=baseline)
+    assert summary["compared"] == 2 and summary["changed_answers"] == 1
+    with open(output, encoding="utf-8") as f:
+        changed = {result["id"]: result["changed"] for result in map(json.loads, f)}
+    assert changed == {"q1": False, "q2": True}
+
+
+def test_summary_percentiles_and_cost():
+    results = [{"id": str(i), "answer": "a", "error": None, "latency_ms": float(i), "path": "codex",
+                "total_tokens": 10, "cost_usd": 0.001} for i in range(1, 101)]
+    results.append({"id": "x", "answer": None, "error": "RuntimeError: boom", "latency_ms": 5000.0})
+    summary = summarize(results)
+    assert summary["latency_ms"] == {"p50": 51.0, "p95": 95.0, "max": 100.0}
+    assert summary["errors"] == 1 and summary["paths"] == {"codex": 100}
+    assert summary["total_tokens"] == 1000 and summary["cost_usd"] == 0.1
+    assert percentile([], 50) == 0.0 and percentile([3.0], 99) == 3.0
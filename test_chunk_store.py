@@ -0,0 +1,30 @@
+import numpy as np
+
+from chunk_store import ChunkStore, list_memory
+
+CHUNKS = [f"PRIVATE STUDENT LOANS {i} Elevate: ✅ Accepted (non-federal only, max 25%) — ñandú" for i in range(40)] + [""]
+SOURCES = ["ComparisonTable.txt", "Clarity.txt", "Elevate.pdf", "Clarity.txt"] * 10 + ["Empty.txt"]
+
+
+def test_round_trip_and_interned_sources(tmp_path):
+    store = ChunkStore.from_lists(CHUNKS, SOURCES)
+    assert list(store) == CHUNKS and list(store.sources) == SOURCES
+    assert store.source_table == ["ComparisonTable.txt", "Clarity.txt", "Elevate.pdf", "Empty.txt"]
+    assert store.source_ids.dtype == np.uint16
+    assert store[-1] == "" and store[1:3] == CHUNKS[1:3] and store.sources[3] == "Clarity.txt"
+
+    store.save(str(tmp_path))
+    mapped = ChunkStore.open(str(tmp_path))
+    assert mapped.mapped and len(mapped) == 41
+    assert mapped[7] == CHUNKS[7] and mapped.sources[6] == "Elevate.pdf"
+    # A view is a window on the mapped file, not a copy
+    view = mapped.view(7)
+    assert view.readonly and view.tobytes() == CHUNKS[7].encode("utf-8")
+    assert isinstance(mapped.data, np.memmap)
+
+
+def test_store_is_smaller_than_lists():
+    store = ChunkStore.from_lists(CHUNKS, SOURCES)
+    report = store.memory_report()
+    assert report["list_bytes"] == list_memory(CHUNKS, SOURCES)
+    assert report["bytes_per_chunk"] < report["list_bytes_per_chunk"] / 2
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the precompiled POLICY_CODEX keyword index
+"""
+from codex_index import match_codex, is_direct_codex_match
+
+def topics(question):
+    return [entry["topic"] for entry, _ in match_codex(question)]
+
+def test_codex_direct_matches():
+    for question, topic in [
+        ("When is the first payment date?", "First Payment Date"),
+        ("What is the minimum per creditor?", "Clarity Minimums"),
+        ("What DTI does the client need?", "Clarity DTI and Credit Score"),
+    ]:
+        matches = match_codex(question)
+        assert matches[0][0]["topic"] == topic
+        assert is_direct_codex_match(matches)
+
+def test_codex_word_boundaries():
+    # "ach" must not fire inside "each", "repo" not inside "report"
+    assert "ACH Requirement" not in topics("each creditor needs a credit report")
+    assert "Auto Loan Charge-Offs" not in topics("each creditor needs a credit report")
+    assert "Creditor Minimum Balance" in topics("is $500 enough?")
+
+def test_codex_ambiguous_match_is_context_only():
+    matches = match_codex("client has a credit union account")
+    assert len(matches) > 1
+    assert not is_direct_codex_match(matches)
@@ -0,0 +1,22 @@
+from context_packing import pack_context, count_tokens, format_context
+
+PDF_COPY = "Payday loans are not accepted in Elevate. Payday loans are not accepted in Clarity."
+TXT_COPY = "Payday loans are not accepted in Elevate.\nPayday loans are not accepted in Clarity."
+
+
+def test_duplicate_sources_are_sent_once():
+    passages = [(TXT_COPY, "Elevate.txt"), (PDF_COPY, "Elevate.pdf")]
+    context, report = pack_context("Are payday loans accepted?", passages, budget=1000)
+    assert context.count("Payday loans are not accepted in Elevate.") == 1
+    assert report["duplicates_dropped"] == 2
+    assert report["tokens_saved"] > 0
+
+
+def test_budget_is_respected_and_codex_is_pinned():
+    passages = [(f"Sentence number {i} about installment loans and their documents.", f"doc{i}.txt") for i in range(40)]
+    pinned = [("Oportun is capped at 25% of the file.", "POLICY_CODEX: oportun")]
+    context, report = pack_context("Are installment loans accepted?", passages, pinned=pinned, budget=120)
+    assert context.startswith("[POLICY_CODEX: oportun]: Oportun is capped")
+    assert count_tokens(context) <= 120
+    assert report["tokens_before"] == count_tokens(format_context(pinned + passages))
+    assert report["over_budget_dropped"] > 0
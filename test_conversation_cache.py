@@ -0,0 +1,80 @@
+import pytest
+
+from conversation_cache import ConversationCache, new_conversation, is_followup, remember_turn
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_and_ttl_eviction():
+    clock = Clock()
+    cache = ConversationCache(max_threads=2, ttl=60, clock=clock)
+    for ts in ("1", "2"):
+        cache.put("C1", ts, new_conversation())
+    assert cache.get("C1", "1") is not None  # "2" is now the least recently used
+    cache.put("C1", "3", new_conversation())
+    assert cache.get("C1", "2") is None
+    assert cache.get("C1", "1") is not None and cache.get("C1", "3") is not None
+
+    clock.now = 61
+    assert cache.get("C1", "1") is None
+    report = cache.report()
+    assert report["evicted"] == 1 and report["expired"] == 1 and report["threads"] == 1
+
+
+def test_followup_detection():
+    conversation = new_conversation()
+    assert not is_followup("what about in Texas?", conversation)  # nothing to follow up on yet
+    remember_turn(conversation, "Is Oportun accepted?", "❌ Not accepted.")
+    assert is_followup("<@U123> what about in Texas?", conversation)
+    assert is_followup("And if the client lives in Florida and the loan is older than two years?", conversation)
+    assert not is_followup("What documents does a client need to provide for a repossession deficiency?", conversation)
+    assert is_followup("In Texas?", conversation)
+    assert is_followup("¿Y en Texas?", conversation)
+    assert is_followup("Oportun in CA?", conversation)
+    # Short but standalone: they name no creditor/state to stand in for the thread's
+    assert not is_followup("What is the minimum debt amount?", conversation)
+    assert not is_followup("How long does the program last?", conversation)
+    assert not is_followup("Minimum debt in Texas?", conversation)
+
+
+def test_followup_inherits_creditor(bot):
+    conversation = new_conversation()
+    bot.run_question("Is Oportun accepted for a client?", conversation)
+    bot.fake.reset()
+    answer, stats = bot.run_question("what about in California?", conversation)
+    assert stats["path"] == "hard_rule" and not bot.fake.count("embedding")
+    assert "California" in answer
+    assert conversation["creditors"] == ["oportun"] and conversation["states"] == ["CA"]
+
+
+def test_short_standalone_questions_do_not_inherit_creditor(bot):
+    conversation = new_conversation()
+    bot.run_question("Is Oportun accepted for a client?", conversation)
+    for question in ("What is the minimum debt amount?", "How long does the program last?"):
+        answer, stats = bot.run_question(question, conversation)
+        assert stats["path"] != "hard_rule" and "Oportun" not in answer
+
+
+@pytest.mark.parametrize("async_pipeline", [False, True])
+def test_followup_reuses_chunks_and_history(bot, async_pipeline):
+    bot.get_answer_cache().clear()
+    bot.get_embedding_cache().clear()
+    bot.ASYNC_PIPELINE = async_pipeline
+    try:
+        conversation = new_conversation()
+        bot.run_question("Are private student loans accepted in Elevate?", conversation)
+        bot.fake.reset()
+        _, stats = bot.run_question("and for Clarity?", conversation)
+    finally:
+        bot.ASYNC_PIPELINE = False
+    assert stats["path"] == "vector_gpt"
+    assert not bot.fake.count("embedding")
+    prompt = [call for call in bot.fake.calls if call["model"] == "gpt-4"][-1]["payload"][-1]["content"]
+    assert "EARLIER IN THIS THREAD:\nQ: Are private student loans accepted in Elevate?" in prompt
+    assert len(conversation["turns"]) == 2
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from scheduler import Scheduler
+
+
+@pytest.fixture
+def breaker_open(bot):
+    breaker = bot.openai_client.CircuitBreaker(failures=1)
+    breaker.record_failure()
+    saved, bot.openai_client._breaker = bot.openai_client._breaker, breaker
+    yield
+    bot.openai_client._breaker = saved
+
+
+@pytest.fixture(params=[False, True], ids=["sync", "async"])
+def pipeline(bot, request):
+    bot.get_answer_cache().clear()
+    bot.get_embedding_cache().clear()
+    bot.ASYNC_PIPELINE = request.param
+    yield
+    bot.ASYNC_PIPELINE = False
+
+
+def test_open_breaker_quotes_retrieved_passages(bot, breaker_open, pipeline):
+    bot.fake.reset()
+    answer, stats = bot.run_question("Are private student loans accepted in Elevate?")
+    assert stats["path"] == "degraded" and stats["degraded"] == "passages"
+    assert answer.startswith("⚠️ *Degraded answer:*")
+    assert "> PRIVATE STUDENT LOANS Elevate: ✅ Accepted" in answer and "_ComparisonTable.txt_" in answer
+    assert bot.fake.calls == []
+    # Degraded answers are not cached for later questions
+    assert bot.get_answer_cache().get((bot.normalize_question("Are private student loans accepted in Elevate?"),
+                                       bot.index_generation)) is None
+
+
+def test_open_breaker_still_applies_the_rules_in_any_language(bot, breaker_open, pipeline):
+    answer, stats = bot.run_question("¿Se acepta Oportun para un cliente en California?")
+    # The async pipeline matches the rules alongside language detection, so it never needs the model
+    if bot.ASYNC_PIPELINE:
+        assert stats["path"] == "hard_rule"
+    else:
+        assert stats["path"] == "degraded" and stats["degraded"] == "rules"
+        assert answer.startswith("⚠️ *Degraded answer:*")
+    assert "Oportun" in answer and "💬 *Respuesta (Spanish):*" in answer
+
+
+def test_passed_deadline_answers_without_waiting(bot, pipeline):
+    bot.fake.latency = 5.0
+    try:
+        start = time.monotonic()
+        answer, stats = bot.run_question("Does Clarity accept unsecured personal loans?", deadline=start + 0.3)
+    finally:
+        bot.fake.latency = 0.0
+    assert time.monotonic() - start < 2.0
+    assert stats["degraded"] == "passages" and "> Clarity accepts unsecured personal loans" in answer
+
+
+def test_rejected_requests_are_not_degraded(bot, pipeline, monkeypatch):
+    def rejected(model, messages, kwargs):
+        raise bot.fake.error.AuthenticationError("Incorrect API key provided")
+
+    monkeypatch.setattr(bot.fake, "_chat", rejected)
+    with pytest.raises(bot.fake.error.AuthenticationError):
+        bot.run_question("Does Clarity accept unsecured personal loans?")
+
+
+def test_throttled_users_later_questions_get_full_answers(bot, pipeline, monkeypatch):
+    monkeypatch.setattr(bot, "QUESTION_DEADLINE_SECONDS", 0.4)
+    bot.client.messages.clear()
+    # Two questions a second for this user: the last one waits ~1.5 s in the queue, well past the budget
+    scheduler = Scheduler(workers=1, user_rate=120, user_burst=1).start()
+    try:
+        futures = [
+            scheduler.submit(bot.respond, "C0001", f"1.00000{n}", "<@U00001>", question,
+                             received=time.monotonic(), user="U00001", channel="C0001")
+            for n, question in enumerate([
+                "Does Clarity accept unsecured personal loans?", "Are unsecured personal loans accepted by Clarity?",
+                "Will Clarity take credit cards from most lenders?", "Can Clarity enroll credit cards?",
+            ])
+        ]
+        for future in futures:
+            future.result(timeout=10)
+    finally:
+        scheduler.stop()
+    answers = [m["text"] for m in bot.client.messages if not m["text"].startswith("🔍 Processing")]
+    assert len(answers) == 4
+    assert not [answer for answer in answers if answer.startswith("⚠️")]
+
+    # A question that sat in the queue past QUESTION_MAX_AGE_SECONDS is not sent to the model
+    monkeypatch.setattr(bot, "QUESTION_MAX_AGE_SECONDS", 60)
+    bot.fake.reset()
+    bot.respond("C0001", "1.000009", "<@U00001>", "Can Clarity enroll store cards?", received=time.monotonic() - 61)
+    assert bot.client.messages[-1]["text"].startswith("⚠️ *Degraded answer:*") and bot.fake.calls == []
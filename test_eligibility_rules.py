@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled eligibility rules table
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import eligibility_rules
+from eligibility_rules import compile_rules, find_creditors, find_states, evaluate_creditor, format_verdict, parse_state_list
+
+RULES = compile_rules()
+
+def test_oportun_state_condition():
+    eng, spa = format_verdict(evaluate_creditor("oportun", ["CA"], RULES))
+    assert eng.startswith("❌ *Elevate:* Oportun is not accepted in California.")
+    assert "no se acepta en California" in spa
+    eng, _ = format_verdict(evaluate_creditor("oportun", ["TX"], RULES))
+    assert eng.startswith("✅ *Elevate:* Oportun is accepted (max 25% of total debt).")
+
+def test_creditor_matching_uses_word_boundaries():
+    assert find_creditors("When is the first payment due?", RULES) == []
+    assert find_creditors("Client has two mortgages", RULES) == ["mortgage"]
+    assert find_creditors("Is Aaron's Rent accepted?", RULES) == ["aaron"]
+
+def test_documents_are_compiled_into_the_table():
+    # Disqualified.txt names become aliases, credit union list becomes creditors
+    assert find_creditors("NCB Management Services account", RULES) == ["ncb"]
+    assert RULES["creditors"]["altura cu"]["kind"] == "unacceptable_credit_unions"
+    assert RULES["table"][("cashnetusa", "elevate", None)]["verdict"] == "rejected"
+
+def test_state_service_restrictions():
+    states, not_serviced = parse_state_list(open(os.path.join("documents", "StateList.txt"), encoding="utf-8").read())
+    assert states["OR"] == "Oregon"
+    assert not_serviced["MN"] == {"clarity": "RevShare 15%"}
+    result = evaluate_creditor("goodleap", find_states("GoodLeap loan in Oregon", RULES), RULES)
+    assert result["state_service"]["elevate"]["verdict"] == "rejected"
+
+def test_hot_reload_picks_up_rule_changes(monkeypatch):
+    tmp = tempfile.mkdtemp()
+    try:
+        rules_path = os.path.join(tmp, "rules.json")
+        shutil.copy(eligibility_rules.RULES_PATH, rules_path)
+        monkeypatch.setattr(eligibility_rules, "RULES_PATH", rules_path)
+        monkeypatch.setattr(eligibility_rules, "_rules", None)
+        assert eligibility_rules.reload_rules(force=True)["table"][("sofi", "clarity", None)]["verdict"] == "rejected"
+
+        with open(rules_path, encoding="utf-8") as f:
+            spec = json.load(f)
+        sofi = next(c for c in spec["creditors"] if c["key"] == "sofi")
+        sofi["rules"][0]["clarity"]["verdict"] = "conditional"
+        with open(rules_path, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        os.utime(rules_path, (0, 0))
+
+        assert eligibility_rules.reload_rules()["table"][("sofi", "clarity", None)]["verdict"] == "conditional"
+    finally:
+        shutil.rmtree(tmp)
+
+def test_fuzzy_creditor_names():
+    for question, creditor in [
+        ("Is Good Leap accepted?", "goodleap"),
+        ("client has a goodleep loan", "goodleap"),
+        ("Rocket Loan$ balance is 3000", "rocket loan"),
+        ("Marriner Finance account", "mariner finance"),
+        ("they have a judgement", "judgment"),
+    ]:
+        assert find_creditors(question, RULES) == [creditor]
+    assert find_creditors("landmark credit union card", RULES) == []
+    assert find_creditors("teachers can enroll?", RULES) == []
+
+def test_state_extraction_uses_tokens():
+    from eligibility_rules import extract_entities
+    assert extract_entities("Is Oportun ok in California?", RULES) == (["oportun"], ["CA"])
+    assert extract_entities("oportun for a client in ca", RULES) == (["oportun"], ["CA"])
+    # "ca" inside card/cash/medical is not California
+    assert extract_entities("Oportun card, cash advance and medical debt", RULES) == (["oportun"], [])
+    # Everyday words only count as codes in capitals after a location cue
+    assert extract_entities("Is that OK for Oportun?", RULES) == (["oportun"], [])
+    assert extract_entities("Client lives in OK and has Oportun", RULES) == (["oportun"], ["OK"])
+    assert extract_entities("Is a VA loan eligible for Oportun?", RULES) == (["oportun"], [])
+    assert extract_entities("Client lives in VA and has Oportun", RULES) == (["oportun"], ["VA"])
+    # Creditor names are not read as states; states outside StateList.txt still resolve
+    assert extract_entities("Virginia CU card, client in West Virginia", RULES) == (["virginia cu"], ["WV"])
+    assert extract_entities("Oportun in North Dakota", RULES) == (["oportun"], ["ND"])
+
+def test_debt_file_percentage_limits():
+    from eligibility_batch import check_debt_file, parse_debt_file_text
+    state, debts = parse_debt_file_text("TX; Discover 5,000; Amex $3000; Oportun 3000")
+    result = check_debt_file(debts, state, rules=RULES)
+    limits = {limit["limit"]: limit for limit in result["limits"]}
+    assert not limits["Oportun"]["ok"] and not limits["Discover/AMEX"]["ok"]
+    oportun = result["debts"][2]
+    assert oportun["programs"]["elevate"]["verdict"] == "rejected"
+    assert oportun["programs"]["clarity"]["verdict"] == "accepted"
+
+    result = check_debt_file([{"creditor": "Oportun", "balance": 2000}, {"creditor": "Chase", "balance": 8000}], "TX",
+                             retrieve=lambda queries: [[("Credit cards are accepted.", "Elevate.txt")] for _ in queries],
+                             rules=RULES)
+    assert result["limits"][0]["ok"]
+    assert result["debts"][1]["programs"]["elevate"]["verdict"] == "review"
+    assert result["debts"][1]["evidence"][0]["source"] == "Elevate.txt"
+
+
+def test_debt_file_rejects_non_finite_balances():
+    from eligibility_batch import normalize_debts
+    for balance in ("nan", "inf", float("-inf"), "1e999"):
+        with pytest.raises(ValueError):
+            normalize_debts([{"creditor": "Oportun", "balance": balance}])
+    assert normalize_debts([{"creditor": "Oportun", "balance": "$2,500"}]) == [{"creditor": "Oportun", "balance": 2500.0}]
+
+
+def test_debtcheck_replies_only_to_the_caller(bot, monkeypatch):
+    handler = bot.app.handlers[("command", "/debtcheck")]
+    replies, posted = [], []
+    monkeypatch.setattr(bot.client, "chat_postMessage", lambda **kwargs: posted.append(kwargs))
+    for text in ("TX; Oportun 2000; Chase 8000", "Oportun"):
+        handler(ack=lambda: None, respond=lambda **kwargs: replies.append(kwargs["text"]),
+                command={"channel_id": "C0001", "trigger_id": "1.1", "text": text})
+    assert "Oportun" in replies[0] and replies[1].startswith("⚠️") and "Usage" in replies[1]
+    assert posted == []
@@ -0,0 +1,28 @@
+import faiss
+import numpy as np
+
+from index_store import save_store, open_store, is_current
+
+
+def test_mmap_index_matches_faiss(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 16)).astype(np.float32)
+    queries = rng.normal(size=(3, 16)).astype(np.float32)
+    chunks = [f"chunk {i} – ñandú ✅" for i in range(50)]
+    directory = str(tmp_path / "store")
+    save_store(directory, vectors, chunks, [f"doc{i % 3}.txt" for i in range(50)], "abc")
+
+    index, stored_chunks, sources = open_store(directory)
+    reference = faiss.IndexFlatL2(16)
+    reference.add(vectors)
+    D, I = index.search(queries, 5)
+    D_ref, I_ref = reference.search(queries, 5)
+    assert (I == I_ref).all()
+    assert np.allclose(D, D_ref, rtol=1e-4, atol=1e-4)
+    assert stored_chunks[7] == chunks[7] and len(stored_chunks) == 50
+    assert sources[4] == "doc1.txt"
+    assert is_current(directory, "abc") and not is_current(directory, "changed")
+
+    # k larger than the index pads with -1 like faiss
+    _, I = index.search(queries[:1], 60)
+    assert I[0, 50:].tolist() == [-1] * 10
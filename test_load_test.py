@@ -0,0 +1,74 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmark_fakes import FakeOpenAIServer, FakeSlackServer
+from load_test import Tracker, event_payload, parse_latency, saturated
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.load(response)
+
+
+def test_latency_distributions():
+    assert parse_latency("fixed:0.2")() == 0.2
+    lognormal = parse_latency("lognormal:1.0,0.5", seed=1)
+    samples = [lognormal() for _ in range(2000)]
+    assert 0.9 < sorted(samples)[1000] < 1.1
+    uniform = parse_latency("uniform:0.1,0.3")
+    assert all(0.1 <= uniform() <= 0.3 for _ in range(100))
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1")
+
+
+def test_replies_in_the_thread_are_matched_to_their_event():
+    slack = FakeSlackServer(lambda kind=None: 0.0)
+    tracker = Tracker()
+    slack.listeners.append(tracker.on_message)
+    try:
+        payload = event_payload(7, "When is the first payment date?", "U00001", "C0001")
+        ts = payload["event"]["ts"]
+        assert payload["event"]["text"].endswith("When is the first payment date?")
+        tracker.sent(ts)
+        post(f"{slack.url}chat.postMessage", {"channel": "C0001", "thread_ts": ts, "text": "🔍 Processing..."})
+        assert ts in tracker.pending
+        post(f"{slack.url}chat.postMessage", {"channel": "C0001", "thread_ts": ts, "text": "💬 *Answer*"})
+        tracker.sent("1.000001")
+        tracker.sent("1.000002")
+        tracker.sent("1.000003")
+        post(f"{slack.url}chat.postMessage", {"channel": "C0001", "thread_ts": "1.000002",
+                                               "text": "⚠️ Sorry <@U00001>, something went wrong while answering."})
+        post(f"{slack.url}chat.postMessage", {"channel": "C0001", "thread_ts": "1.000003",
+                                               "text": "⚠️ *Degraded answer:* the AI service is slow..."})
+        tracker.drain(0.1)
+        latencies, failed = tracker.take()
+        assert list(latencies) == [ts]
+        assert failed == {"1.000001": "timeout", "1.000002": "apology", "1.000003": "degraded"}
+        assert len(slack.messages) == 4
+    finally:
+        slack.close()
+
+
+def test_fake_openai_server_answers_and_fails_on_request():
+    server = FakeOpenAIServer(lambda kind: 0.0)
+    failing = FakeOpenAIServer(lambda kind: 0.0, error_rate=1.0)
+    try:
+        reply = post(f"{server.url}/embeddings", {"model": "text-embedding-ada-002", "input": ["hello"]})
+        assert len(reply["data"]) == 1
+        with pytest.raises(urllib.error.HTTPError):
+            post(f"{failing.url}/embeddings", {"model": "text-embedding-ada-002", "input": ["hello"]})
+    finally:
+        server.close()
+        failing.close()
+
+
+def test_saturation_reasons():
+    step = {"sent": 100, "answered": 100, "p95_s": 2.0, "error_rate": 0.0}
+    assert saturated(step, slo=10, max_error_rate=0.01) is None
+    assert "p95" in saturated(dict(step, p95_s=12.0), slo=10, max_error_rate=0.01)
+    assert "error rate" in saturated(dict(step, error_rate=0.05), slo=10, max_error_rate=0.01)
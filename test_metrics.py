@@ -0,0 +1,38 @@
+import threading
+
+from metrics import Counter, Histogram, render_prometheus, timed, STAGE_SECONDS
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("test_seconds", "test", labels=("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        hist.observe(value, "gpt_answer")
+    snapshot = hist.snapshot("gpt_answer")
+    assert snapshot["count"] == 4
+    assert snapshot["buckets"] == {0.1: 1, 1.0: 3}
+    lines = hist.render()
+    assert 'test_seconds_bucket{stage="gpt_answer",le="+Inf"} 4' in lines
+    assert 'test_seconds_bucket{stage="gpt_answer",le="1.0"} 3' in lines
+
+
+def test_counter_is_thread_safe():
+    counter = Counter("test_total", "test", labels=("path",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("codex")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.get("codex") == 8000
+
+
+def test_timed_stage_is_exported():
+    before = STAGE_SECONDS.snapshot("faiss_search")["count"]
+    with timed("faiss_search"):
+        pass
+    assert STAGE_SECONDS.snapshot("faiss_search")["count"] == before + 1
+    assert "# TYPE docgpt_stage_seconds histogram" in render_prometheus()
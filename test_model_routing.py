@@ -0,0 +1,29 @@
+import json
+
+import model_routing
+from model_routing import load_routes
+
+
+def test_stage_routes_and_env_overrides(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({
+        "stages": {"translate_answer": {"model": "gpt-3.5-turbo", "max_tokens": 900}},
+        "default": {"model": "gpt-4", "timeout": 20},
+    }))
+    routes = load_routes(str(path), environ={"MODEL_ROUTE_ANSWER_TIMEOUT": "90"})
+    assert routes["translate_answer"]["model"] == "gpt-3.5-turbo"
+    assert routes["translate_answer"]["max_tokens"] == 900
+    assert routes["translate_answer"]["timeout"] == 20.0
+    assert routes["answer"] == {"model": "gpt-4", "timeout": 90.0, "max_tokens": 800, "temperature": 0.3}
+
+
+def test_shipped_routes_keep_gpt4_for_answers():
+    routes = load_routes(model_routing.ROUTING_PATH, environ={})
+    assert routes["answer"]["model"] == "gpt-4"
+    assert routes["translate_answer"]["model"] != "gpt-4"
+
+
+def test_missing_routing_file_warns_and_uses_the_default(tmp_path, capsys):
+    routes = load_routes(str(tmp_path / "missing.json"), environ={})
+    assert "No model routing file" in capsys.readouterr().out
+    assert routes["translate_answer"] == model_routing.DEFAULT_ROUTE
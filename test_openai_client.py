@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+import openai_client
+
+
+def test_retries_rate_limits_with_backoff(monkeypatch):
+    monkeypatch.setattr(openai_client, "_breaker", openai_client.CircuitBreaker())
+    monkeypatch.setattr(openai_client, "OPENAI_BACKOFF_BASE", 0.0)
+    errors = openai_client.openai.error
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) < 3:
+            raise errors.RateLimitError("slow down")
+        return {"usage": {"total_tokens": 10}, "choices": []}
+
+    response = openai_client._call(create, "test-model", ["hello"], 50, 5, {"messages": []})
+    assert response["usage"]["total_tokens"] == 10
+    assert len(calls) == 3
+    assert calls[0]["request_timeout"] == 5
+
+
+def test_invalid_requests_are_not_retried(monkeypatch):
+    monkeypatch.setattr(openai_client, "_breaker", openai_client.CircuitBreaker())
+    errors = openai_client.openai.error
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise errors.InvalidRequestError("bad request", None)
+
+    with pytest.raises(errors.InvalidRequestError):
+        openai_client._call(create, "test-model", ["hello"], 0, None, {})
+    assert len(calls) == 1
+
+
+def test_failed_attempts_give_back_their_tokens(monkeypatch):
+    monkeypatch.setattr(openai_client, "_breaker", openai_client.CircuitBreaker())
+    monkeypatch.setattr(openai_client, "OPENAI_BACKOFF_BASE", 0.0)
+    tokens_bucket = openai_client.TokenBucket(1000)
+    monkeypatch.setitem(openai_client._limiters, "test-model", (openai_client.TokenBucket(600), tokens_bucket))
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) < 4:
+            raise openai_client.openai.error.ServiceUnavailableError("down")
+        return {"usage": {"total_tokens": 50}, "choices": []}
+
+    openai_client._call(create, "test-model", ["x" * 400], 200, None, {})
+    # Four attempts reserved 300 tokens each; only the 50 the successful one used are gone
+    assert 949 <= tokens_bucket.tokens <= 951
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = openai_client.TokenBucket(per_minute=600)  # 10 per second
+    assert bucket.acquire(600) == 0.0
+    start = time.monotonic()
+    bucket.acquire(2)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers_through_a_trial():
+    now = [0.0]
+    breaker = openai_client.CircuitBreaker(failures=3, reset_seconds=10, clock=lambda: now[0])
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    now[0] = 10.0
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opens == 2
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_breaker_fails_fast(monkeypatch):
+    breaker = openai_client.CircuitBreaker(failures=2)
+    monkeypatch.setattr(openai_client, "_breaker", breaker)
+    monkeypatch.setattr(openai_client, "OPENAI_BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(openai_client, "OPENAI_MAX_RETRIES", 2)
+    errors = openai_client.openai.error
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise error
+
+    # Rate limits mean OpenAI is up: retried, but not counted against it
+    error = errors.RateLimitError("slow down")
+    with pytest.raises(errors.RateLimitError):
+        openai_client._call(create, "test-model", ["hello"], 0, None, {})
+    assert breaker.consecutive_failures == 0
+
+    # One failure per call that ran out of retries, not one per attempt
+    error = errors.ServiceUnavailableError("down")
+    with pytest.raises(errors.ServiceUnavailableError):
+        openai_client._call(create, "test-model", ["hello"], 0, None, {})
+    assert len(calls) == 6 and breaker.consecutive_failures == 1 and breaker.state == "closed"
+    with pytest.raises(errors.ServiceUnavailableError):
+        openai_client._call(create, "test-model", ["hello"], 0, None, {})
+    assert breaker.state == "open"
+
+    with pytest.raises(openai_client.CircuitOpen):
+        openai_client._call(create, "test-model", ["hello"], 0, None, {})
+    assert len(calls) == 9
+
+
+def test_open_breaker_fails_before_the_limiter(monkeypatch):
+    breaker = openai_client.CircuitBreaker(failures=1)
+    breaker.record_failure()
+    monkeypatch.setattr(openai_client, "_breaker", breaker)
+    requests_bucket, tokens_bucket = openai_client.TokenBucket(60), openai_client.TokenBucket(600)
+    requests_bucket.acquire(60)
+    monkeypatch.setitem(openai_client._limiters, "test-model", (requests_bucket, tokens_bucket))
+
+    start = time.monotonic()
+    with openai_client.deadline(start + 5):
+        with pytest.raises(openai_client.CircuitOpen):
+            openai_client._call(lambda **kwargs: None, "test-model", ["hello"], 100, None, {})
+    assert time.monotonic() - start < 0.5
+    # Nothing was reserved for the call that was never made
+    assert tokens_bucket.try_acquire(600) == 0.0
+
+
+def test_deadline_bounds_timeouts_and_retries(monkeypatch):
+    monkeypatch.setattr(openai_client, "_breaker", openai_client.CircuitBreaker())
+    monkeypatch.setattr(openai_client, "OPENAI_BACKOFF_BASE", 10.0)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise openai_client.openai.error.Timeout("slow")
+
+    start = time.monotonic()
+    with openai_client.deadline(start + 0.5):
+        with pytest.raises(openai_client.ModelUnavailable):
+            openai_client._call(create, "test-model", ["hello"], 0, 30, {})
+        assert calls[0]["request_timeout"] <= 0.5
+    assert time.monotonic() - start < 1.0
+
+    made = len(calls)
+    with openai_client.deadline(time.monotonic() - 1):
+        with pytest.raises(openai_client.DeadlineExceeded):
+            openai_client._call(create, "test-model", ["hello"], 0, None, {})
+    assert len(calls) == made
@@ -0,0 +1,49 @@
+import os
+
+import pdf_extraction
+from pdf_extraction import check_page, extract_pdf_text, extract_pdf_text_layout, fidelity, garbage_ratio, txt_twin
+
+DOCUMENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "documents")
+PROSE = "Clarity accepts unsecured personal loans and credit cards from most lenders in every state. "
+
+
+def test_page_check_reasons():
+    assert check_page(PROSE) is None
+    assert check_page("  Page 3  ") == "too_short"
+    assert check_page(PROSE + "(cid:12)(cid:7)" * 5) == "garbage"
+    assert check_page(PROSE + "�\x07" * 3) == "garbage"
+    assert garbage_ratio("line one\nline two\t✅ ñ") == 0.0
+    # Underlined headings are not a table; a ruled grid is
+    assert check_page(PROSE, (19, 0)) is None
+    assert check_page(PROSE, (24, 4)) == "table"
+
+
+def test_fast_path_matches_pdfplumber():
+    path = os.path.join(DOCUMENTS, "Elevate.pdf")
+    text, report = extract_pdf_text(path)
+    assert report["tiers"] == {"fast": 6} and report["pages"] == 6
+    assert "\r" not in text
+    assert fidelity(text, extract_pdf_text_layout(path)) > 0.99
+
+
+def test_table_pages_use_pdfplumber():
+    path = os.path.join(DOCUMENTS, "Debt Program Comparison Table.pdf")
+    text, report = extract_pdf_text(path)
+    assert report["reasons"] == {"table": 2} and report["tiers"] == {"pdfplumber": 2}
+    assert text == extract_pdf_text_layout(path)
+
+
+def test_txt_twin_is_preferred(fakes, tmp_path, monkeypatch):
+    text, _ = extract_pdf_text(os.path.join(DOCUMENTS, "Elevate.pdf"))
+    (tmp_path / "Elevate.pdf").write_bytes(open(os.path.join(DOCUMENTS, "Elevate.pdf"), "rb").read())
+    (tmp_path / "Elevate.txt").write_text(text.replace("\n", " "), encoding="utf-8")
+    (tmp_path / "Other.txt").write_text(PROSE, encoding="utf-8")
+    assert txt_twin(text, {"Other.txt": PROSE}) is None
+    assert txt_twin(text, {"Other.txt": PROSE, "Elevate.txt": text}) == "Elevate.txt"
+
+    bot, _ = fakes()
+    _, sources = bot.load_documents(str(tmp_path))
+    assert set(sources) == {"Elevate.txt", "Other.txt"}
+    monkeypatch.setattr(pdf_extraction, "TWIN_SIMILARITY", 1.01)
+    _, sources = bot.load_documents(str(tmp_path))
+    assert "Elevate.pdf" in sources
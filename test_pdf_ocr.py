@@ -0,0 +1,58 @@
+import pypdfium2 as pdfium
+import pytest
+from PIL import Image, ImageDraw
+
+import pdf_extraction
+import pdf_ocr
+from pdf_ocr import ocr_page, ocr_pages
+
+
+def size_recognizer(image):
+    """Reads back the image mode and size; only images wider than 1000px are 'confident'."""
+    return f"{image.mode} {image.width}x{image.height}", 90.0 if image.width > 1000 else 50.0
+
+
+def confident_recognizer(image):
+    return "scanned text", 95.0
+
+
+@pytest.fixture
+def scan(tmp_path):
+    """Two image-only letter pages at 150 DPI: a block of 'text' in the middle, and a blank page."""
+    page = Image.new("L", (1275, 1650), 255)
+    ImageDraw.Draw(page).rectangle((300, 600, 900, 800), fill=0)
+    path = str(tmp_path / "scan.pdf")
+    page.save(path, "PDF", resolution=150, save_all=True, append_images=[Image.new("L", (1275, 1650), 255)])
+    return path
+
+
+def test_low_confidence_page_is_rerun_at_high_dpi_on_the_text_crop(scan):
+    document = pdfium.PdfDocument(scan)
+    result = ocr_page(document[0], size_recognizer)
+    # 600x200 px of ink at 150 DPI plus a 25px margin each side, then the same crop at 300 DPI
+    assert result["dpi"] == pdf_ocr.OCR_HIGH_DPI and result["confidence"] == 90.0
+    mode, size = result["text"].split()
+    width, height = map(int, size.split("x"))
+    assert mode == "L" and abs(width - 1300) <= 4 and abs(height - 500) <= 4
+    # Only the crop is rendered at 300 DPI: under a third of the pixels of one full 300 DPI page
+    assert result["pixels"] < 2550 * 3300 / 3
+
+    result = ocr_page(document[0], confident_recognizer)
+    assert result["dpi"] == pdf_ocr.OCR_DPI and result["text"] == "scanned text"
+
+    blank = ocr_page(document[1], confident_recognizer)
+    assert blank["text"] == "" and blank["confidence"] is None
+    document.close()
+
+
+def test_pool_returns_pages_in_order(scan):
+    results = ocr_pages(scan, [1, 0], workers=2, recognize=confident_recognizer)
+    assert [(result["page"], result["text"]) for result in results] == [(1, ""), (0, "scanned text")]
+
+
+def test_scanned_pages_go_to_ocr(scan, monkeypatch):
+    monkeypatch.setattr(pdf_extraction, "ocr_pages", lambda path, numbers: ocr_pages(path, numbers, 1, confident_recognizer))
+    text, report = pdf_extraction.extract_pdf_text(scan)
+    assert text == "scanned text\n"
+    assert report["reasons"] == {"too_short": 2} and report["tiers"] == {"ocr": 2}
+    assert [entry["dpi"] for entry in report["ocr"]] == [pdf_ocr.OCR_DPI] * 2
@@ -0,0 +1,79 @@
+import time
+
+import query_log
+import tracing
+from query_log import QueryLog, QueryCache, Warmup, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("<@U123>  Is Oportun accepted in CA?? ") == "is oportun accepted in ca"
+    assert normalize_question("Max 25% for $500?") == "max 25% for $500"
+
+
+def test_top_questions_by_recent_frequency():
+    log = QueryLog(":memory:")
+    now = 1_000_000.0
+    for _ in range(3):
+        log.record("Are payday loans accepted?", "vector_gpt", 1200.0, ts=now - 60)
+    log.record("are payday loans accepted", "vector_gpt", 900.0, ts=now - 30)
+    log.record("When is the first payment date?", "codex", 10.0, ts=now - 60)
+    log.record("When is the first payment date?", "error", 10.0, ts=now - 60)
+    for _ in range(9):
+        log.record("Old question", "vector_gpt", 10.0, ts=now - 30 * 86400)
+    assert log.top_questions(limit=5, window_days=7, now=now) == [
+        ("are payday loans accepted", 4),
+        ("When is the first payment date?", 1),
+    ]
+    assert log.count() == 15
+
+
+def test_old_queries_are_pruned():
+    log = QueryLog(":memory:", retention_days=28)
+    now = time.time()
+    log.record("Recent question", "codex", 10.0, ts=now - 86400)
+    log.record("Old question", "codex", 10.0, ts=now - 29 * 86400)
+    assert log.prune(now) == 1
+    assert log.top_questions(window_days=365, now=now) == [("Recent question", 1)]
+    # Opening a log prunes it too; 0 keeps everything
+    assert QueryLog(":memory:", retention_days=0).prune(now) == 0
+
+
+def test_query_cache_lru_and_ttl():
+    clock = [0.0]
+    cache = QueryCache("test", max_entries=2, ttl=10, clock=lambda: clock[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    clock[0] = 11
+    assert cache.get("a") is None
+    assert cache.report()["entries"] == 1
+
+
+def test_warmup_replays_top_questions(bot, tmp_path, monkeypatch):
+    fake = bot.fake
+    # respond() traces the question: keep the trace files out of the checkout
+    monkeypatch.setattr(tracing, "_writer", tracing._TraceWriter(str(tmp_path / "traces.jsonl"),
+                                                                 str(tmp_path / "slow_queries.jsonl")))
+    query_log.get_answer_cache().clear()
+    query_log.get_embedding_cache().clear()
+
+    log = QueryLog(str(tmp_path / "queries.sqlite3"))
+    monkeypatch.setattr(query_log, "_query_log", log)
+    bot.respond("C1", "1.0", "<@U1>", "Are private student loans accepted?")
+    assert log.top_questions() == [("Are private student loans accepted?", 1)]
+    query_log.get_answer_cache().clear()
+    query_log.get_embedding_cache().clear()
+
+    warmup = Warmup()
+    assert warmup.report()["state"] == "idle"
+    assert warmup.start(log, bot.run_question)
+    warmup.join(timeout=10)
+    assert warmup.report() == dict(warmup.report(), state="done", total=1, done=1, errors=0, progress=1.0)
+    assert not warmup.start(log, bot.run_question)
+
+    fake.reset()
+    answer, stats = bot.run_question("are private student loans accepted")
+    assert stats.get("answer_cache") and stats["path"] == "vector_gpt"
+    assert fake.count() == 0
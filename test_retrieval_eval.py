@@ -0,0 +1,71 @@
+import contextlib
+import os
+
+import pytest
+
+from benchmark_fakes import fake_embedding
+from retrieval_eval import (EmbeddingCache, MissingEmbeddings, default_config, evaluate, make_embedder, normalize,
+                            parse_config, read_gold)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DOCUMENTS = [
+    ("Elevate.txt", "OPORTUN\n- Capped at 25%\n- ❌ Not allowed if client resides in CA\n\n"
+                    "PAYMENT METHOD\n✅ Auto-draft only\n❌ No mail-in or bi-monthly payments"),
+    ("Clarity.txt", "GAS CARDS\nAccepted only if backed by major banks (e.g., BP from Chase)"),
+]
+GOLD = [
+    {"id": "oportun", "question": "Is Oportun allowed in CA?", "passages": ["Not allowed if client resides in CA"]},
+    {"id": "gas", "question": "Are gas cards accepted?", "passages": ["backed by major banks", "Capped at 25%"]},
+]
+
+
+def hashed(texts):
+    return [fake_embedding(text) for text in texts]
+
+
+def test_gold_passages_are_in_the_documents(fakes):
+    bot, _ = fakes()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        text = normalize(" ".join(text for _, text in bot.read_documents(os.path.join(ROOT, "documents"))))
+    gold, version = read_gold(os.path.join(ROOT, "retrieval_gold.jsonl"))
+    assert len(version) == 12 and len({case["id"] for case in gold}) == len(gold)
+    assert [passage for case in gold for passage in case["passages"] if normalize(passage) not in text] == []
+
+
+def test_metrics_for_a_configuration(fakes):
+    bot, _ = fakes()
+    config = parse_config("k=1", default_config(bot))
+    row = evaluate(bot, DOCUMENTS, GOLD, config, make_embedder("hashed", fetch=hashed))
+    # One chunk per question: the Oportun block, and the gas card block (half of its passages)
+    assert row["chunks"] == 3
+    assert row["recall_at_k"] == 0.75 and row["mrr"] == 1.0
+    assert row["misses"] == ["gas"] and row["empty_context_rate"] == 0.0
+    assert evaluate(bot, DOCUMENTS, GOLD, dict(config, k=3), make_embedder("hashed", fetch=hashed))["recall_at_k"] == 1.0
+    with pytest.raises(ValueError):
+        parse_config("chunk_size=80", config)
+
+
+def test_merge_thresholds_change_the_chunks(fakes):
+    bot, _ = fakes()
+    config = default_config(bot)
+    embed = make_embedder("hashed", fetch=hashed)
+    documents = [("Notes.txt", "Clients enroll online today\nGAS CARDS\nOnly major banks\n\nSee notes")]
+    gold = [{"id": "gas", "question": "Are gas cards accepted?", "passages": ["GAS CARDS Only major banks"]}]
+    assert evaluate(bot, documents, gold, config, embed)["chunks"] == 2
+    # A two-word line is no longer a header, so it does not start a chunk of its own
+    assert evaluate(bot, documents, gold, dict(config, header_max_words=1), embed)["chunks"] == 1
+    # Two-word chunks are kept
+    assert evaluate(bot, documents, gold, dict(config, min_chunk_words=2), embed)["chunks"] == 3
+
+
+def test_cached_embeddings_are_reused_offline(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    calls = []
+    embed = make_embedder("model", cache, lambda texts: calls.append(list(texts)) or hashed(texts))
+    first = embed(["alpha beta", "gamma", "alpha beta"])
+    assert calls == [["alpha beta", "gamma"]]
+
+    offline = make_embedder("model", EmbeddingCache(str(tmp_path / "embeddings.sqlite3")))
+    assert (offline(["gamma", "alpha beta"]) == first[[1, 0]]).all()
+    with pytest.raises(MissingEmbeddings):
+        offline(["delta"])
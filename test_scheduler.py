@@ -0,0 +1,36 @@
+import threading
+
+from scheduler import Scheduler
+
+
+def run_all(scheduler, jobs):
+    """Submit (user, channel) jobs while the workers are paused; return the order they ran in."""
+    order, gate = [], threading.Event()
+    futures = [scheduler.submit(lambda u=user: (gate.wait(), order.append(u)), user=user, channel=channel)
+               for user, channel in jobs]
+    gate.set()
+    scheduler.start()
+    for future in futures:
+        future.result(timeout=5)
+    scheduler.stop()
+    return order
+
+
+def test_one_user_cannot_starve_the_others():
+    scheduler = Scheduler(workers=1, user_rate=6000, user_burst=100, channel_rate=6000, channel_burst=100)
+    jobs = [("flood", "C1")] * 10 + [("agent", "C1"), ("other", "C2")]
+    order = run_all(scheduler, jobs)
+    # Fair queuing interleaves the late users instead of running them after all 10 flood jobs
+    assert order.index("agent") <= 2 and order.index("other") <= 3
+
+
+def test_priority_classes_and_rate_limits():
+    classes = {"boss": "supervisor"}
+    scheduler = Scheduler(workers=1, user_rate=60, user_burst=1, channel_rate=6000, channel_burst=100,
+                          classify=lambda user, channel: "escalation" if channel == "ESC" else classes.get(user, "default"))
+    order = run_all(scheduler, [("a", "C1"), ("a", "C1"), ("boss", "C1"), ("b", "ESC")])
+    assert order[:2] == ["b", "boss"]
+    # The second job of "a" waited for its bucket (1 per second)
+    assert order[2:] == ["a", "a"]
+    report = scheduler.report()
+    assert report["default"]["done"] == 2 and report["default"]["max_delay_s"] >= 0.9
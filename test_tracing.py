@@ -0,0 +1,32 @@
+import json
+
+import tracing
+
+
+def test_trace_spans_and_slow_query_log(tmp_path, monkeypatch):
+    trace_path, slow_path = tmp_path / "traces.jsonl", tmp_path / "slow.jsonl"
+    monkeypatch.setattr(tracing, "_writer", tracing._TraceWriter(str(trace_path), str(slow_path)))
+    monkeypatch.setattr(tracing, "SLOW_QUERY_MS", 1e9)
+
+    with tracing.start_trace("app_mention", event_id="Ev1", channel="C1", thread_ts="1.0"):
+        with tracing.stage("embed_query"):
+            pass
+        with tracing.span("rules"):
+            tracing.annotate(path="hard_rule")
+    monkeypatch.setattr(tracing, "SLOW_QUERY_MS", 0)
+    with tracing.start_trace("app_mention", event_id="Ev2", channel="C1", thread_ts="2.0"):
+        pass
+    tracing.flush()
+
+    traces = [json.loads(line) for line in trace_path.read_text().splitlines()]
+    assert [t["event_id"] for t in traces] == ["Ev1", "Ev2"]
+    assert traces[0]["path"] == "hard_rule"
+    assert [s["name"] for s in traces[0]["spans"]] == ["embed_query", "rules"]
+    slow = [json.loads(line) for line in slow_path.read_text().splitlines()]
+    assert [t["event_id"] for t in slow] == ["Ev2"]
+
+
+def test_span_outside_trace_is_noop():
+    with tracing.span("faiss_search"):
+        pass
+    assert tracing.current_trace.get() is None
@@ -0,0 +1,45 @@
+from translation_memory import TranslationMemory
+
+
+def fake_model(calls):
+    def ask(prompt):
+        calls.append(prompt)
+        header, _, text = prompt.partition(":\n")
+        lines = text.split("\n")
+        if len(lines) > 1:
+            return "\n".join(line.replace(". ", ". ES ", 1) for line in lines)
+        return f"ES {text}"
+    return ask
+
+
+def test_only_new_sentences_go_to_the_model(tmp_path):
+    calls = []
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    text = "✅ *Elevate:* Accepted. Please inform the client.\n📝 *Check the criteria.*"
+    first, result = memory.translate(text, "spanish", fake_model(calls))
+    assert first == "✅ *Elevate:* ES Accepted. ES Please inform the client.\n📝 *ES Check the criteria.*"
+    assert result == {"hits": 0, "misses": 3, "tokens_saved": 0}
+    assert len(calls) == 1
+
+    second, result = memory.translate("❌ *Clarity:* Rejected. Please inform the client.", "spanish", fake_model(calls))
+    assert second == "❌ *Clarity:* ES Rejected. ES Please inform the client."
+    assert result["hits"] == 1 and result["misses"] == 1
+    assert calls[-1] == "Translate the following text to spanish:\nRejected."
+
+    # Persistent: a new instance on the same file serves everything without the model
+    reopened = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    again, result = reopened.translate(text, "spanish", fake_model(calls))
+    assert again == first and result["misses"] == 0 and len(calls) == 2
+    assert reopened.report()["hit_rate"] == 1.0
+
+
+def test_seed_pairs_align_sentences(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    added = memory.seed_pairs([
+        ("Not accepted. Max 25%.", "No aceptado. Máximo 25%."),
+        ("📝 *Not accepted.*", "📝 *No aceptado.*"),  # same sentence behind markup: not stored twice
+        ("One sentence.", "Una frase. Dos frases."),  # misaligned: skipped
+    ], "spanish")
+    assert added == 2
+    assert memory.get("Max 25%.", "spanish") == "Máximo 25%."
+    assert memory.get("One sentence.", "spanish") is None
@@ -0,0 +1,68 @@
+import json
+import sys
+import time
+
+import pytest
+from slack_sdk.signature import SignatureVerifier
+
+from benchmark_fakes import FakeSlackServer
+
+SECRET = "test-signing-secret"
+
+
+@pytest.fixture(scope="module")
+def web():
+    """The real app.py with its Slack client pointed at a fake Slack Web API."""
+    slack = FakeSlackServer()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SLACK_BOT_TOKEN", "xoxb-test")
+        mp.setenv("SLACK_SIGNING_SECRET", SECRET)
+        mp.setenv("SLACK_API_URL", slack.url)
+        for name in ("app", "slack_doc_bot"):
+            mp.delitem(sys.modules, name, raising=False)
+        import app
+        submitted = []
+
+        class Scheduler:
+            def submit(self, fn, *args, **kwargs):
+                submitted.append(args)
+
+        mp.setattr(app.slack_doc_bot, "get_scheduler", lambda: Scheduler())
+        yield app.app.test_client(), submitted
+        for name in ("app", "slack_doc_bot"):
+            sys.modules.pop(name, None)
+    slack.close()
+
+
+def mention(event_id):
+    return json.dumps({"type": "event_callback", "event_id": event_id, "team_id": "T0TEST", "event": {
+        "type": "app_mention", "user": "U00001", "channel": "C0001", "ts": "1.000001",
+        "text": "<@U0DOCGPT> When is the first payment date?"}})
+
+
+def signed(body, secret=SECRET):
+    timestamp = str(int(time.time()))
+    return {"Content-Type": "application/json", "X-Slack-Request-Timestamp": timestamp,
+            "X-Slack-Signature": SignatureVerifier(secret).generate_signature(timestamp=timestamp, body=body)}
+
+
+def test_unsigned_and_forged_events_are_rejected(web):
+    client, submitted = web
+    body = mention("Ev0001")
+    assert client.post("/slack/events", data=body, headers={"Content-Type": "application/json"}).status_code == 401
+    assert client.post("/slack/events", data=body, headers=signed(body, secret="guess")).status_code == 401
+    time.sleep(0.2)
+    assert submitted == []
+
+
+def test_signed_mentions_are_answered(web):
+    client, submitted = web
+    challenge = json.dumps({"type": "url_verification", "challenge": "abc123", "token": "t"})
+    response = client.post("/slack/events", data=challenge, headers=signed(challenge))
+    assert response.status_code == 200 and b"abc123" in response.data
+    body = mention("Ev0002")
+    assert client.post("/slack/events", data=body, headers=signed(body)).status_code == 200
+    deadline = time.monotonic() + 5
+    while not submitted and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert submitted and submitted[0][0] == "C0001"
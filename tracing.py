@@ -0,0 +1,196 @@
+"""
+Request-scoped traces for Slack events.
+
+    with start_trace("app_mention", event_id=..., channel=..., thread_ts=...):
+        with stage("embed_query"):
+            ...
+
+A trace lives in a ContextVar, so spans recorded anywhere in the call stack attach to the
+request that is being answered. Finished traces are handed to a queue and written as JSON
+lines by a background thread (rotating file), so the request thread never waits on disk.
+Traces slower than SLOW_QUERY_MS are also written to the slow-query log.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from metrics import timed
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") not in ("0", "false", "no")
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(LOG_DIR, "traces.jsonl"))
+SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH", os.path.join(LOG_DIR, "slow_queries.jsonl"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "10000"))
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "5"))
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = dict(attrs)
+        self.spans = []
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, duration_ms):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.started,
+            "duration_ms": round(duration_ms, 3),
+            "error": self.error,
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+
+def _jsonl_logger(name, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+class _TraceWriter:
+    """Background thread that serializes finished traces to the trace and slow-query logs."""
+
+    def __init__(self, trace_path, slow_path):
+        self.trace_log = _jsonl_logger("docgpt.traces", trace_path)
+        self.slow_log = _jsonl_logger("docgpt.slow_queries", slow_path)
+        self.queue = queue.Queue(maxsize=10000)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, record, slow):
+        try:
+            self.queue.put_nowait((record, slow))
+        except queue.Full:
+            # Never block a request on tracing
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                record, slow = item
+                line = json.dumps(record, ensure_ascii=False, default=str)
+                self.trace_log.info(line)
+                if slow:
+                    self.slow_log.info(line)
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"⚠️ Could not write trace: {e}")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _TraceWriter(TRACE_LOG_PATH, SLOW_QUERY_LOG_PATH)
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def flush():
+    """Wait until every finished trace has been written (tests, shutdown)."""
+    if _writer is not None:
+        _writer.flush()
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Open a trace for one request; it is written when the block exits."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    trace = Trace(name, attrs)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current_trace.reset(token)
+        duration_ms = (time.perf_counter() - trace.start) * 1000
+        _get_writer().submit(trace.to_dict(duration_ms), duration_ms >= SLOW_QUERY_MS)
+
+
+def annotate(**attrs):
+    """Add attributes (decision path, token counts...) to the current trace, if any."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.set(**attrs)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record a timed span on the current trace; a no-op outside a trace."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record = {
+            "name": name,
+            "start_ms": round((start - trace.start) * 1000, 3),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        if attrs:
+            record.update(attrs)
+        if error:
+            record["error"] = error
+        trace.spans.append(record)
+
+
+@contextmanager
+def stage(name, **attrs):
+    """A pipeline stage: timed into the stage histogram and recorded as a span."""
+    with timed(name), span(name, **attrs):
+        yield
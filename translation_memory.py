@@ -0,0 +1,262 @@
+"""
+Sentence-level translation memory for answer translation.
+
+Answers are split into lines and sentences. Sentences already translated are served from
+a persistent SQLite store, and only the new ones go to the model, in one numbered batch.
+The store is seeded for free from the English/Spanish pairs in the rules file and
+pre-warmed at startup with the fixed answer templates, so the "no information found"
+and codex answers never need a model call once translated.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from context_packing import count_tokens
+from metrics import Counter, register
+
+# Next to this file, not the working directory: the same store whoever starts the bot, from wherever
+TRANSLATION_MEMORY_PATH = os.getenv(
+    "TRANSLATION_MEMORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_memory.sqlite3")
+)
+# Sentences per model call when pre-warming templates
+PREWARM_BATCH_SIZE = 40
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+NUMBERED = re.compile(r"^\s*(\d+)[.)]\s?(.*)$")
+# Slack markup around a sentence: leading emoji, a bold program label, bold markers
+PREFIX = re.compile(r"^[^\w*]*(?:\*(?:Elevate|Clarity):\*\s*)?\**\s*")
+SUFFIX = re.compile(r"\s*\**\s*$")
+
+HITS = register(Counter("docgpt_translation_memory_hits_total", "Sentences served from the translation memory"))
+MISSES = register(Counter("docgpt_translation_memory_misses_total", "Sentences sent to the model for translation"))
+TOKENS_SAVED = register(Counter("docgpt_translation_memory_tokens_saved_total", "Estimated tokens saved by the translation memory"))
+
+
+def split_segments(text):
+    """[[sentence, ...] per line]; empty lines stay as empty lists so the layout survives."""
+    return [[s.strip() for s in SENTENCE_END.split(line) if s.strip()] for line in text.split("\n")]
+
+
+def join_segments(lines):
+    return "\n".join(" ".join(line) for line in lines)
+
+
+def split_markup(segment):
+    """(prefix, sentence, suffix): the memory is keyed on the sentence without its markup."""
+    prefix = PREFIX.match(segment).group(0)
+    rest = segment[len(prefix):]
+    suffix = SUFFIX.search(rest).group(0)
+    return prefix, rest[:len(rest) - len(suffix)], suffix
+
+
+def sentences_of(text):
+    """Every translatable sentence in `text`, markup stripped, in order."""
+    return [core for line in split_segments(text) for core in (split_markup(s)[1] for s in line) if core]
+
+
+class TranslationMemory:
+    def __init__(self, path=TRANSLATION_MEMORY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " target_lang TEXT NOT NULL, source TEXT NOT NULL, translation TEXT NOT NULL,"
+            " origin TEXT NOT NULL, hits INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL,"
+            " PRIMARY KEY (target_lang, source))"
+        )
+        self.conn.commit()
+        self.cache = {
+            (lang, source): translation
+            for lang, source, translation in self.conn.execute("SELECT target_lang, source, translation FROM translations")
+        }
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "tokens_saved": 0, "model_calls": 0}
+
+    def get(self, source, target_lang):
+        return self.cache.get((target_lang, source))
+
+    def put_many(self, pairs, target_lang, origin="model"):
+        """Store [(source, translation)]; existing entries are kept."""
+        new = {s: t for s, t in pairs if s and t and (target_lang, s) not in self.cache}
+        rows = [(target_lang, s, t, origin, time.time()) for s, t in new.items()]
+        if not rows:
+            return 0
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO translations (target_lang, source, translation, origin, created) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+            for lang, source, translation, _, _ in rows:
+                self.cache[(lang, source)] = translation
+        return len(rows)
+
+    def _record_hits(self, sources, target_lang):
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE translations SET hits = hits + 1 WHERE target_lang = ? AND source = ?",
+                [(target_lang, source) for source in sources],
+            )
+            self.conn.commit()
+
+    def _batch_prompt(self, segments, target_lang):
+        if len(segments) == 1:
+            return f"Translate the following text to {target_lang}:\n{segments[0]}"
+        numbered = "\n".join(f"{i}. {segment}" for i, segment in enumerate(segments, 1))
+        return (
+            f"Translate the following text to {target_lang}, line by line. Reply with the same "
+            f"numbered lines, keeping emojis and *formatting*:\n{numbered}"
+        )
+
+    def _store_reply(self, segments, reply, target_lang):
+        if len(segments) == 1:
+            replies = [reply.strip()]
+        else:
+            replies = {}
+            for line in reply.split("\n"):
+                match = NUMBERED.match(line)
+                if match:
+                    replies[int(match.group(1))] = match.group(2).strip()
+            if sorted(replies) != list(range(1, len(segments) + 1)):
+                return None
+            replies = [replies[i] for i in range(1, len(segments) + 1)]
+        with self.lock:
+            self.stats["model_calls"] += 1
+        translations = dict(zip(segments, replies))
+        self.put_many(translations.items(), target_lang)
+        return translations
+
+    def translate_segments(self, segments, target_lang, ask):
+        """
+        Translate new sentences with one model call (`ask(prompt) -> text`) and store them.
+        Returns {source: translation}, or None if the reply could not be matched up.
+        """
+        return self._store_reply(segments, ask(self._batch_prompt(segments, target_lang)), target_lang)
+
+    async def atranslate_segments(self, segments, target_lang, aask):
+        """translate_segments() with a coroutine `aask(prompt) -> text`."""
+        return self._store_reply(segments, await aask(self._batch_prompt(segments, target_lang)), target_lang)
+
+    def _lookup(self, text, target_lang):
+        lines = [[split_markup(segment) for segment in line] for line in split_segments(text)]
+        sentences = [core for line in lines for _, core, _ in line if core]
+        known = {sentence: self.get(sentence, target_lang) for sentence in sentences}
+        hits = [sentence for sentence, translation in known.items() if translation is not None]
+        misses = [sentence for sentence, translation in known.items() if translation is None]
+        saved = sum(count_tokens(sentence) + count_tokens(known[sentence]) for sentence in hits)
+        return lines, known, hits, misses, saved
+
+    def _whole_text_fallback(self, known):
+        # The model did not keep the numbering: translate the whole text as before
+        with self.lock:
+            self.stats["model_calls"] += 1
+        return self._count(len(known), 0, len(known), 0)
+
+    def _assemble(self, lines, known, hits, misses, saved, target_lang):
+        if hits:
+            self._record_hits(hits, target_lang)
+        translated = join_segments([
+            [prefix + (known[core] if core else "") + suffix for prefix, core, suffix in line] for line in lines
+        ])
+        return translated, self._count(len(known), len(hits), len(misses), saved)
+
+    def translate(self, text, target_lang, ask):
+        """
+        Translate `text` sentence by sentence, sending only unknown sentences to the model.
+        Returns (translation, {"hits", "misses", "tokens_saved"}).
+        """
+        lines, known, hits, misses, saved = self._lookup(text, target_lang)
+        if misses:
+            translations = self.translate_segments(misses, target_lang, ask)
+            if translations is None:
+                result = self._whole_text_fallback(known)
+                return ask(f"Translate the following text to {target_lang}:\n{text}"), result
+            known.update(translations)
+        return self._assemble(lines, known, hits, misses, saved, target_lang)
+
+    async def atranslate(self, text, target_lang, aask):
+        """translate() with a coroutine `aask(prompt) -> text`."""
+        lines, known, hits, misses, saved = self._lookup(text, target_lang)
+        if misses:
+            translations = await self.atranslate_segments(misses, target_lang, aask)
+            if translations is None:
+                result = self._whole_text_fallback(known)
+                return await aask(f"Translate the following text to {target_lang}:\n{text}"), result
+            known.update(translations)
+        return self._assemble(lines, known, hits, misses, saved, target_lang)
+
+    def _count(self, lookups, hits, misses, saved):
+        with self.lock:
+            self.stats["lookups"] += lookups
+            self.stats["hits"] += hits
+            self.stats["misses"] += misses
+            self.stats["tokens_saved"] += saved
+        HITS.inc(amount=hits)
+        MISSES.inc(amount=misses)
+        TOKENS_SAVED.inc(amount=saved)
+        return {"hits": hits, "misses": misses, "tokens_saved": saved}
+
+    def seed_pairs(self, pairs, target_lang, origin="rules"):
+        """
+        Store known (English, Spanish) text pairs sentence by sentence, wherever both sides
+        split into the same number of lines and sentences.
+        """
+        aligned = []
+        for source, translation in pairs:
+            source_sentences, translated_sentences = sentences_of(source), sentences_of(translation)
+            if len(source_sentences) == len(translated_sentences):
+                aligned.extend(zip(source_sentences, translated_sentences))
+        return self.put_many(aligned, target_lang, origin)
+
+    def prewarm(self, texts, target_lang, ask):
+        """Translate every sentence of `texts` not yet in memory, in batches; returns how many were added."""
+        missing = []
+        for text in texts:
+            for sentence in sentences_of(text):
+                if self.get(sentence, target_lang) is None and sentence not in missing:
+                    missing.append(sentence)
+        added = 0
+        for start in range(0, len(missing), PREWARM_BATCH_SIZE):
+            batch = missing[start:start + PREWARM_BATCH_SIZE]
+            translations = self.translate_segments(batch, target_lang, ask)
+            if translations is None:
+                # Fall back to one sentence per call for this batch
+                for segment in batch:
+                    translations = self.translate_segments([segment], target_lang, ask)
+                    added += len(translations)
+            else:
+                added += len(translations)
+        return added
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        stats["entries"] = len(self.cache)
+        return stats
+
+
+def rules_translation_pairs(rules):
+    """(English, Spanish) pairs from the compiled eligibility rules: verdict texts and notes."""
+    pairs = []
+    for entry in rules["table"].values():
+        if entry.get("en") and entry.get("es"):
+            pairs.append((entry["en"], entry["es"]))
+        note = entry.get("note")
+        if note and note.get("en") and note.get("es"):
+            pairs.append((note["en"], note["es"]))
+    return pairs
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory():
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory(TRANSLATION_MEMORY_PATH)
+        return _memory